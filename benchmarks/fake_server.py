@@ -0,0 +1,196 @@
+"""Local stand-in for the signing endpoint and the object storage.
+
+The server signs URLs on the `sign_urls` and `sign_urls_put` routes, with a
+configurable latency and a maximum number of URLs per request. URLs are read
+from the query string, or from a JSON request body (possibly compressed with
+gzip) unless `accept_body` is False. Responses are compressed when the client
+accepts it. Signed URLs point to the server itself, which stores the objects
+uploaded with PUT requests in memory, and serves them with GET requests
+(possibly ranged). Like S3 presigned URLs, a signed URL is only valid for the
+HTTP method of its route (GET for `sign_urls`, PUT for `sign_urls_put`):
+other requests get a 403 error.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSigningServer(ThreadingHTTPServer):  # pylint: disable = R0902
+    """Fake signing server, running in a background thread."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        max_urls: int = 0,
+        url_duration: int = 8 * 3600,
+        accept_body: bool = True,
+    ):
+        """Initialize the server.
+
+        Args:
+            latency: time (in seconds) to answer a signing request
+            max_urls: maximum number of URLs per signing request (0 for no
+                limit). Larger requests get a 413 error
+            url_duration: validity of the signed URLs, in seconds
+            accept_body: accept the URLs in the request body. Otherwise,
+                requests without URLs in the query string get a 422 error
+
+        """
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.max_urls = max_urls
+        self.url_duration = url_duration
+        self.accept_body = accept_body
+        self.counters: Counter = Counter()
+        # URLs left out of the responses, as if the server failed to sign them
+        self.omitted_urls: Set[str] = set()
+        # Signing routes and object requests, in the order they are received
+        self.history: List[str] = []
+        self.objects: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def count(self, key: str, value: int = 1):
+        """Increment a counter."""
+        with self._lock:
+            self.counters[key] += value
+
+    def __enter__(self):
+        """Start the server."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the server."""
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler of the fake signing server."""
+
+    server: FakeSigningServer
+    protocol_version = "HTTP/1.1"
+    # Like production servers, do not wait for ACKs to send small segments
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def log_message(self, *args):  # pylint: disable = arguments-differ
+        """Do not log the requests."""
+
+    def _reply(self, status: int, body: bytes = b"", headers=None):
+        """Send a response."""
+        self.send_response(status)
+        if len(body) > 1024 and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):  # pylint: disable = invalid-name
+        """Sign URLs."""
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        parsed = urlparse(self.path)
+        route = parsed.path.strip("/")
+        if route not in ("sign_urls", "sign_urls_put"):
+            self._reply(404)
+            return
+        self.server.count("requests")
+        self.server.count("received_bytes", len(self.path) + len(data))
+        urls = parse_qs(parsed.query).get("urls", [])
+        if data and self.server.accept_body:
+            if self.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            urls = json.loads(data)["urls"]
+            self.server.count("body_requests")
+        if not urls:
+            self._reply(422, b'{"detail": "Missing urls"}')
+            return
+        self.server.count(f"{route}_requests")
+        self.server.history.append(route)
+        self.server.count("signed_urls", len(urls))
+        time.sleep(self.server.latency)
+        if self.server.max_urls and len(urls) > self.server.max_urls:
+            self.server.count("rejected_requests")
+            self._reply(413, b'{"detail": "Too many URLs"}')
+            return
+        now = datetime.now(timezone.utc)
+        expiry = now + timedelta(seconds=self.server.url_duration)
+        method = "PUT" if route == "sign_urls_put" else "GET"
+        signature = (
+            f"X-Amz-Date={now:%Y%m%dT%H%M%SZ}&X-Fake-Method={method}"
+            "&X-Amz-Signature=0"
+        )
+        hrefs = {
+            url: f"{self.server.url}{urlparse(url).path.lstrip('/')}?{signature}"
+            for url in urls
+            if url not in self.server.omitted_urls
+        }
+        body = json.dumps({"expiry": expiry.isoformat(), "hrefs": hrefs})
+        self._reply(200, body.encode(), {"Content-Type": "application/json"})
+
+    def _check_method(self, method: str) -> bool:
+        """Check that the URL has been signed for the method of the request."""
+        query = parse_qs(urlparse(self.path).query)
+        if query.get("X-Fake-Method") == [method]:
+            return True
+        self.server.count("forbidden_requests")
+        self._reply(403, b"" if self.command == "HEAD" else b"SignatureDoesNotMatch")
+        return False
+
+    def do_PUT(self):  # pylint: disable = invalid-name
+        """Store an object."""
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._check_method("PUT"):
+            return
+        self.server.objects[urlparse(self.path).path] = data
+        self.server.count("put_requests")
+        self.server.history.append("PUT")
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self._reply(200, headers={"ETag": etag})
+
+    def do_GET(self):  # pylint: disable = invalid-name
+        """Read an object, or a range of bytes of an object."""
+        self.server.count("get_requests")
+        if not self._check_method("GET"):
+            return
+        data = self.server.objects.get(urlparse(self.path).path)
+        if data is None:
+            self._reply(404)
+            return
+        headers = {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if not match:
+            self._reply(200, data, headers)
+            return
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        if start > end:
+            self._reply(416, headers={"Content-Range": f"bytes */{len(data)}"})
+            return
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        self._reply(206, data[start : end + 1], headers)
+
+    def do_HEAD(self):  # pylint: disable = invalid-name
+        """Describe an object (never allowed by the signed URLs)."""
+        self.server.count("head_requests")
+        self._check_method("HEAD")
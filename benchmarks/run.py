@@ -0,0 +1,278 @@
+"""Offline benchmarks of the signing functions.
+
+The signing endpoint and the object storage are replaced with a local
+stand-in (see `fake_server.py`), so that the benchmarks run without network.
+Each case is run twice: once with an empty cache ("cold"), then once again
+with the same URLs ("warm").
+
+Example:
+    python benchmarks/run.py --sizes 1000 10000 --latency 0.02
+    python benchmarks/run.py --json results.json
+    python benchmarks/run.py --compare results.json --tolerance 0.3
+
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from fake_server import FakeSigningServer
+from synthetic import (
+    make_feature_collection,
+    make_item_collection,
+    make_urls,
+    make_vrt,
+)
+
+# Maximum number of calls of the per-URL cases, and of files to upload
+MAX_CALLS = 1000
+MAX_FILES = 1000
+FILE_SIZE = 4096
+
+# A case prepares its input for a number of URLs, and returns the number of
+# URLs actually signed, and the function to benchmark
+Case = Callable[[int, str], Tuple[int, Callable[[], Any]]]
+
+
+def case_sign_urls(n_urls: int, prefix: str):
+    """Sign URLs with a single call."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    urls = make_urls(n_urls, prefix=prefix)
+    return n_urls, lambda: dinamis_sdk.sign_urls(urls)
+
+
+def case_sign(n_urls: int, prefix: str):
+    """Sign URLs one by one (e.g. the hrefs opened by a tile server)."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    urls = make_urls(min(n_urls, MAX_CALLS), prefix=prefix)
+    return len(urls), [lambda url=url: dinamis_sdk.sign(url) for url in urls]
+
+
+def case_sign_item_collection(n_urls: int, prefix: str):
+    """Sign a pystac ItemCollection."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    item_collection = make_item_collection(n_urls, prefix=prefix)
+    return n_urls, lambda: dinamis_sdk.sign_item_collection(item_collection)
+
+
+def case_sign_item_collection_shallow(n_urls: int, prefix: str):
+    """Sign a shallow copy of a pystac ItemCollection (vs. a deep copy)."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    item_collection = make_item_collection(n_urls, prefix=prefix)
+    return n_urls, lambda: dinamis_sdk.sign(item_collection, copy="shallow")
+
+
+def case_sign_mapping(n_urls: int, prefix: str):
+    """Sign a feature collection (dict)."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    feature_collection = make_feature_collection(n_urls, prefix=prefix)
+    return n_urls, lambda: dinamis_sdk.sign(feature_collection)
+
+
+def case_sign_mapping_shallow(n_urls: int, prefix: str):
+    """Sign a shallow copy of a feature collection (vs. a deep copy)."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    feature_collection = make_feature_collection(n_urls, prefix=prefix)
+    return n_urls, lambda: dinamis_sdk.sign(feature_collection, copy="shallow")
+
+
+def case_sign_vrt_string(n_urls: int, prefix: str):
+    """Sign a VRT mosaic."""
+    from dinamis_sdk.signing import (  # pylint: disable = C0415
+        sign_vrt_string,
+    )
+
+    vrt = make_vrt(n_urls, prefix=prefix)
+    return n_urls, lambda: sign_vrt_string(vrt)
+
+
+def case_push(n_urls: int, prefix: str):
+    """Upload small files."""
+    import dinamis_sdk  # pylint: disable = import-outside-toplevel
+
+    n_files = min(n_urls, MAX_FILES)
+    tmpdir = tempfile.mkdtemp(prefix="dinamis_sdk_bench_")
+    files = {}
+    for i, url in enumerate(make_urls(n_files, prefix=prefix)):
+        local_filename = os.path.join(tmpdir, f"{i}.bin")
+        with open(local_filename, "wb") as file_handler:
+            file_handler.write(os.urandom(FILE_SIZE))
+        files[local_filename] = url
+    return n_files, lambda: dinamis_sdk.push_many(files)
+
+
+CASES: Dict[str, Case] = {
+    "sign_urls": case_sign_urls,
+    "sign": case_sign,
+    "sign_item_collection": case_sign_item_collection,
+    "sign_item_collection_shallow": case_sign_item_collection_shallow,
+    "sign_mapping": case_sign_mapping,
+    "sign_mapping_shallow": case_sign_mapping_shallow,
+    "sign_vrt_string": case_sign_vrt_string,
+    "push": case_push,
+}
+
+
+def _timed(func: Callable[[], Any] | List[Callable[[], Any]]) -> Tuple[float, List]:
+    """Run a function (or a list of calls), and return the durations."""
+    calls = func if isinstance(func, list) else [func]
+    durations = []
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        durations.append(time.perf_counter() - call_start)
+    return time.perf_counter() - start, durations
+
+
+def run_case(  # pylint: disable = too-many-locals
+    name: str, n_urls: int, server: FakeSigningServer
+) -> Dict[str, Any]:
+    """Run one case with an empty cache, then with a warm cache."""
+    from dinamis_sdk.signing import CACHE  # pylint: disable = C0415
+
+    prefix = f"{name}-{n_urls}-{time.time_ns()}"
+    n_signed, func = CASES[name](n_urls, prefix)
+    CACHE.clear()
+    server.counters.clear()
+
+    cold, cold_durations = _timed(func)
+    cold_requests = server.counters["requests"]
+    stats_before = CACHE.stats()
+    warm, warm_durations = _timed(func)
+    stats_after = CACHE.stats()
+    warm_requests = server.counters["requests"] - cold_requests
+    hits = stats_after["hits"] - stats_before["hits"]
+    misses = stats_after["misses"] - stats_before["misses"]
+
+    result = {
+        "case": name,
+        "n_urls": n_signed,
+        "cold_s": cold,
+        "cold_urls_per_s": n_signed / cold,
+        "warm_s": warm,
+        "warm_urls_per_s": n_signed / warm,
+        "cold_requests": cold_requests,
+        "warm_requests": warm_requests,
+        "warm_hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+    }
+    if len(cold_durations) > 1:
+        for label, durations in (("cold", cold_durations), ("warm", warm_durations)):
+            quantiles = statistics.quantiles(durations, n=100)
+            result[f"{label}_p50_ms"] = 1000 * quantiles[49]
+            result[f"{label}_p95_ms"] = 1000 * quantiles[94]
+    return result
+
+
+def print_results(results: List[Dict[str, Any]]):
+    """Print the results as a table."""
+    header = (
+        f"{'case':<30}{'URLs':>9}{'cold (s)':>10}{'cold URL/s':>12}"
+        f"{'warm (s)':>10}{'warm URL/s':>12}{'requests':>12}{'hit ratio':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    for res in results:
+        print(
+            f"{res['case']:<30}{res['n_urls']:>9}{res['cold_s']:>10.3f}"
+            f"{res['cold_urls_per_s']:>12.0f}{res['warm_s']:>10.3f}"
+            f"{res['warm_urls_per_s']:>12.0f}"
+            f"{res['cold_requests']:>7}/{res['warm_requests']:<4}"
+            f"{res['warm_hit_ratio']:>11.2%}"
+        )
+        if "cold_p50_ms" in res:
+            print(
+                f"{'':<30}latency p50/p95: cold {res['cold_p50_ms']:.2f}/"
+                f"{res['cold_p95_ms']:.2f} ms, warm {res['warm_p50_ms']:.3f}/"
+                f"{res['warm_p95_ms']:.3f} ms"
+            )
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    """Return the regressions of the results, compared to a baseline."""
+    reference = {(res["case"], res["n_urls"]): res for res in baseline}
+    regressions = []
+    for res in results:
+        ref = reference.get((res["case"], res["n_urls"]))
+        if not ref:
+            continue
+        for key in ("cold_urls_per_s", "warm_urls_per_s"):
+            if res[key] < (1 - tolerance) * ref[key]:
+                regressions.append(
+                    f"{res['case']} ({res['n_urls']} URLs): {key} is "
+                    f"{res[key]:.0f} (baseline: {ref[key]:.0f})"
+                )
+    return regressions
+
+
+def main():
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=CASES)
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="latency of signing requests"
+    )
+    parser.add_argument(
+        "--max-urls", type=int, default=0, help="max. URLs per signing request"
+    )
+    parser.add_argument(
+        "--no-body",
+        action="store_true",
+        help="the server only accepts URLs in the query string",
+    )
+    parser.add_argument("--json", help="save the results in this file")
+    parser.add_argument("--compare", help="compare with results saved in this file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="tolerated slowdown (ratio)"
+    )
+    args = parser.parse_args()
+
+    with FakeSigningServer(
+        latency=args.latency, max_urls=args.max_urls, accept_body=not args.no_body
+    ) as server:
+        # The settings are read when dinamis_sdk is used for the first time
+        os.environ.update(
+            {
+                "DINAMIS_SDK_SIGNING_ENDPOINT": server.url,
+                "DINAMIS_SDK_SIGNING_DISABLE_AUTH": "1",
+                "DINAMIS_SDK_CONFIG_DIR": tempfile.mkdtemp(prefix="dinamis_sdk_"),
+                "DINAMIS_SDK_DISK_CACHE": "0",
+                # The server accepts request bodies, unless --no-body is used
+                "DINAMIS_SDK_SIGNING_TRANSPORT": "auto",
+            }
+        )
+        results = [
+            run_case(name, n_urls, server)
+            for name in args.cases
+            for n_urls in args.sizes
+        ]
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file_handler:
+            json.dump(results, file_handler, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file_handler:
+            regressions = compare(results, json.load(file_handler), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
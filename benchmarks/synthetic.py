@@ -0,0 +1,76 @@
+"""Synthetic STAC objects and documents to sign."""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+STORAGE_URL = "https://s3-data.meso.umontpellier.fr"
+ASSETS_PER_ITEM = 4
+
+
+def make_urls(n_urls: int, prefix: str = "bench") -> List[str]:
+    """Return distinct URLs of the storage."""
+    return [f"{STORAGE_URL}/{prefix}/tiles/{i:07d}.tif" for i in range(n_urls)]
+
+
+def make_item_dict(i_item: int, prefix: str = "bench") -> Dict[str, Any]:
+    """Return a STAC item (as a dict) with `ASSETS_PER_ITEM` assets."""
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "id": f"item-{i_item:07d}",
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[3, 43], [4, 43], [4, 44], [3, 44], [3, 43]]],
+        },
+        "bbox": [3, 43, 4, 44],
+        "properties": {
+            "datetime": datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat(),
+            "platform": "spot-7",
+            "eo:cloud_cover": i_item % 100,
+        },
+        "links": [],
+        "assets": {
+            f"band{i_asset}": {
+                "href": (
+                    f"{STORAGE_URL}/{prefix}/items/{i_item:07d}/band{i_asset}.tif"
+                ),
+                "type": "image/tiff; application=geotiff",
+                "roles": ["data"],
+            }
+            for i_asset in range(ASSETS_PER_ITEM)
+        },
+        "collection": "bench",
+    }
+
+
+def make_feature_collection(n_urls: int, prefix: str = "bench") -> Dict[str, Any]:
+    """Return a feature collection (as a dict) with about `n_urls` URLs."""
+    n_items = max(1, n_urls // ASSETS_PER_ITEM)
+    return {
+        "type": "FeatureCollection",
+        "features": [make_item_dict(i, prefix=prefix) for i in range(n_items)],
+    }
+
+
+def make_item_collection(n_urls: int, prefix: str = "bench"):
+    """Return a pystac ItemCollection with about `n_urls` URLs."""
+    # pylint: disable-next = import-outside-toplevel
+    from pystac import ItemCollection
+
+    return ItemCollection.from_dict(make_feature_collection(n_urls, prefix=prefix))
+
+
+def make_vrt(n_urls: int, prefix: str = "bench") -> str:
+    """Return a VRT mosaic of `n_urls` sources."""
+    sources = "".join(
+        "<SimpleSource>"
+        f'<SourceFilename relativeToVRT="0">/vsicurl/{url}</SourceFilename>'
+        "<SourceBand>1</SourceBand>"
+        "</SimpleSource>"
+        for url in make_urls(n_urls, prefix=prefix)
+    )
+    return (
+        '<VRTDataset rasterXSize="10980" rasterYSize="10980">'
+        f'<VRTRasterBand dataType="UInt16" band="1">{sources}</VRTRasterBand>'
+        "</VRTDataset>"
+    )
@@ -2,21 +2,111 @@
 
 # flake8: noqa
 
-from importlib.metadata import version, PackageNotFoundError
-from dinamis_sdk.signing import (
-    sign,
-    sign_inplace,
-    sign_urls,
-    sign_item,
-    sign_asset,
-    sign_item_collection,
-    sign_url_put,
-)  # noqa
-from .oauth2 import OAuth2Session  # noqa
-from .upload import push
-from .http import get_headers, get_userinfo, get_username
-
-try:
-    __version__ = version("dinamis_sdk")
-except PackageNotFoundError:
-    pass
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+# Public names, and the submodules they come from. Submodules (and their
+# dependencies: pystac, pydantic, requests...) are only imported when one of
+# their names is used for the first time.
+_LAZY_NAMES = {
+    "sign": "signing",
+    "sign_inplace": "signing",
+    "sign_urls": "signing",
+    "sign_item": "signing",
+    "sign_asset": "signing",
+    "sign_item_collection": "signing",
+    "sign_url_put": "signing",
+    "sign_search_pages": "signing",
+    "sign_search_items": "signing",
+    "sign_vrt_chunks": "signing",
+    "sign_vrt_file": "signing",
+    "sign_async": "signing_async",
+    "sign_inplace_async": "signing_async",
+    "sign_urls_async": "signing_async",
+    "sign_item_collection_async": "signing_async",
+    "sign_url_put_async": "signing_async",
+    "OAuth2Session": "oauth2",
+    "CacheRefresher": "refresh",
+    "push": "upload",
+    "push_many": "upload",
+    "push_dir": "upload",
+    "get_headers": "http",
+    "get_userinfo": "http",
+    "get_username": "http",
+}
+
+# Submodules that were available as attributes of the package, when it
+# imported them eagerly
+_SUBMODULES = {
+    "batching",
+    "cache",
+    "chunking",
+    "http",
+    "metrics",
+    "model",
+    "oauth2",
+    "ratelimit",
+    "refresh",
+    "retry",
+    "settings",
+    "signing",
+    "signing_async",
+    "sigv4",
+    "transport",
+    "upload",
+    "utils",
+}
+
+__all__ = list(_LAZY_NAMES)
+
+if TYPE_CHECKING:
+    from dinamis_sdk.signing import (
+        sign,
+        sign_inplace,
+        sign_urls,
+        sign_item,
+        sign_asset,
+        sign_item_collection,
+        sign_url_put,
+        sign_search_pages,
+        sign_search_items,
+        sign_vrt_chunks,
+        sign_vrt_file,
+    )  # noqa
+    from dinamis_sdk.signing_async import (
+        sign_async,
+        sign_inplace_async,
+        sign_urls_async,
+        sign_item_collection_async,
+        sign_url_put_async,
+    )  # noqa
+    from .oauth2 import OAuth2Session  # noqa
+    from .refresh import CacheRefresher
+    from .upload import push, push_many, push_dir
+    from .http import get_headers, get_userinfo, get_username
+
+
+def __getattr__(name: str) -> Any:
+    """Import the public names on first use."""
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(f".{_LAZY_NAMES[name]}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    if name in _SUBMODULES:
+        # Also set as attribute of the package by the import system
+        return importlib.import_module(f".{name}", __name__)
+    if name == "__version__":
+        # pylint: disable-next = import-outside-toplevel
+        from importlib.metadata import version, PackageNotFoundError
+
+        try:
+            return version("dinamis_sdk")
+        except PackageNotFoundError:
+            pass
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    """List the public names."""
+    return sorted(list(globals()) + __all__)
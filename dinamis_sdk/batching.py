@@ -0,0 +1,131 @@
+"""Micro-batching of signing requests from concurrent callers."""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+from .settings import MAX_URLS
+from .signing import SignedURL, SignURLRoute, _request_and_cache
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+
+class BatchingSigner:  # pylint: disable = R0902
+    """Collect URLs to sign from many calls, and sign them in large batches.
+
+    URLs submitted by concurrent callers (threads) are queued. A daemon thread
+    sends them to the signing endpoint in a single request once the oldest
+    queued URL has waited `window` seconds, or as soon as `max_urls` URLs are
+    queued, then hands each caller its signed URLs.
+
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_urls: int = MAX_URLS,
+        route: SignURLRoute = SignURLRoute.SIGN_URLS_GET,
+    ):
+        """Initialize the signer.
+
+        Args:
+            window: maximum time (in seconds) a URL waits in the queue
+            max_urls: number of queued URLs that triggers a request
+            route: route (API)
+
+        """
+        self.window = window
+        self.max_urls = max_urls
+        self.route = route
+        self._queue: List[Tuple[str, Future]] = []
+        self._oldest = 0.0
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._pid = os.getpid()
+
+    def _ensure_thread(self):
+        """Start the background thread if needed (the lock must be held)."""
+        if self._pid != os.getpid():
+            # Threads are not inherited by forked processes
+            self._pid = os.getpid()
+            self._queue = []
+            self._thread = None
+        if not (self._thread and self._thread.is_alive()):
+            self._thread = threading.Thread(
+                target=self._run, name="dinamis-sdk-batching-signer", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, urls: List[str]) -> Dict[str, Future]:
+        """Queue URLs to sign.
+
+        Args:
+            urls: urls
+
+        Returns:
+            dict of key = URL, value = future SignedURL
+
+        """
+        futures: Dict[str, Future] = {url: Future() for url in urls}
+        with self._condition:
+            self._ensure_thread()
+            if not self._queue:
+                self._oldest = time.monotonic()
+            self._queue.extend(futures.items())
+            self._condition.notify()
+        return futures
+
+    def sign(self, urls: List[str]) -> Dict[str, SignedURL]:
+        """Sign URLs, waiting for the batch they belong to.
+
+        Args:
+            urls: urls
+
+        Returns:
+            dict of key = URL, value = SignedURL
+
+        """
+        futures = self.submit(urls)
+        return {url: future.result() for url, future in futures.items()}
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        """Wait for the next batch to send."""
+        with self._condition:
+            while True:
+                if self._queue:
+                    remaining = self._oldest + self.window - time.monotonic()
+                    if remaining <= 0 or len(self._queue) >= self.max_urls:
+                        batch, self._queue = self._queue, []
+                        return batch
+                    self._condition.wait(remaining)
+                else:
+                    self._condition.wait()
+
+    def _run(self):
+        """Send the batches.
+
+        Errors are handed to the callers of the batch, and the thread keeps
+        serving the next batches.
+        """
+        while True:
+            batch = self._next_batch()
+            try:
+                self._send(batch)
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(err)
+
+    def _send(self, batch: List[Tuple[str, Future]]):
+        """Sign the URLs of a batch, and set the results of their futures."""
+        urls = list(dict.fromkeys(url for url, _ in batch))
+        log.debug("Sending a batch of %s URLs", len(urls))
+        signed_urls = _request_and_cache(urls=urls, route=self.route)
+        for url, future in batch:
+            if url in signed_urls:
+                future.set_result(signed_urls[url])
+            else:
+                future.set_exception(ValueError(f"URL {url} has not been signed"))
@@ -0,0 +1,307 @@
+"""Caches for signed URLs."""
+
+import heapq
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from . import metrics
+from .settings import get_config_path
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+# SQLite limits the number of host parameters in a single statement
+_SQLITE_MAX_PARAMS = 500
+
+# Approximate memory used by one entry of the in-memory cache, in addition to
+# the URL and the signed href (dict slot, linked list node, model instance...)
+_ENTRY_OVERHEAD_BYTES = 400
+
+
+class MemoryCache:  # pylint: disable = R0902
+    """In-memory cache of signed URLs, bounded in entries and memory.
+
+    Values are objects with `href` (str) and `expiry` (datetime) attributes,
+    i.e. `dinamis_sdk.signing.SignedURL` instances. Least recently used
+    entries are evicted when the maximum number of entries, or the memory
+    budget, is exceeded. Expired entries are removed proactively on each
+    insertion, using an index ordered by expiry.
+
+    The cache is thread-safe.
+
+    """
+
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0):
+        """Initialize the cache.
+
+        Args:
+            max_entries: maximum number of entries (0 for no limit)
+            max_bytes: approximate memory budget, in bytes (0 for no limit)
+
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._size = 0
+        self._lock = threading.RLock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def _entry_size(url: str, value: Any) -> int:
+        """Approximate memory used by one entry."""
+        return sys.getsizeof(url) + sys.getsizeof(value.href) + _ENTRY_OVERHEAD_BYTES
+
+    def _remove(self, url: str) -> Any:
+        """Remove an entry (the lock must be held)."""
+        value = self._entries.pop(url)
+        self._size -= self._entry_size(url, value)
+        self._last_used.pop(url, None)
+        return value
+
+    def get(self, url: str, default: Any = None) -> Any:
+        """Return the cached value of an URL, if not expired."""
+        with self._lock:
+            value = self._entries.get(url)
+            if value is not None and value.expiry.timestamp() <= time.time():
+                self._remove(url)
+                self._counters["expirations"] += 1
+                metrics.inc("dinamis_sdk_cache_expirations_total", cache="memory")
+                value = None
+            if value is None:
+                self._counters["misses"] += 1
+                return default
+            self._entries.move_to_end(url)
+            self._last_used[url] = time.time()
+            self._counters["hits"] += 1
+            return value
+
+    def __getitem__(self, url: str) -> Any:
+        """Return the cached value of an URL."""
+        value = self.get(url)
+        if value is None:
+            raise KeyError(url)
+        return value
+
+    def __setitem__(self, url: str, value: Any):
+        """Put a value in cache."""
+        with self._lock:
+            self._set(url, value)
+            self._purge()
+
+    def _set(self, url: str, value: Any):
+        """Put a value in cache (the lock must be held)."""
+        # Replacing an entry (e.g. re-signing an URL) is not a use of it
+        last_used = self._last_used.get(url, time.time())
+        if url in self._entries:
+            self._remove(url)
+        self._entries[url] = value
+        self._last_used[url] = last_used
+        self._size += self._entry_size(url, value)
+        heapq.heappush(self._expiries, (value.expiry.timestamp(), url))
+
+    def update(self, values: Mapping[str, Any]):
+        """Put several values in cache."""
+        with self._lock:
+            for url, value in values.items():
+                self._set(url, value)
+            self._purge()
+
+    def _purge(self):
+        """Remove expired entries, then evict LRU entries over the limits."""
+        now = time.time()
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, url = heapq.heappop(self._expiries)
+            value = self._entries.get(url)
+            if value is not None and value.expiry.timestamp() == expiry:
+                self._remove(url)
+                self._counters["expirations"] += 1
+                metrics.inc("dinamis_sdk_cache_expirations_total", cache="memory")
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._size > self.max_bytes)
+        ):
+            url, value = self._entries.popitem(last=False)
+            self._size -= self._entry_size(url, value)
+            self._last_used.pop(url, None)
+            self._counters["evictions"] += 1
+            metrics.inc("dinamis_sdk_cache_evictions_total", cache="memory")
+        if len(self._expiries) > 2 * len(self._entries) + 64:
+            # Drop the index items of replaced or evicted entries
+            self._expiries = [
+                (value.expiry.timestamp(), url) for url, value in self._entries.items()
+            ]
+            heapq.heapify(self._expiries)
+
+    def __contains__(self, url: object) -> bool:
+        """Return True if the URL is in cache."""
+        with self._lock:
+            return url in self._entries
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._last_used.clear()
+            self._expiries.clear()
+            self._size = 0
+
+    def recently_used(self, since: float) -> Dict[str, Any]:
+        """Return the entries used or inserted after a given time.
+
+        Args:
+            since: UNIX timestamp
+
+        Returns:
+            dict of key = URL, value = cached value
+
+        """
+        with self._lock:
+            return {
+                url: self._entries[url]
+                for url, last_used in self._last_used.items()
+                if last_used >= since
+            }
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters of the cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                **self._counters,
+            }
+
+
+class DiskCache:
+    """Persistent cache of signed URLs, shared between processes.
+
+    The cache is an SQLite database stored in the config directory. Rows are
+    keyed by the original URL and hold the signed href and its expiry (UNIX
+    timestamp). The database uses write-ahead logging, so that many readers
+    and writers (e.g. workers of a job array) can use it concurrently.
+
+    """
+
+    file_name = ".signed_urls.sqlite"
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """Initialize the cache.
+
+        Args:
+            path: path to the SQLite database file
+            timeout: seconds to wait for a lock held by another writer
+
+        """
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS signed_urls ("
+                "url TEXT PRIMARY KEY, href TEXT NOT NULL, expiry REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS signed_urls_expiry "
+                "ON signed_urls (expiry)"
+            )
+
+    @classmethod
+    def from_config_dir(cls):
+        """Open the cache in the config directory, if available."""
+        cfg_path = get_config_path()
+        if not cfg_path:
+            return None
+        path = os.path.join(cfg_path, cls.file_name)
+        try:
+            return cls(path)
+        except sqlite3.Error as err:
+            log.warning("Unable to use disk cache %s (%s)", path, err)
+        return None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the database, in a single transaction."""
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(
+        self, urls: Iterable[str], min_ttl: float = 0.0
+    ) -> Dict[str, Tuple[str, datetime]]:
+        """Get the signed hrefs of the URLs that are still valid.
+
+        Args:
+            urls: original URLs
+            min_ttl: minimum remaining time to live, in seconds, for a cached
+                href to be returned
+
+        Returns:
+            dict of key = original URL, value = (signed href, expiry)
+
+        """
+        urls = list(urls)
+        min_expiry = time.time() + min_ttl
+        found = {}
+        try:
+            with self._connect() as conn:
+                for start in range(0, len(urls), _SQLITE_MAX_PARAMS):
+                    chunk = urls[start : start + _SQLITE_MAX_PARAMS]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        "SELECT url, href, expiry FROM signed_urls "
+                        f"WHERE expiry > ? AND url IN ({placeholders})",
+                        [min_expiry, *chunk],
+                    )
+                    for url, href, expiry in rows:
+                        found[url] = (
+                            href,
+                            datetime.fromtimestamp(expiry, tz=timezone.utc),
+                        )
+        except sqlite3.Error as err:
+            log.warning("Unable to read disk cache %s (%s)", self.path, err)
+        log.debug("%s URLs found in disk cache", len(found))
+        return found
+
+    def set_many(self, signed: Dict[str, Tuple[str, datetime]]):
+        """Store signed hrefs, and purge the expired ones.
+
+        Args:
+            signed: dict of key = original URL, value = (signed href, expiry)
+
+        """
+        rows: List[Tuple[str, str, float]] = [
+            (url, href, expiry.timestamp()) for url, (href, expiry) in signed.items()
+        ]
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO signed_urls (url, href, expiry) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+                conn.execute(
+                    "DELETE FROM signed_urls WHERE expiry <= ?", (time.time(),)
+                )
+        except sqlite3.Error as err:
+            log.warning("Unable to write disk cache %s (%s)", self.path, err)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM signed_urls")
@@ -0,0 +1,291 @@
+"""Chunks of URLs sent to the signing endpoint: adaptive size, and encoding."""
+
+import gzip
+import json
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .settings import ENV, MAX_URLS
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+# HTTP status codes of requests that are too large for the server
+TOO_LARGE_STATUSES = (413, 414, 431)
+
+# HTTP status codes of servers that do not accept the URLs in the request
+# body, or a compressed request body
+BODY_UNSUPPORTED_STATUSES = (400, 404, 405, 415, 422)
+GZIP_UNSUPPORTED_STATUSES = (400, 415)
+
+# Request bodies smaller than this are not compressed
+GZIP_MIN_BYTES = 1024
+
+# Approximate number of bytes of the query string added by each URL, in
+# addition to the URL itself ("&urls=")
+URL_OVERHEAD_BYTES = 6
+
+
+def url_bytes(urls: List[str]) -> int:
+    """Return the approximate size of URLs in the query string."""
+    return sum(len(url) + URL_OVERHEAD_BYTES for url in urls)
+
+
+class AdaptiveChunkSize:  # pylint: disable = R0902
+    """Number of URLs per signing request, adapted to the server responses.
+
+    The size starts at `initial` URLs, and doubles after each full chunk
+    answered within `target_latency` seconds, as long as the throughput (URLs
+    per second of a request) keeps improving. It is halved when requests are
+    slower than `target_latency`, or fail. Requests rejected as too large
+    (413, 414, 431) also cap the size of the next chunks, in URLs and in bytes.
+    The size always stays within [`min_size`, `max_size`].
+
+    """
+
+    # Ratio of the best throughput that a larger chunk must reach to keep
+    # growing, and decay of the best throughput (so that the size is probed
+    # again when the conditions change)
+    growth_threshold = 0.9
+    best_decay = 0.98
+
+    def __init__(
+        self,
+        initial: int = MAX_URLS,
+        min_size: int = 1,
+        max_size: int = MAX_URLS,
+        target_latency: float = 2.0,
+    ):
+        """Initialize the chunk size.
+
+        Args:
+            initial: initial number of URLs per chunk
+            min_size: minimum number of URLs per chunk
+            max_size: maximum number of URLs per chunk
+            target_latency: maximum duration of a request, in seconds
+
+        """
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.target_latency = target_latency
+        self._size = min(max(initial, self.min_size), self.max_size)
+        self._max_bytes = 0
+        self._best_throughput = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Current number of URLs per chunk."""
+        return self._size
+
+    @property
+    def max_bytes(self) -> int:
+        """Maximum size of a chunk in bytes (0 when unknown)."""
+        return self._max_bytes
+
+    def iter_chunks(self, urls: List[str]) -> Iterator[List[str]]:
+        """Split URLs in chunks.
+
+        Each chunk has the size of the moment it is taken, so that chunks
+        requested later benefit from the responses to the first ones.
+        """
+        start = 0
+        while start < len(urls):
+            end = min(start + self._size, len(urls))
+            if max_bytes := self._max_bytes:
+                chunk_bytes = 0
+                for i_url in range(start, end):
+                    chunk_bytes += len(urls[i_url]) + URL_OVERHEAD_BYTES
+                    if chunk_bytes > max_bytes and i_url > start:
+                        end = i_url
+                        break
+            yield urls[start:end]
+            start = end
+
+    def split(self, urls: List[str]) -> List[List[str]]:
+        """Split URLs in chunks of the current size."""
+        return list(self.iter_chunks(urls))
+
+    def _resize(self, size: int, reason: str):
+        """Change the size (the lock must be held)."""
+        size = min(max(size, self.min_size), self.max_size)
+        if size != self._size:
+            log.debug("Chunk size: %s -> %s URLs (%s)", self._size, size, reason)
+            self._size = size
+
+    def on_success(self, n_urls: int, latency: float):
+        """Adapt the size after a successful request.
+
+        Args:
+            n_urls: number of URLs of the request
+            latency: duration of the request, in seconds
+
+        """
+        with self._lock:
+            if latency > self.target_latency:
+                self._resize(self._size // 2, f"slow request, {latency:.2f}s")
+                return
+            if n_urls < self._size:
+                # Partial chunks say little about larger ones
+                return
+            throughput = n_urls / max(latency, 1e-6)
+            self._best_throughput *= self.best_decay
+            if throughput >= self.growth_threshold * self._best_throughput:
+                self._best_throughput = max(self._best_throughput, throughput)
+                self._resize(self._size * 2, f"{throughput:.0f} URLs/s")
+
+    def on_too_large(self, n_urls: int, n_bytes: int):
+        """Adapt the size after a request rejected as too large.
+
+        Args:
+            n_urls: number of URLs of the request
+            n_bytes: size of the URLs of the request (see `url_bytes()`)
+
+        """
+        with self._lock:
+            self.max_size = max(self.min_size, min(self.max_size, n_urls - 1))
+            max_bytes = n_bytes * 3 // 4
+            if not self._max_bytes or max_bytes < self._max_bytes:
+                self._max_bytes = max_bytes
+            self._resize(min(self._size, n_urls // 2), "request too large")
+
+    def limit(self, max_size: int, reason: str):
+        """Lower the maximum size.
+
+        Args:
+            max_size: maximum number of URLs per chunk
+            reason: reason, for the logs
+
+        """
+        with self._lock:
+            self.max_size = max(self.min_size, min(self.max_size, max_size))
+            self._resize(self._size, reason)
+
+    def on_error(self):
+        """Adapt the size after a failed request."""
+        with self._lock:
+            self._resize(self._size // 2, "request failed")
+
+
+@lru_cache(maxsize=None)
+def get_chunk_size(route: str) -> AdaptiveChunkSize:
+    """Return the adaptive chunk size of a route."""
+    log.debug("Adaptive chunk size for route %s", route)
+    max_size = ENV.dinamis_sdk_chunk_size_max
+    if not get_chunk_encoding(route).use_body:
+        # Proxies reject long query strings, not always with 413 or 414
+        max_size = min(max_size, MAX_URLS)
+    return AdaptiveChunkSize(
+        initial=MAX_URLS,
+        min_size=ENV.dinamis_sdk_chunk_size_min,
+        max_size=max_size,
+        target_latency=ENV.dinamis_sdk_chunk_target_latency,
+    )
+
+
+class ChunkEncoding:
+    """Encoding of the chunks of URLs in signing requests.
+
+    With the "params" transport, URLs are sent in the query string. With the
+    "body" transport, they are sent in a JSON request body, compressed with
+    gzip when `use_gzip` is True (and the body is large enough). The "auto"
+    transport uses the request body until the server rejects it, then falls
+    back to the query string. Compression is disabled as well when the
+    server rejects it.
+
+    Responses are decompressed by the HTTP clients, which accept gzip.
+    """
+
+    def __init__(self, transport: str = "params", use_gzip: bool = True):
+        """Initialize the encoding.
+
+        Args:
+            transport: "auto", "body" or "params"
+            use_gzip: compress request bodies
+
+        """
+        self.transport = transport
+        self.use_body = transport != "params"
+        self.use_gzip = use_gzip
+        # Whether the server is known to accept bodies and compressed bodies
+        self._body_confirmed = transport != "auto"
+        self._gzip_confirmed = False
+        self._lock = threading.Lock()
+
+    def encode(
+        self, params: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any] | None, bytes | None, Dict[str, str]]:
+        """Encode the parameters of a request.
+
+        Args:
+            params: parameters of the request (`urls`, ...)
+
+        Returns:
+            the query parameters, the body, and the additional headers
+
+        """
+        if not self.use_body:
+            return params, None, {}
+        body = json.dumps(params, separators=(",", ":")).encode()
+        if self.use_gzip and len(body) >= GZIP_MIN_BYTES:
+            headers = {"Content-Encoding": "gzip"}
+            return None, gzip.compress(body, compresslevel=1), headers
+        return None, body, {}
+
+    def is_confirmed(self, headers: Dict[str, str], body: bytes | None) -> bool:
+        """Return True if the server is known to accept a request encoding."""
+        if body is None:
+            return True
+        if "Content-Encoding" in headers:
+            return self._gzip_confirmed
+        return self._body_confirmed
+
+    def on_success(self, headers: Dict[str, str], body: bytes | None):
+        """Record that the server accepts a request encoding."""
+        if body is not None:
+            self._body_confirmed = True
+            if "Content-Encoding" in headers:
+                self._gzip_confirmed = True
+
+    def fall_back(
+        self, status: int | None, headers: Dict[str, str], body: bytes | None
+    ) -> bool:
+        """Change the encoding after a rejected request, if possible.
+
+        Args:
+            status: HTTP status code of the response
+            headers: additional headers of the rejected request
+            body: body of the rejected request
+
+        Returns:
+            True if the request can be sent again with another encoding
+
+        """
+        if body is None:
+            return False
+        gzipped = "Content-Encoding" in headers
+        with self._lock:
+            if not self.use_body or (gzipped and not self.use_gzip):
+                # Already changed after another request
+                return True
+            if gzipped and not self._gzip_confirmed:
+                if status in GZIP_UNSUPPORTED_STATUSES:
+                    log.debug("Compressed request bodies not supported (%s)", status)
+                    self.use_gzip = False
+                    return True
+            if not self._body_confirmed and status in BODY_UNSUPPORTED_STATUSES:
+                log.debug("URLs in request bodies not supported (%s)", status)
+                self.use_body = False
+                return True
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_chunk_encoding(route: str) -> ChunkEncoding:
+    """Return the encoding of the chunks of a route."""
+    log.debug("Chunk encoding for route %s", route)
+    return ChunkEncoding(
+        transport=ENV.dinamis_sdk_signing_transport,
+        use_gzip=ENV.dinamis_sdk_signing_gzip,
+    )
@@ -6,7 +6,8 @@ import click
 
 from .model import ApiKey
 from .http import OAuth2ConnectionMethod
-from .utils import get_logger_for, create_session
+from .transport import get_session
+from .utils import get_logger_for
 
 log = get_logger_for(__name__)
 conn = OAuth2ConnectionMethod()
@@ -19,7 +20,7 @@ def app() -> None:
 
 def _http(route: str):
     """Perform an HTTP request."""
-    session = create_session()
+    session = get_session()
     ret = session.get(
         f"{conn.endpoint}{route}",
         timeout=5,
@@ -1,13 +1,25 @@
 """HTTP connections with various methods."""
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 from ast import literal_eval
+from datetime import datetime
+from urllib.parse import urlparse
+import requests
 from pydantic import BaseModel, ConfigDict
-from .utils import get_logger_for, create_session
-from .oauth2 import OAuth2Session, retrieve_token_endpoint
+from . import metrics
+from .utils import get_logger_for
+from .oauth2 import OAuth2Session, fetch_userinfo, get_endpoints
 from .model import ApiKey
-from .settings import ENV
-
+from .settings import ENV, LOCAL_SIGNING_URL_DURATION
+from .ratelimit import TokenBucket, get_rate_limiter
+from .sigv4 import Presigner
+from .retry import (
+    CircuitBreaker,
+    get_circuit_breaker,
+    get_retry_policy,
+    parse_retry_after,
+)
+from .transport import get_session
 
 log = get_logger_for(__name__)
 
@@ -34,11 +46,9 @@ class OAuth2ConnectionMethod(BareConnectionMethod):
 
     def get_userinfo(self):
         """Override parent method from BareConnectionMethod."""
-        openapi_url = retrieve_token_endpoint().replace("/token", "/userinfo")
-        return (
-            create_session()
-            .get(openapi_url, timeout=10, headers=self.get_headers())
-            .json()
+        return fetch_userinfo(
+            get_endpoints().userinfo_endpoint,
+            self.oauth2_session.get_access_token(),
         )
 
 
@@ -52,15 +62,59 @@ class ApiKeyConnectionMethod(BareConnectionMethod):
         return self.api_key.to_dict()
 
 
+class LocalSigningConnectionMethod(ApiKeyConnectionMethod):
+    """API key connection method, presigning URLs locally.
+
+    URLs are presigned with AWS Signature Version 4, using the API key as S3
+    credentials, without any request to the signing endpoint. The signing
+    endpoint is still used for URLs that cannot be presigned locally.
+    """
+
+    region: str = ENV.dinamis_sdk_s3_region
+    url_duration: int = ENV.dinamis_sdk_url_duration or LOCAL_SIGNING_URL_DURATION
+
+    def presign_urls(
+        self, urls: List[str], method: str
+    ) -> Tuple[Dict[str, Tuple[str, datetime]], List[str]]:
+        """Presign URLs.
+
+        Args:
+            urls: urls
+            method: HTTP method ("GET" or "PUT")
+
+        Returns:
+            dict of key = URL, value = (presigned URL, expiry), and the list of
+            URLs that could not be presigned
+
+        """
+        try:
+            presigner = Presigner(
+                access_key=self.api_key.access_key,
+                secret_key=self.api_key.secret_key,
+                method=method,
+                region=self.region,
+                expires=self.url_duration,
+            )
+        except ValueError as err:
+            # e.g. duration longer than the SigV4 maximum
+            log.warning("Unable to presign URLs locally (%s)", err)
+            return {}, list(urls)
+        presigned = {}
+        failed = []
+        for url in urls:
+            try:
+                presigned[url] = (presigner.presign(url), presigner.expiry)
+            except ValueError as err:
+                log.debug("Unable to presign %s locally (%s)", url, err)
+                failed.append(url)
+        return presigned, failed
+
+
 class HTTPSession:
     """HTTP session class."""
 
-    def __init__(self, timeout=10):
+    def __init__(self, timeout: float = 10):
         """Initialize the HTTP session."""
-        self.session = create_session(
-            retry_total=ENV.dinamis_sdk_retry_total,
-            retry_backoff_factor=ENV.dinamis_sdk_retry_backoff_factor,
-        )
         self.timeout = timeout
         self.headers = {
             "Content-Type": "application/json",
@@ -68,6 +122,26 @@ class HTTPSession:
         }
         self._method = None
 
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Circuit breaker of the signing endpoint."""
+        return get_circuit_breaker(urlparse(self.get_method().endpoint).netloc)
+
+    @property
+    def limiter(self) -> TokenBucket | None:
+        """Rate limiter of the signing endpoint (None when disabled)."""
+        return get_rate_limiter(urlparse(self.get_method().endpoint).netloc)
+
+    @property
+    def session(self) -> requests.Session:
+        """Requests session (shared connection pool)."""
+        return get_session(
+            get_retry_policy("signing"),
+            pool_maxsize=ENV.dinamis_sdk_signing_concurrency,
+            breaker=self.breaker,
+            limiter=self.limiter,
+        )
+
     def get_method(self):
         """Get method."""
         log.debug("Get method")
@@ -86,23 +160,85 @@ class HTTPSession:
 
         # API key method
         elif api_key := ApiKey.grab():
-            self._method = ApiKeyConnectionMethod(api_key=api_key)
+            if ENV.dinamis_sdk_local_signing:
+                self._method = LocalSigningConnectionMethod(api_key=api_key)
+            else:
+                self._method = ApiKeyConnectionMethod(api_key=api_key)
 
         # OAuth2 method
         else:
+            if ENV.dinamis_sdk_local_signing:
+                log.warning("Local signing requires an API key")
             self._method = OAuth2ConnectionMethod()
 
-    def post(self, route: str, params: Dict):
-        """Perform a POST request."""
+    def prepare_request(self, route: str) -> Tuple[str, Dict[str, str]]:
+        """Return the URL and the headers of a request to the given route."""
         method = self.get_method()
         url = f"{method.endpoint}{route}"
         headers = {**self.headers, **method.get_headers()}
+        return url, headers
+
+    def post(
+        self,
+        route: str,
+        params: Dict | None = None,
+        data: bytes | None = None,
+        extra_headers: Dict[str, str] | None = None,
+        log_errors: bool = True,
+    ):
+        """Perform a POST request.
+
+        Args:
+            route: route
+            params: query parameters
+            data: request body
+            extra_headers: headers added to the default ones
+            log_errors: log the body of error responses
+
+        Returns:
+            the response
+
+        """
+        url, headers = self.prepare_request(route)
+        if extra_headers:
+            headers.update(extra_headers)
+        breaker = self.breaker
+        breaker.check(url)
+        if limiter := self.limiter:
+            limiter.acquire()
         log.debug("POST to %s", url)
-        response = self.session.post(url, params=params, headers=headers, timeout=10)
+        with metrics.timer("dinamis_sdk_http_request_seconds", route=route) as labels:
+            try:
+                response = self.session.post(
+                    url, params=params, data=data, headers=headers, timeout=10
+                )
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                raise
+            breaker.record_response(response.status_code)
+            labels["status"] = str(response.status_code)
+        if limiter:
+            # 429 responses that are retried slow down the limiter in `Retry`
+            if response.status_code == 429:
+                limiter.on_throttled(parse_retry_after(response.headers))
+            elif response.status_code < 400:
+                limiter.on_success()
+        if metrics.is_enabled():
+            metrics.inc("dinamis_sdk_http_requests_total", **labels)
+            retries = getattr(response.raw, "retries", None)
+            if retries and retries.history:
+                metrics.inc(
+                    "dinamis_sdk_http_retries_total", len(retries.history), route=route
+                )
         try:
             response.raise_for_status()
         except Exception as e:
-            log.error(literal_eval(response.text))
+            if not log_errors:
+                raise e
+            try:
+                log.error(literal_eval(response.text))
+            except (ValueError, SyntaxError):
+                log.error(response.text)
             raise e
 
         return response
@@ -118,7 +254,10 @@ def get_headers() -> dict[str, Any]:
 
 def get_userinfo() -> dict[str, str]:
     """Return userinfo."""
-    return OAuth2ConnectionMethod().get_userinfo()
+    method = session.get_method()
+    if not isinstance(method, OAuth2ConnectionMethod):
+        method = OAuth2ConnectionMethod()
+    return method.get_userinfo()
 
 
 def get_username() -> str:
@@ -0,0 +1,261 @@
+"""Metrics of the signing, caching, authentication and uploads.
+
+Metrics are disabled by default, and recording them is then a no-op. They are
+enabled with `enable()` (or the `DINAMIS_SDK_METRICS` environment variable),
+which records them in an in-process registry, and/or with `add_hook()`, which
+calls a function for each recorded value (e.g. to forward them to another
+monitoring system).
+
+Example:
+    ```python
+    dinamis_sdk.metrics.enable()
+    ...
+    print(dinamis_sdk.metrics.export_prometheus())
+    ```
+
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from .settings import ENV
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+BYTES_BUCKETS = tuple(4**i * 1024 for i in range(11))
+
+# Buckets of the histograms that are not latencies
+BUCKETS: Dict[str, Sequence[float]] = {
+    "dinamis_sdk_batch_urls": SIZE_BUCKETS,
+    "dinamis_sdk_upload_bytes": BYTES_BUCKETS,
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Hook = Callable[[str, float, Dict[str, str]], None]
+
+
+class Histogram:
+    """Histogram of observed values."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """Initialize the histogram.
+
+        Args:
+            buckets: upper bounds of the buckets, in ascending order
+
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Add a value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process registry of counters and histograms.
+
+    The registry is thread-safe.
+
+    """
+
+    def __init__(self):
+        """Initialize the registry."""
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float, labels: Labels):
+        """Increment a counter."""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Labels):
+        """Add a value to a histogram."""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if labels not in series:
+                series[labels] = Histogram(BUCKETS.get(name, LATENCY_BUCKETS))
+            series[labels].observe(value)
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        """Return the value of a counter."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels(labels), 0.0)
+
+    def get_histogram(self, name: str, **labels: str) -> Histogram | None:
+        """Return a histogram."""
+        with self._lock:
+            return self._histograms.get(name, {}).get(_labels(labels))
+
+    def clear(self):
+        """Remove all the metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """Export the metrics in the Prometheus text format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, counters in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in counters.items():
+                    lines.append(f"{name}{_format(labels)} {value:g}")
+            for name, histograms in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in histograms.items():
+                    cumulated = 0
+                    bounds = [f"{bound:g}" for bound in hist.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, hist.counts):
+                        cumulated += count
+                        bucket_labels = _format((*labels, ("le", bound)))
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulated}")
+                    lines.append(f"{name}_sum{_format(labels)} {hist.sum:g}")
+                    lines.append(f"{name}_count{_format(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    """Return the labels as a hashable key."""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    """Format labels for the Prometheus text format."""
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class _State:  # pylint: disable = R0903
+    """Current registry and hooks."""
+
+    registry: MetricsRegistry | None = None
+    hooks: List[Hook] = []
+    enabled = False
+
+
+_STATE = _State()
+
+
+def enable(registry: MetricsRegistry | None = None) -> MetricsRegistry:
+    """Record the metrics in a registry.
+
+    Args:
+        registry: registry (a new one is created if not provided)
+
+    Returns:
+        the registry
+
+    """
+    _STATE.registry = registry or _STATE.registry or MetricsRegistry()
+    _STATE.enabled = True
+    return _STATE.registry
+
+
+def disable():
+    """Stop recording the metrics in the registry."""
+    _STATE.registry = None
+    _STATE.enabled = bool(_STATE.hooks)
+
+
+def get_registry() -> MetricsRegistry | None:
+    """Return the current registry (None when metrics are not recorded)."""
+    return _STATE.registry
+
+
+def add_hook(hook: Hook):
+    """Call a function for each recorded value.
+
+    Args:
+        hook: function called with the name of the metric, the value (the
+            increment of a counter, or the observed value of a histogram),
+            and the labels
+
+    """
+    _STATE.hooks = [*_STATE.hooks, hook]
+    _STATE.enabled = True
+
+
+def remove_hook(hook: Hook):
+    """Remove a hook added with `add_hook()`."""
+    _STATE.hooks = [other for other in _STATE.hooks if other is not hook]
+    _STATE.enabled = bool(_STATE.registry or _STATE.hooks)
+
+
+def is_enabled() -> bool:
+    """Return True if metrics are recorded."""
+    return _STATE.enabled
+
+
+def inc(name: str, value: float = 1, /, **labels: str):
+    """Increment a counter."""
+    if not _STATE.enabled:
+        return
+    if registry := _STATE.registry:
+        registry.inc(name, value, _labels(labels))
+    for hook in _STATE.hooks:
+        hook(name, value, labels)
+
+
+def observe(name: str, value: float, /, **labels: str):
+    """Add a value to a histogram."""
+    if not _STATE.enabled:
+        return
+    if registry := _STATE.registry:
+        registry.observe(name, value, _labels(labels))
+    for hook in _STATE.hooks:
+        hook(name, value, labels)
+
+
+@contextmanager
+def timer(name: str, /, **labels: str) -> Iterator[Dict[str, str]]:
+    """Observe the duration of a block of code, in seconds.
+
+    The labels can be completed inside the block, e.g. with the status of a
+    request.
+    """
+    if not _STATE.enabled:
+        yield labels
+        return
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def export_prometheus(path: str | None = None) -> str:
+    """Export the metrics of the current registry in the Prometheus text format.
+
+    Args:
+        path: file to write (e.g. for the textfile collector of the Prometheus
+            node exporter)
+
+    Returns:
+        the metrics
+
+    """
+    text = _STATE.registry.to_prometheus() if _STATE.registry else ""
+    if path:
+        with open(path, "w", encoding="utf-8") as file_handler:
+            file_handler.write(text)
+    return text
+
+
+if ENV.dinamis_sdk_metrics:
+    enable()
@@ -1,10 +1,14 @@
 """Models."""
 
 import os
+import base64
 import json
-from typing import Dict
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
 from pydantic import BaseModel, Field, ConfigDict  # pylint: disable = no-name-in-module
-from .utils import get_logger_for
+from .utils import file_lock, get_logger_for
 from .settings import ENV, get_config_path
 
 log = get_logger_for(__name__)
@@ -61,14 +65,39 @@ class Serializable(BaseModel):  # pylint: disable = R0903
         return None
 
     def to_file(self, file_path: str):
-        """Save the object to file."""
+        """Save the object to file.
+
+        The file is replaced atomically, so that other processes read either
+        the previous object or the new one. It is only readable by the user.
+        """
         try:
             log.debug("Writing JSON file %s", file_path)
-            with open(file_path, "w", encoding="utf-8") as file_handler:
-                json.dump(self.to_dict(), file_handler)
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(file_path) or None,
+                prefix=f"{os.path.basename(file_path)}.",
+                suffix=".tmp",
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file_handler:
+                    json.dump(self.to_dict(), file_handler)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
         except IOError as io_err:
             log.warning("Unable to save file %s (%s)", file_path, io_err)
 
+    @classmethod
+    @contextmanager
+    def lock_config_file(cls) -> Iterator[None]:
+        """Lock the config file against other processes, e.g. to update it."""
+        cfg_file = cls.get_cfg_file_name()
+        if not cfg_file:
+            yield
+            return
+        with file_lock(f"{cfg_file}.lock"):
+            yield
+
     @classmethod
     def delete_from_config_dir(cls):
         """Delete the config file, if there."""
@@ -78,13 +107,68 @@ class Serializable(BaseModel):  # pylint: disable = R0903
 
 
 class JWT(Serializable):
-    """JWT model."""
+    """JWT model.
+
+    The absolute expiries (UNIX timestamps) of the tokens are saved with
+    them, so that other processes know whether they are still valid. They
+    are 0 when unknown, or when the refresh token does not expire.
+    """
 
     access_token: str
     expires_in: int
     refresh_token: str
     refresh_expires_in: int
     token_type: str
+    expires_at: float = 0.0
+    refresh_expires_at: float = 0.0
+
+    def set_issuance(self, issued_at: float):
+        """Set the absolute expiries from the time the tokens were issued.
+
+        Args:
+            issued_at: UNIX timestamp of the token request
+
+        """
+        self.expires_at = issued_at + self.expires_in
+        if self.refresh_expires_in:
+            self.refresh_expires_at = issued_at + self.refresh_expires_in
+
+    def get_claims(self) -> Dict[str, Any]:
+        """Return the claims of the access token (not verified)."""
+        try:
+            payload = self.access_token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "==="))
+        except (IndexError, ValueError):
+            return {}
+        return claims if isinstance(claims, dict) else {}
+
+    def get_expiry(self) -> float:
+        """Return the expiry of the access token (0 when unknown).
+
+        The `exp` claim of the access token is used for tokens saved without
+        their expiry.
+        """
+        if self.expires_at:
+            return self.expires_at
+        exp = self.get_claims().get("exp")
+        return float(exp) if isinstance(exp, (int, float)) else 0.0
+
+
+class OAuth2Endpoints(Serializable):
+    """OAuth2 endpoints discovered from the signing endpoint."""
+
+    signing_endpoint: str
+    token_endpoint: str
+    device_endpoint: str
+    userinfo_endpoint: str
+    retrieved_at: float
+
+    def is_valid_for(self, signing_endpoint: str, ttl: float) -> bool:
+        """Return True if the endpoints can still be used."""
+        return (
+            self.signing_endpoint == signing_endpoint
+            and time.time() - self.retrieved_at < ttl
+        )
 
 
 class DeviceGrantResponse(BaseModel):  # pylint: disable = R0903
@@ -2,45 +2,98 @@
 
 import datetime
 import io
+import os
+import threading
 import time
 from abc import abstractmethod
-from typing import Dict
-import qrcode  # type: ignore
-from .utils import create_session, get_logger_for
-from .model import JWT, DeviceGrantResponse
+from functools import lru_cache
+from typing import Any, Dict
+from . import metrics
+from .utils import BackgroundThread, get_logger_for
+from .model import JWT, DeviceGrantResponse, OAuth2Endpoints
 from .settings import ENV
+from .retry import get_retry_policy
+from .transport import get_session
 
 log = get_logger_for(__name__)
 
 
-def retrieve_token_endpoint():
-    """Retrieve the token endpoint from the s3 signing endpoint."""
-    openapi_url = ENV.dinamis_sdk_signing_endpoint + "openapi.json"
+# OAuth2 endpoints, by signing endpoint
+_ENDPOINTS: Dict[str, OAuth2Endpoints] = {}
+_ENDPOINTS_LOCK = threading.Lock()
+
+
+def discover_endpoints(signing_endpoint: str) -> OAuth2Endpoints:
+    """Retrieve the OAuth2 endpoints from the s3 signing endpoint."""
+    openapi_url = signing_endpoint + "openapi.json"
     log.debug("Fetching OAuth2 endpoint from openapi url %s", openapi_url)
-    _session = create_session()
+    _session = get_session(get_retry_policy("auth"))
     res = _session.get(
         openapi_url,
         timeout=10,
     )
     res.raise_for_status()
     data = res.json()
-    return data["components"]["securitySchemes"]["OAuth2PasswordBearer"]["flows"][
-        "password"
-    ]["tokenUrl"]
+    token_endpoint = data["components"]["securitySchemes"]["OAuth2PasswordBearer"][
+        "flows"
+    ]["password"]["tokenUrl"]
+    return OAuth2Endpoints(
+        signing_endpoint=signing_endpoint,
+        token_endpoint=token_endpoint,
+        device_endpoint=f"{token_endpoint.rsplit('/', 1)[0]}/auth/device",
+        userinfo_endpoint=token_endpoint.replace("/token", "/userinfo"),
+        retrieved_at=time.time(),
+    )
+
+
+def get_endpoints() -> OAuth2Endpoints:
+    """Get the OAuth2 endpoints.
+
+    The endpoints are retrieved once per process. They are also saved in the
+    config directory, and reused by other processes during
+    `ENV.dinamis_sdk_discovery_ttl` seconds.
+    """
+    signing_endpoint = ENV.dinamis_sdk_signing_endpoint
+    ttl = ENV.dinamis_sdk_discovery_ttl
+    with _ENDPOINTS_LOCK:
+        if endpoints := _ENDPOINTS.get(signing_endpoint):
+            return endpoints
+        if ttl:
+            endpoints = OAuth2Endpoints.from_config_dir()
+        if not (endpoints and endpoints.is_valid_for(signing_endpoint, ttl)):
+            endpoints = discover_endpoints(signing_endpoint)
+            if ttl:
+                endpoints.to_config_dir()
+        _ENDPOINTS[signing_endpoint] = endpoints
+        return endpoints
+
+
+def retrieve_token_endpoint():
+    """Retrieve the token endpoint from the s3 signing endpoint."""
+    return get_endpoints().token_endpoint
+
+
+@lru_cache(maxsize=8)
+def fetch_userinfo(userinfo_endpoint: str, access_token: str) -> Dict[str, Any]:
+    """Fetch the userinfo of an access token (cached)."""
+    res = get_session(get_retry_policy("auth")).get(
+        userinfo_endpoint,
+        timeout=10,
+        headers={"authorization": f"bearer {access_token}"},
+    )
+    res.raise_for_status()
+    return res.json()
 
 
 class GrantMethodBase:
     """Base class for grant methods."""
 
     headers: Dict[str, str] = {"Content-Type": "application/x-www-form-urlencoded"}
-    _token_endpoint: str | None = None
     client_id: str
 
     def get_token_endpoint(self):
         """Get the token endpoint."""
-        if not self._token_endpoint:
-            self._token_endpoint = retrieve_token_endpoint()
-        return retrieve_token_endpoint()
+        return get_endpoints().token_endpoint
 
     @abstractmethod
     def get_first_token(self) -> JWT:
@@ -57,11 +110,9 @@ class GrantMethodBase:
 
     def get_userinfo(self):
         """Get the userinfo endpoint."""
-        if not self._token_endpoint:
-            self._token_endpoint = retrieve_token_endpoint()
-        openapi_url = retrieve_token_endpoint().replace("/token", "/userinfo")
+        openapi_url = get_endpoints().userinfo_endpoint
 
-        _session = create_session()
+        _session = get_session(get_retry_policy("auth"))
         res = _session.get(openapi_url, timeout=10, headers=self.headers)
         return res.json()
 
@@ -76,7 +127,7 @@ class GrantMethodBase:
                 "grant_type": "refresh_token",
             }
         )
-        ret = create_session().post(
+        ret = get_session(get_retry_policy("auth")).post(
             self.get_token_endpoint(),
             headers=self.headers,
             data=data,
@@ -95,9 +146,9 @@ class DeviceGrant(GrantMethodBase):
 
     def get_first_token(self) -> JWT:
         """Get the first JWT token."""
-        device_endpoint = f"{self.get_token_endpoint().rsplit('/', 1)[0]}/auth/device"
+        device_endpoint = get_endpoints().device_endpoint
 
-        req = create_session()
+        req = get_session(get_retry_policy("auth"))
         log.debug("Getting token using device authorization grant")
         ret = req.post(
             device_endpoint,
@@ -112,6 +163,8 @@ class DeviceGrant(GrantMethodBase):
             log.info("\033[92m %s \033[0m", verif_url_comp)
 
             # QR code
+            import qrcode  # type: ignore  # pylint: disable = C0415
+
             qr_code = qrcode.QRCode()
             qr_code.add_data(verif_url_comp)
             buffer = io.StringIO()
@@ -152,60 +205,267 @@ class DeviceGrant(GrantMethodBase):
 
 
 class OAuth2Session:
-    """Class to start an OAuth2 session."""
+    """Class to start an OAuth2 session.
+
+    The JWT is shared with the other processes using the same config
+    directory. Refreshes are done under a lock of the JWT file: the first
+    process refreshes the token, and the others read the new one from the
+    file instead of refreshing it again.
+
+    With `background_refresh`, the access token is refreshed by a background
+    thread before its TTL goes below `jwt_ttl_margin_seconds` (see
+    `TokenRefresher`), so that callers of `get_access_token()` do not wait
+    for the refresh.
+    """
+
+    def __init__(
+        self,
+        grant_type: type[GrantMethodBase] = DeviceGrant,
+        background_refresh: bool | None = None,
+    ):
+        """Initialize.
 
-    def __init__(self, grant_type: type[GrantMethodBase] = DeviceGrant):
-        """Initialize."""
+        Args:
+            grant_type: grant method
+            background_refresh: refresh the access token in a background
+                thread (defaults to `ENV.dinamis_sdk_token_background_refresh`)
+
+        """
         self.grant = grant_type()
         self.jwt_ttl_margin_seconds = 60
-        self.jwt_issuance = datetime.datetime(year=1, month=1, day=1)
         self.jwt: JWT | None = None
+        self.background_refresh = (
+            ENV.dinamis_sdk_token_background_refresh
+            if background_refresh is None
+            else background_refresh
+        )
+        self._refresher: TokenRefresher | None = None
+        self._lock = threading.Lock()
+
+    def save_token(self, now: datetime.datetime, jwt: JWT | None = None):
+        """Save the JWT to disk.
 
-    def save_token(self, now: datetime.datetime):
-        """Save the JWT to disk."""
+        Args:
+            now: time of the token request, from which the tokens expire
+            jwt: new JWT, replacing the current one once its expiry is set
+                (so that concurrent callers never use it without expiry)
+
+        """
+        if jwt:
+            jwt.set_issuance(now.timestamp())
+            self.jwt = jwt
+        elif self.jwt:
+            self.jwt.set_issuance(now.timestamp())
         if self.jwt:
-            self.jwt_issuance = now
             self.jwt.to_config_dir()
         else:
             log.fatal("No OAuth2 credentials to save")
 
+    def load_token(self) -> bool:
+        """Load the JWT from disk, e.g. saved by another process.
+
+        For a JWT saved without its expiry, nor `exp` claim, the issuance is
+        the time when the file was written, just after the token has been
+        retrieved.
+
+        Returns:
+            True if a new JWT has been loaded
+
+        """
+        cfg_file = JWT.get_cfg_file_name()
+        jwt = JWT.from_file(cfg_file) if cfg_file else None
+        if not cfg_file or not jwt:
+            return False
+        is_new = not self.jwt or jwt.access_token != self.jwt.access_token
+        if is_new:
+            log.debug("Using the JWT saved by another process")
+        if not jwt.get_expiry():
+            try:
+                jwt.set_issuance(os.path.getmtime(cfg_file))
+            except OSError:
+                pass
+        self.jwt = jwt
+        return is_new
+
+    def _access_token_ttl(self) -> float:
+        """Return the remaining time to live of the access token, in seconds."""
+        assert self.jwt, "JWT is empty"
+        return self.jwt.get_expiry() - time.time()
+
+    def _refresh_token_ttl(self) -> float | None:
+        """Return the remaining time to live of the refresh token, if known."""
+        assert self.jwt, "JWT is empty"
+        if not self.jwt.refresh_expires_at:
+            return None
+        return self.jwt.refresh_expires_at - time.time()
+
     def refresh_if_needed(self):
         """Refresh the token if ttl is too short."""
         ttl_margin_seconds = 30
-        now = datetime.datetime.now()
-        jwt_expires_in = datetime.timedelta(seconds=self.jwt.expires_in)
-        access_token_ttl = self.jwt_issuance + jwt_expires_in - now
-        access_token_ttl_seconds = access_token_ttl.total_seconds()
+        access_token_ttl_seconds = self._access_token_ttl()
         log.debug("access_token_ttl is %s", access_token_ttl_seconds)
         if access_token_ttl_seconds >= ttl_margin_seconds:
             # Token is still valid
             log.debug("Credentials still valid")
             return
-        if access_token_ttl_seconds < ttl_margin_seconds:
-            # Access token in not valid, but refresh might be
-            try:
-                self.jwt = self.grant.refresh_token(self.jwt)
-            except ConnectionError as con_err:
-                log.warning(
-                    "Unable to refresh token (reason: %s). "
-                    "Renewing initial authentication.",
-                    con_err,
-                )
-                self.jwt = self.grant.get_first_token()
-        else:
-            self.jwt = self.grant.get_first_token()
-        self.save_token(now)
+        with self._lock, JWT.lock_config_file():
+            # The token might have been refreshed by another thread or process
+            # while waiting for the lock
+            self.load_token()
+            if self._access_token_ttl() >= ttl_margin_seconds:
+                log.debug("Credentials refreshed by another process or thread")
+                return
+            now = datetime.datetime.now()
+            grant = type(self.grant).__name__
+            refresh_token_ttl = self._refresh_token_ttl()
+            with metrics.timer(
+                "dinamis_sdk_token_refresh_seconds", grant=grant
+            ) as labels:
+                labels["outcome"] = "error"
+                if refresh_token_ttl is None or refresh_token_ttl >= ttl_margin_seconds:
+                    # Access token in not valid, but refresh might be
+                    try:
+                        jwt = self.grant.refresh_token(self.jwt)
+                        labels["outcome"] = "refreshed"
+                    except ConnectionError as con_err:
+                        log.warning(
+                            "Unable to refresh token (reason: %s). "
+                            "Renewing initial authentication.",
+                            con_err,
+                        )
+                        jwt = self.grant.get_first_token()
+                        labels["outcome"] = "renewed"
+                else:
+                    log.info("Refresh token expired, renewing initial authentication")
+                    jwt = self.grant.get_first_token()
+                    labels["outcome"] = "renewed"
+                self.save_token(now, jwt)
+        metrics.inc("dinamis_sdk_token_refreshes_total", **labels)
+
+    def refresh_in_background(self) -> float | None:
+        """Refresh the access token before it reaches the TTL margin.
+
+        Only the refresh token is used: when it is expired or rejected, the
+        token is left as it is, and `get_access_token()` falls back to the
+        initial authentication once the access token expires.
+
+        Returns:
+            the delay before the next refresh, in seconds, or None when the
+            token can not be refreshed
+
+        """
+        jwt = self.jwt
+        if not jwt:
+            return None
+        # Tokens with a short lifetime are refreshed at half of it
+        margin = min(self.jwt_ttl_margin_seconds, jwt.expires_in / 2)
+        if (delay := self._access_token_ttl() - margin) > 0:
+            return delay
+        with self._lock, JWT.lock_config_file():
+            # The token might have been refreshed by another process
+            self.load_token()
+            if (delay := self._access_token_ttl() - margin) > 0:
+                return delay
+            refresh_token_ttl = self._refresh_token_ttl()
+            if refresh_token_ttl is not None and refresh_token_ttl < margin:
+                log.debug("Refresh token expired, not refreshed in background")
+                return None
+            now = datetime.datetime.now()
+            grant = type(self.grant).__name__
+            with metrics.timer(
+                "dinamis_sdk_token_refresh_seconds", grant=grant
+            ) as labels:
+                labels["outcome"] = "error"
+                assert self.jwt, "JWT is empty"
+                jwt = self.grant.refresh_token(self.jwt)
+                labels["outcome"] = "refreshed"
+                self.save_token(now, jwt)
+        metrics.inc("dinamis_sdk_token_refreshes_total", **labels)
+        log.debug("Access token refreshed in background")
+        return self._access_token_ttl() - margin
+
+    def start_refresher(self):
+        """Start the background refresh of the access token."""
+        if not (self._refresher and self._refresher.is_running()):
+            self._refresher = TokenRefresher(self)
+            self._refresher.start()
+
+    def stop_refresher(self):
+        """Stop the background refresh of the access token."""
+        if self._refresher:
+            self._refresher.stop()
+            self._refresher = None
 
     def get_access_token(self) -> str:
         """Return the access token."""
         if not self.jwt:
-            # First JWT initialisation
-            self.jwt = JWT.from_config_dir()
+            # First JWT initialisation, with its expiry: a valid JWT is used
+            # without refreshing it
+            self.load_token()
         if not self.jwt:
-            # When JWT is still `None`, we use the grant method
-            self.jwt = self.grant.get_first_token()
-            self.save_token(datetime.datetime.now())
+            # When JWT is still `None`, we use the grant method, unless another
+            # thread or process did it while waiting for the lock
+            with self._lock, JWT.lock_config_file():
+                if not self.jwt and not self.load_token():
+                    jwt = self.grant.get_first_token()
+                    self.save_token(datetime.datetime.now(), jwt)
 
         self.refresh_if_needed()
+        if self.background_refresh:
+            self.start_refresher()
 
+        assert self.jwt, "JWT is empty"
         return self.jwt.access_token
+
+
+class TokenRefresher(BackgroundThread):
+    """Refresh the access token of an OAuth2 session in a background thread.
+
+    The access token is refreshed when its TTL goes below the
+    `jwt_ttl_margin_seconds` of the session, which happens before callers of
+    `get_access_token()` need to refresh it. The new token is swapped in
+    atomically.
+
+    Example:
+        ```python
+        with TokenRefresher(session):
+            ...
+        ```
+
+    """
+
+    thread_name = "dinamis-sdk-token-refresher"
+
+    def __init__(
+        self,
+        session: OAuth2Session,
+        interval: float = 60.0,
+        retry_interval: float = 10.0,
+    ):
+        """Initialize the refresher.
+
+        Args:
+            session: OAuth2 session
+            interval: maximum number of seconds between two checks of the
+                token (e.g. to use a token refreshed by another process)
+            retry_interval: seconds before retrying a failed refresh
+
+        """
+        self.session = session
+        self.interval = interval
+        self.retry_interval = retry_interval
+        super().__init__()
+
+    def _run(self):
+        """Refresh loop."""
+        log.debug("Token refresher started")
+        while True:
+            try:
+                delay = self.session.refresh_in_background()
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                log.warning("Unable to refresh token in background (%s)", err)
+                delay = self.retry_interval
+            delay = min(self.interval, max(1.0, delay or self.interval))
+            if self._stop_event.wait(delay):
+                break
+        log.debug("Token refresher stopped")
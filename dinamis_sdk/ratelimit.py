@@ -0,0 +1,259 @@
+"""Client-side rate limiting of the requests to the signing endpoint.
+
+Requests take a token from a token bucket, refilled at
+`DINAMIS_SDK_RATE_LIMIT` tokens per second, and wait until a token is
+available. The bucket can be shared by all the processes using the same
+config directory (e.g. the workers of a cluster node): its state is then
+stored in an SQLite database, and updated in exclusive transactions.
+
+The rate adapts to the server: it is halved after a 429 (Too Many Requests)
+response, and no token is given until the delay of the `Retry-After` header
+has elapsed. It then increases again by steps of 1/20 of the configured rate
+after each successful request. Since each request reserves its own slot,
+throttled clients resume one after another instead of retrying in lockstep.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Iterator, NamedTuple, Tuple, TypeVar
+
+from . import metrics
+from .settings import ENV, get_config_path
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+T = TypeVar("T")
+
+
+class BucketState(NamedTuple):
+    """State of a token bucket."""
+
+    tokens: float
+    # Time (UNIX timestamp) of the last update of the tokens
+    updated: float
+    # Current rate, in tokens per second
+    rate: float
+    # Time (UNIX timestamp) of the last rate decrease
+    throttled_at: float = 0.0
+
+
+class TokenBucket:
+    """Token bucket, shared by the threads of a process.
+
+    Wall-clock time is used (not `time.monotonic()`) so that the state can
+    be shared with other processes (see `SharedTokenBucket`).
+    """
+
+    # Step of the rate increase after a successful request, and minimum
+    # rate, as ratios of the configured rate
+    increase_ratio = 0.05
+    min_rate_ratio = 1 / 16
+    # Minimum time between two rate decreases, in seconds (requests sent
+    # before the first 429 should not decrease the rate again)
+    decrease_interval = 1.0
+    # Whether the state is updated with blocking I/O
+    blocking = False
+
+    def __init__(self, rate: float, burst: int = 0):
+        """Initialize the token bucket.
+
+        Args:
+            rate: maximum rate, in tokens (requests) per second
+            burst: capacity of the bucket, i.e. number of requests that can
+                be sent at once (defaults to one second of requests)
+
+        """
+        self.max_rate = rate
+        self.burst = burst or max(1, round(rate))
+        self._lock = threading.Lock()
+        self._state = self._initial_state()
+
+    def _initial_state(self) -> BucketState:
+        """Return the state of a full bucket."""
+        return BucketState(tokens=self.burst, updated=time.time(), rate=self.max_rate)
+
+    def _transaction(self, func: Callable[[BucketState], Tuple[BucketState, T]]) -> T:
+        """Update the state of the bucket, and return the result of `func`."""
+        with self._lock:
+            self._state, result = func(self._state)
+        return result
+
+    def _refill(self, state: BucketState, now: float) -> BucketState:
+        """Return the state with the tokens added since the last update."""
+        tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+        return state._replace(tokens=tokens, updated=now)
+
+    def reserve(self) -> float:
+        """Take a token, and return the delay before using it, in seconds."""
+
+        def take(state: BucketState) -> Tuple[BucketState, float]:
+            state = self._refill(state, time.time())
+            tokens = state.tokens - 1
+            wait = -tokens / state.rate if tokens < 0 else 0.0
+            return state._replace(tokens=tokens), wait
+
+        return self._transaction(take)
+
+    def acquire(self):
+        """Wait until a request can be sent."""
+        wait = self.reserve()
+        metrics.observe("dinamis_sdk_rate_limit_wait_seconds", wait)
+        if wait > 0:
+            log.debug("Rate limited, waiting %.2fs", wait)
+            time.sleep(wait)
+
+    async def call_async(self, func: Callable[..., T], *args: Any) -> T:
+        """Call a method of the bucket from a coroutine.
+
+        Buckets updated with blocking I/O (see `SharedTokenBucket`) are
+        updated in a thread, so that the event loop is not blocked.
+        """
+        if self.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def acquire_async(self):
+        """Wait until a request can be sent, without blocking the event loop."""
+        wait = await self.call_async(self.reserve)
+        metrics.observe("dinamis_sdk_rate_limit_wait_seconds", wait)
+        if wait > 0:
+            log.debug("Rate limited, waiting %.2fs", wait)
+            await asyncio.sleep(wait)
+
+    def on_throttled(self, retry_after: float | None = None):
+        """Slow down after a request rejected with a 429 status.
+
+        Args:
+            retry_after: delay requested by the server, in seconds
+
+        """
+
+        def throttle(state: BucketState) -> Tuple[BucketState, float]:
+            now = time.time()
+            state = self._refill(state, now)
+            if now - state.throttled_at >= self.decrease_interval:
+                rate = max(self.max_rate * self.min_rate_ratio, state.rate / 2)
+                state = state._replace(rate=rate, throttled_at=now)
+            if retry_after:
+                # No token before the delay requested by the server
+                tokens = min(state.tokens, -retry_after * state.rate)
+                state = state._replace(tokens=tokens)
+            return state, state.rate
+
+        rate = self._transaction(throttle)
+        metrics.inc("dinamis_sdk_rate_limit_throttled_total")
+        log.debug("Throttled by the server, rate is now %.2f/s", rate)
+
+    def on_success(self):
+        """Speed up again after a successful request."""
+
+        def increase(state: BucketState) -> Tuple[BucketState, None]:
+            if state.rate >= self.max_rate:
+                return state, None
+            state = self._refill(state, time.time())
+            rate = min(self.max_rate, state.rate + self.max_rate * self.increase_ratio)
+            return state._replace(rate=rate), None
+
+        self._transaction(increase)
+
+    @property
+    def rate(self) -> float:
+        """Current rate, in tokens per second."""
+        return self._transaction(lambda state: (state, state.rate))
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket, shared by the processes using the same database.
+
+    If the database can not be used, the bucket is only shared by the
+    threads of the process.
+    """
+
+    file_name = ".rate_limit.sqlite"
+    blocking = True
+
+    def __init__(
+        self, path: str, name: str, rate: float, burst: int = 0, timeout: float = 30
+    ):
+        """Initialize the token bucket.
+
+        Args:
+            path: path to the SQLite database file
+            name: name of the bucket in the database
+            rate: maximum rate, in tokens (requests) per second
+            burst: capacity of the bucket
+            timeout: seconds to wait for a lock held by another process
+
+        """
+        super().__init__(rate=rate, burst=burst)
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, "
+                "tokens REAL, updated REAL, rate REAL, throttled_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection to the database, in an exclusive transaction."""
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _transaction(self, func: Callable[[BucketState], Tuple[BucketState, T]]) -> T:
+        """Update the state of the bucket in the database."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT tokens, updated, rate, throttled_at FROM buckets "
+                    "WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                state = BucketState(*row) if row else self._initial_state()
+                if state.rate > self.max_rate:
+                    # Another process has a higher limit
+                    state = state._replace(rate=self.max_rate)
+                state, result = func(state)
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets "
+                    "(name, tokens, updated, rate, throttled_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.name, *state),
+                )
+        except sqlite3.Error as err:
+            log.warning("Unable to use rate limit file %s (%s)", self.path, err)
+            return super()._transaction(func)
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter(host: str) -> TokenBucket | None:
+    """Return the rate limiter of a host (None when rate limiting is disabled)."""
+    rate = ENV.dinamis_sdk_rate_limit
+    if not rate:
+        return None
+    burst = ENV.dinamis_sdk_rate_limit_burst
+    if ENV.dinamis_sdk_rate_limit_shared and (cfg_path := get_config_path()):
+        path = os.path.join(cfg_path, SharedTokenBucket.file_name)
+        try:
+            return SharedTokenBucket(path, name=host, rate=rate, burst=burst)
+        except sqlite3.Error as err:
+            log.warning("Unable to use rate limit file %s (%s)", path, err)
+    return TokenBucket(rate=rate, burst=burst)
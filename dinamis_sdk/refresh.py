@@ -0,0 +1,96 @@
+"""Background re-signing of the cached URLs before they expire."""
+
+import time
+from typing import List
+
+from .settings import ENV, MAX_URLS
+from .signing import CACHE, SignURLRoute, _request_and_cache
+from .utils import BackgroundThread, get_logger_for
+
+log = get_logger_for(__name__)
+
+
+class CacheRefresher(BackgroundThread):
+    """Re-sign recently used cached URLs before they reach the TTL margin.
+
+    A daemon thread periodically looks for the cached GET URLs that have been
+    used recently, and whose TTL will soon be lower than
+    `ENV.dinamis_sdk_ttl_margin`. They are re-signed in batches of `MAX_URLS`
+    with the `sign_urls` route, so that the foreground calls keep hitting the
+    cache.
+
+    Example:
+        ```python
+        with CacheRefresher():
+            ...
+        ```
+
+    """
+
+    thread_name = "dinamis-sdk-cache-refresher"
+
+    def __init__(
+        self,
+        interval: float = 30.0,
+        lead_seconds: float = 300.0,
+        window_seconds: float = 3600.0,
+        max_urls_per_second: float = 256.0,
+    ):
+        """Initialize the refresher.
+
+        Args:
+            interval: seconds between two lookups of the URLs to refresh
+            lead_seconds: URLs are re-signed when their TTL is lower than the
+                TTL margin plus `lead_seconds`. Must be greater than `interval`
+            window_seconds: only URLs used during the last `window_seconds`
+                are re-signed
+            max_urls_per_second: maximum rate of re-signed URLs
+
+        """
+        self.interval = interval
+        self.lead_seconds = lead_seconds
+        self.window_seconds = window_seconds
+        self.max_urls_per_second = max_urls_per_second
+        super().__init__()
+
+    def urls_to_refresh(self) -> List[str]:
+        """Return the recently used URLs that will soon need to be re-signed."""
+        threshold = ENV.dinamis_sdk_ttl_margin + self.lead_seconds
+        recent = CACHE.recently_used(since=time.time() - self.window_seconds)
+        return [
+            url
+            for url, signed_url in recent.items()
+            if 0 < signed_url.ttl() < threshold
+        ]
+
+    def refresh(self) -> int:
+        """Re-sign the URLs that need it.
+
+        Returns:
+            the number of re-signed URLs
+
+        """
+        urls = self.urls_to_refresh()
+        log.debug("%s URLs to refresh", len(urls))
+        n_refreshed = 0
+        for start in range(0, len(urls), MAX_URLS):
+            if self._stop_event.is_set():
+                break
+            batch = urls[start : start + MAX_URLS]
+            batch_start = time.time()
+            try:
+                _request_and_cache(urls=batch, route=SignURLRoute.SIGN_URLS_GET)
+                n_refreshed += len(batch)
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                log.warning("Unable to refresh signed URLs (%s)", err)
+            # Respect the maximum rate
+            min_duration = len(batch) / self.max_urls_per_second
+            self._stop_event.wait(max(0.0, min_duration - (time.time() - batch_start)))
+        return n_refreshed
+
+    def _run(self):
+        """Refresh loop."""
+        log.debug("Cache refresher started")
+        while not self._stop_event.wait(self.interval):
+            self.refresh()
+        log.debug("Cache refresher stopped")
@@ -0,0 +1,328 @@
+"""Retry policies and circuit breakers of the HTTP requests.
+
+Requests are retried according to the policy of their kind ("signing",
+"auth", "upload" or "default"), with a full-jitter exponential backoff, the
+delay requested by the server in the `Retry-After` header, and an optional
+deadline. The policies can be changed with `DINAMIS_SDK_RETRY_POLICIES`.
+
+A circuit breaker per host makes requests fail fast while the host is
+unhealthy: after `DINAMIS_SDK_CIRCUIT_FAILURES` consecutive failed requests,
+requests are rejected during `DINAMIS_SDK_CIRCUIT_RESET` seconds, then a single
+trial request is allowed to check whether the host has recovered.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Tuple
+
+import requests
+import urllib3.util.retry
+from pydantic import BaseModel, ConfigDict
+from pydantic.types import NonNegativeFloat, NonNegativeInt
+from urllib3.exceptions import MaxRetryError, ResponseError
+
+from .ratelimit import TokenBucket
+from .settings import ENV
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+# HTTP status codes of requests that are retried (a missing object is not
+# going to appear by retrying)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryPolicy(BaseModel):
+    """Retry policy of a kind of requests."""
+
+    model_config = ConfigDict(frozen=True)
+
+    total: NonNegativeInt = 5
+    backoff_factor: NonNegativeFloat = 0.8
+    backoff_max: NonNegativeFloat = 30.0
+    # Maximum time spent retrying a request, in seconds (0 for no limit)
+    deadline: NonNegativeFloat = 0.0
+    status_forcelist: Tuple[int, ...] = RETRY_STATUSES
+    # POST requests are retried after read errors and error statuses only
+    # when they are idempotent
+    retry_post: bool = False
+
+    def backoff(self, n_retries: int) -> float:
+        """Return the delay before a retry (full jitter).
+
+        Args:
+            n_retries: number of retries so far, including this one
+
+        """
+        if n_retries <= 1:
+            return 0.0
+        ceiling = min(self.backoff_max, self.backoff_factor * 2 ** (n_retries - 1))
+        return random.uniform(0, ceiling)
+
+    def deadline_exceeded(self, started: float, delay: float = 0.0) -> bool:
+        """Return True if a retry after `delay` seconds would miss the deadline.
+
+        Args:
+            started: time (`time.monotonic()`) of the first attempt
+            delay: delay before the retry, in seconds
+
+        """
+        if not self.deadline:
+            return False
+        return time.monotonic() - started + delay > self.deadline
+
+    def next_delay(
+        self, n_retries: int, started: float, retry_after: float | None = None
+    ) -> float | None:
+        """Return the delay before the next retry, or None to give up.
+
+        Args:
+            n_retries: number of retries so far, including the next one
+            started: time (`time.monotonic()`) of the first attempt
+            retry_after: delay requested by the server, in seconds
+
+        """
+        if n_retries > self.total or self.deadline_exceeded(started, retry_after or 0):
+            return None
+        delay = self.backoff(n_retries) if retry_after is None else retry_after
+        if self.deadline:
+            delay = min(delay, self.deadline - (time.monotonic() - started))
+        return delay
+
+    def to_urllib3(
+        self,
+        breaker: "CircuitBreaker | None" = None,
+        limiter: TokenBucket | None = None,
+    ) -> "Retry":
+        """Return the urllib3 retry configuration of the policy."""
+        allowed_methods = Retry.DEFAULT_ALLOWED_METHODS
+        if self.retry_post:
+            allowed_methods = allowed_methods | {"POST"}
+        return Retry(
+            total=self.total,
+            backoff_factor=self.backoff_factor,
+            backoff_max=self.backoff_max,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=allowed_methods,
+            policy=self,
+            breaker=breaker,
+            limiter=limiter,
+        )
+
+
+class Retry(urllib3.util.retry.Retry):
+    """urllib3 retry configuration, following a `RetryPolicy`.
+
+    The backoff has full jitter, retries stop at the deadline of the policy,
+    and when the circuit breaker of the host opens. Retries wait for the rate
+    limiter of the host, which is slowed down by 429 responses.
+    """
+
+    def __init__(
+        self,
+        *args,
+        policy: RetryPolicy | None = None,
+        breaker: "CircuitBreaker | None" = None,
+        limiter: TokenBucket | None = None,
+        started: float | None = None,
+        **kwargs,
+    ):
+        """Initialize the retry configuration."""
+        super().__init__(*args, **kwargs)
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker
+        self.limiter = limiter
+        self.started = started
+
+    def new(self, **kw: Any) -> "Retry":
+        """Override parent method to keep the policy and the start time."""
+        kw.setdefault("policy", self.policy)
+        kw.setdefault("breaker", self.breaker)
+        kw.setdefault("limiter", self.limiter)
+        # Copies are made when a request fails, starting the deadline
+        kw.setdefault("started", self.started or time.monotonic())
+        return super().new(**kw)
+
+    def get_backoff_time(self) -> float:
+        """Override parent method to use full jitter and the deadline."""
+        delay = self.policy.next_delay(
+            n_retries=len(self.history), started=self.started or time.monotonic()
+        )
+        return delay or 0.0
+
+    def increment(  # pylint: disable = too-many-arguments
+        self,
+        method: str | None = None,
+        url: str | None = None,
+        response: Any = None,
+        error: Exception | None = None,
+        _pool: Any = None,
+        _stacktrace: Any = None,
+    ) -> "Retry":
+        """Override parent method to give up at the deadline, or circuit opening."""
+        if self.limiter and response is not None and response.status == 429:
+            self.limiter.on_throttled(self.get_retry_after(response))
+        retry = super().increment(
+            method=method,
+            url=url,
+            response=response,
+            error=error,
+            _pool=_pool,
+            _stacktrace=_stacktrace,
+        )
+        if self.breaker and not self.breaker.is_closed():
+            raise MaxRetryError(_pool, url, ResponseError("circuit breaker is open"))
+        retry_after = None
+        if response is not None and self.respect_retry_after_header:
+            retry_after = retry.get_retry_after(response)
+        if self.policy.deadline_exceeded(
+            retry.started or time.monotonic(), retry_after or 0
+        ):
+            raise MaxRetryError(
+                _pool, url, ResponseError(f"deadline of {self.policy.deadline}s")
+            )
+        return retry
+
+    def sleep(self, response: Any = None):
+        """Override parent method to wait for the rate limiter."""
+        super().sleep(response)
+        if self.limiter:
+            self.limiter.acquire()
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Return the delay of the `Retry-After` header, in seconds."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    retry_date = email.utils.parsedate_tz(value)
+    if retry_date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(retry_date) - time.time())
+
+
+def get_retry_policy(name: str, **overrides: Any) -> RetryPolicy:
+    """Return the retry policy of a kind of requests.
+
+    Args:
+        name: kind of requests ("signing", "auth", "upload" or "default")
+        **overrides: fields of the policy, overriding the defaults and
+            `ENV.dinamis_sdk_retry_policies`
+
+    Returns:
+        the retry policy
+
+    """
+    defaults: Dict[str, Dict[str, Any]] = {
+        "signing": {
+            "total": ENV.dinamis_sdk_retry_total,
+            "backoff_factor": ENV.dinamis_sdk_retry_backoff_factor,
+            "deadline": ENV.dinamis_sdk_retry_deadline,
+            # Signing URLs is idempotent
+            "retry_post": True,
+        },
+    }
+    return RetryPolicy(
+        **{
+            "backoff_max": ENV.dinamis_sdk_retry_backoff_max,
+            **defaults.get(name, {}),
+            **ENV.dinamis_sdk_retry_policies.get(name, {}),
+            **overrides,
+        }
+    )
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Request rejected because the host is unhealthy."""
+
+
+class CircuitBreaker:
+    """Circuit breaker of a host.
+
+    The circuit opens after `failures` consecutive failed requests: requests
+    are then rejected during `reset_timeout` seconds. Then the circuit is
+    half-open: a single trial request is allowed, which closes the circuit
+    if it succeeds, or opens it again.
+    """
+
+    def __init__(self, failures: int = 5, reset_timeout: float = 30.0):
+        """Initialize the circuit breaker.
+
+        Args:
+            failures: number of consecutive failures opening the circuit (0
+                to never open it)
+            reset_timeout: duration of the open state, in seconds
+
+        """
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._n_failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def is_closed(self) -> bool:
+        """Return True if requests are sent normally."""
+        return self._opened_at is None
+
+    def allow(self) -> bool:
+        """Return True if a request can be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def check(self, host: str):
+        """Raise `CircuitOpenError` if a request can not be sent."""
+        if not self.allow():
+            raise CircuitOpenError(f"{host} is unhealthy, request not sent")
+
+    def record_success(self):
+        """Record a successful request."""
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("Circuit closed")
+            self._n_failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """Record a failed request."""
+        with self._lock:
+            self._n_failures += 1
+            if self._trial or (self.failures and self._n_failures >= self.failures):
+                if self._opened_at is None:
+                    log.warning(
+                        "Circuit opened for %ss after %s failed requests",
+                        self.reset_timeout,
+                        self._n_failures,
+                    )
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def record_response(self, status_code: int):
+        """Record the response of a request."""
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    """Return the circuit breaker of a host."""
+    log.debug("Circuit breaker for %s", host)
+    return CircuitBreaker(
+        failures=ENV.dinamis_sdk_circuit_failures,
+        reset_timeout=ENV.dinamis_sdk_circuit_reset,
+    )
@@ -1,8 +1,9 @@
 """Settings from environment variables."""
 
 import os
+from typing import Any, Dict, Literal
 from pydantic_settings import BaseSettings
-from pydantic.types import NonNegativeInt, PositiveInt, PositiveFloat
+from pydantic.types import NonNegativeFloat, NonNegativeInt, PositiveInt, PositiveFloat
 from pydantic import field_validator
 import appdirs  # type: ignore
 from .utils import get_logger_for
@@ -12,6 +13,7 @@ log = get_logger_for(__name__)
 # Constants
 APP_NAME = "dinamis_sdk_auth"
 MAX_URLS = 64
+LOCAL_SIGNING_URL_DURATION = 7200
 S3_STORAGE_DOMAIN = "meso.umontpellier.fr"
 DEFAULT_SIGNING_ENDPOINT = (
     "https://s3-signing-cdos.apps.okd.crocc.meso.umontpellier.fr/"
@@ -28,8 +30,39 @@ class Settings(BaseSettings):
     dinamis_sdk_secret_key: str = ""
     dinamis_sdk_retry_total: PositiveInt = 10
     dinamis_sdk_retry_backoff_factor: PositiveFloat = 0.8
+    dinamis_sdk_retry_backoff_max: NonNegativeFloat = 30.0
+    dinamis_sdk_retry_deadline: NonNegativeFloat = 60.0
+    dinamis_sdk_retry_policies: Dict[str, Dict[str, Any]] = {}
+    dinamis_sdk_circuit_failures: NonNegativeInt = 5
+    dinamis_sdk_circuit_reset: PositiveFloat = 30.0
+    dinamis_sdk_rate_limit: NonNegativeFloat = 0.0
+    dinamis_sdk_rate_limit_burst: NonNegativeInt = 0
+    dinamis_sdk_rate_limit_shared: bool = True
     dinamis_sdk_signing_disable_auth: bool = False
     dinamis_sdk_signing_endpoint: str = DEFAULT_SIGNING_ENDPOINT
+    dinamis_sdk_disk_cache: bool = False
+    dinamis_sdk_cache_max_entries: NonNegativeInt = 100000
+    dinamis_sdk_cache_max_bytes: NonNegativeInt = 0
+    dinamis_sdk_signing_concurrency: PositiveInt = 4
+    dinamis_sdk_batch_window: NonNegativeFloat = 0.0
+    dinamis_sdk_upload_timeout: PositiveFloat = 60.0
+    dinamis_sdk_upload_block_size: PositiveInt = 1024 * 1024
+    dinamis_sdk_upload_concurrency: PositiveInt = 8
+    dinamis_sdk_local_signing: bool = False
+    dinamis_sdk_s3_region: str = "us-east-1"
+    dinamis_sdk_discovery_ttl: NonNegativeInt = 86400
+    dinamis_sdk_metrics: bool = False
+    dinamis_sdk_pool_connections: PositiveInt = 10
+    dinamis_sdk_pool_maxsize: PositiveInt = 16
+    dinamis_sdk_pool_block: bool = False
+    dinamis_sdk_tcp_keepalive: bool = True
+    dinamis_sdk_http2: bool = False
+    dinamis_sdk_chunk_size_min: PositiveInt = 1
+    dinamis_sdk_chunk_size_max: PositiveInt = 1024
+    dinamis_sdk_chunk_target_latency: PositiveFloat = 2.0
+    dinamis_sdk_signing_transport: Literal["auto", "body", "params"] = "params"
+    dinamis_sdk_signing_gzip: bool = True
+    dinamis_sdk_token_background_refresh: bool = False
 
     @field_validator("dinamis_sdk_signing_endpoint", mode="after")
     @classmethod
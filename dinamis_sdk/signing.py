@@ -5,20 +5,39 @@ Revamp of Microsoft Planetary Computer SAS, using S3 and custom URL signing
 endpoint instead.
 """
 
+# pylint: disable = too-many-lines
+
 import collections.abc
 import math
+import os
 import re
+import sys
+import threading
 import time
-from copy import deepcopy
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy as shallow_copy, deepcopy
 from datetime import datetime, timezone
-from functools import singledispatch
-from typing import Any, Dict, List, Mapping, TypeVar, cast
+from functools import lru_cache, singledispatch
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Tuple,
+    TypeVar,
+    cast,
+)
 from enum import Enum
 from urllib.parse import parse_qs, urlparse
 
 import packaging.version
 import pydantic
-import pystac_client
+import requests
 from pydantic import BaseModel  # pylint: disable = no-name-in-module
 from pystac import (
     Asset,
@@ -29,12 +48,22 @@ from pystac import (
 )
 from pystac.serialization.identify import identify_stac_object_type
 from pystac.utils import datetime_to_str
-from pystac_client import ItemSearch
 
-from .http import session
-from .settings import S3_STORAGE_DOMAIN, MAX_URLS, ENV
+from . import metrics
+from .cache import DiskCache, MemoryCache
+from .chunking import (
+    TOO_LARGE_STATUSES,
+    get_chunk_encoding,
+    get_chunk_size,
+    url_bytes,
+)
+from .http import LocalSigningConnectionMethod, session
+from .settings import MAX_URLS, S3_STORAGE_DOMAIN, ENV
 from .utils import get_logger_for
 
+if TYPE_CHECKING:
+    from pystac_client import ItemSearch
+
 
 _PYDANTIC_2_0 = packaging.version.parse(
     pydantic.__version__
@@ -42,6 +71,10 @@ _PYDANTIC_2_0 = packaging.version.parse(
 
 AssetLike = TypeVar("AssetLike", Asset, Dict[str, Any])
 
+# `copy` argument of the signing functions: True to sign a deep copy, False to
+# sign in place, "shallow" to sign a copy that shares everything but assets
+CopyMode = bool | Literal["shallow"]
+
 asset_xpr = re.compile(
     r"https:\/\/(?P<account>[A-z0-9-.]+?)"
     r"\.meso\.umontpellier\.fr\/(?P<blob>[^<]+)"  # ignore
@@ -83,11 +116,228 @@ class SignedURLBatch(URLBase):  # pylint: disable = R0903
 
 # Cache of signing requests so we can reuse them
 # Key is the signing URL, value is the S3 token
-CACHE: Dict[str, SignedURL] = {}
+CACHE = MemoryCache(
+    max_entries=ENV.dinamis_sdk_cache_max_entries,
+    max_bytes=ENV.dinamis_sdk_cache_max_bytes,
+)
+
+
+# GET URLs being signed, so that concurrent calls wait for them instead of
+# sending duplicate requests. Key is the URL, value is the future SignedURL
+_IN_FLIGHT: Dict[str, Future] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+
+def _reset_after_fork():
+    """Forget the URLs being signed by the threads of the parent process.
+
+    These threads do not exist in the child, which would wait forever for
+    their futures (or for the lock, if it was held during the fork).
+    """
+    global _IN_FLIGHT_LOCK  # pylint: disable = global-statement
+    _IN_FLIGHT_LOCK = threading.Lock()
+    _IN_FLIGHT.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@lru_cache(maxsize=None)
+def get_disk_cache() -> DiskCache | None:
+    """Return the persistent cache of signed URLs, when enabled."""
+    if not ENV.dinamis_sdk_disk_cache:
+        return None
+    return DiskCache.from_config_dir()
+
+
+@singledispatch
+def _shallow_copy(obj: Any) -> Any:
+    """Copy an object, duplicating only its assets (the rest is shared)."""
+    return shallow_copy(obj)
+
+
+@_shallow_copy.register(Item)
+@_shallow_copy.register(Collection)
+def _shallow_copy_item(item: Item | Collection) -> Item | Collection:
+    item = shallow_copy(item)
+    item.assets = {key: shallow_copy(asset) for key, asset in item.assets.items()}
+    for asset in item.assets.values():
+        asset.owner = item
+    return item
+
+
+@_shallow_copy.register(ItemCollection)
+def _shallow_copy_item_collection(item_collection: ItemCollection) -> ItemCollection:
+    return ItemCollection(
+        [_shallow_copy(item) for item in item_collection],
+        extra_fields=item_collection.extra_fields,
+        clone_items=False,
+    )
+
+
+@_shallow_copy.register(collections.abc.Mapping)
+def _shallow_copy_mapping(mapping: Mapping) -> Dict[str, Any]:
+    copied = dict(mapping)
+    if isinstance(copied.get("templates"), collections.abc.Mapping):
+        copied["templates"] = dict(copied["templates"])
+    if isinstance(copied.get("assets"), collections.abc.Mapping):
+        copied["assets"] = {key: dict(val) for key, val in copied["assets"].items()}
+    if isinstance(copied.get("features"), list):
+        copied["features"] = [
+            _shallow_copy_mapping(feature) for feature in copied["features"]
+        ]
+    return copied
+
+
+def _copy(obj: Any, copy: CopyMode) -> Any:
+    """Copy an object before signing it, according to the copy mode."""
+    if copy == "shallow":
+        return _shallow_copy(obj)
+    if not copy or isinstance(obj, str):
+        return obj
+    if isinstance(obj, collections.abc.Mapping):
+        return deepcopy(obj)
+    if isinstance(obj, Collection):
+        # https://github.com/stac-utils/pystac/pull/834 fixed asset dropping
+        assets = obj.assets
+        obj = obj.clone()
+        if assets and not obj.assets:
+            obj.assets = deepcopy(assets)
+        return obj
+    return obj.clone()
+
+
+def _mapping_kind(mapping: Mapping) -> str | None:
+    """Return the kind of a mapping to sign, or None if it has no URLs."""
+    if all(key in mapping for key in ["version", "templates", "refs"]):
+        return "references"
+    types = (STACObjectType.ITEM, STACObjectType.COLLECTION)
+    if identify_stac_object_type(cast(Dict[str, Any], mapping)) in types:
+        return "stac"
+    if mapping.get("type") == "FeatureCollection" and mapping.get("features"):
+        return "features"
+    return None
+
+
+@singledispatch
+def _get_hrefs(obj: Any) -> List[str]:
+    """Return the URLs of an object that `sign` would sign."""
+    raise TypeError(
+        "Invalid type, must be one of: str, Asset, Item, ItemCollection, "
+        "Collection, or mapping"
+    )
+
+
+@_get_hrefs.register(str)
+def _get_string_hrefs(url: str) -> List[str]:
+    if is_vrt_string(url):
+        return list(dict.fromkeys(m.group(0) for m in asset_xpr.finditer(url)))
+    return [url]
+
+
+@_get_hrefs.register(Asset)
+def _get_asset_hrefs(asset: Asset) -> List[str]:
+    return [asset.href]
+
+
+@_get_hrefs.register(Item)
+@_get_hrefs.register(Collection)
+def _get_item_hrefs(item: Item | Collection) -> List[str]:
+    return [asset.href for asset in item.assets.values()]
+
+
+@_get_hrefs.register(ItemCollection)
+def _get_item_collection_hrefs(item_collection: ItemCollection) -> List[str]:
+    return [asset.href for item in item_collection for asset in item.assets.values()]
+
+
+@_get_hrefs.register(collections.abc.Mapping)
+def _get_mapping_hrefs(mapping: Mapping) -> List[str]:
+    kind = _mapping_kind(mapping)
+    if kind == "references":
+        return list(mapping["templates"].values())
+    if kind == "stac":
+        return [val["href"] for val in mapping["assets"].values()]
+    if kind == "features":
+        return [
+            val["href"]
+            for feat in mapping["features"]
+            for val in feat.get("assets", {}).values()
+        ]
+    return []
+
+
+@singledispatch
+def _set_hrefs(obj: Any, signed_urls: Mapping[str, str]) -> Any:
+    """Replace the URLs of an object with their signed version.
+
+    The object is modified in place (except strings), and returned.
+
+    Args:
+        obj: object, as accepted by `_get_hrefs`
+        signed_urls: signed URLs of `_get_hrefs(obj)`
+
+    """
+    raise TypeError(f"Can not sign the URLs of {type(obj)}")
+
+
+@_set_hrefs.register(str)
+def _set_string_hrefs(url: str, signed_urls: Mapping[str, str]) -> str:
+    if is_vrt_string(url):
+        return asset_xpr.sub(lambda m: _escape_vrt_href(signed_urls[m.group(0)]), url)
+    return signed_urls[url]
+
+
+@_set_hrefs.register(Asset)
+def _set_asset_hrefs(asset: Asset, signed_urls: Mapping[str, str]) -> Asset:
+    asset.href = signed_urls[asset.href]
+    return asset
+
+
+@_set_hrefs.register(Item)
+@_set_hrefs.register(Collection)
+def _set_item_hrefs(
+    item: Item | Collection, signed_urls: Mapping[str, str]
+) -> Item | Collection:
+    for asset in item.assets.values():
+        asset.href = signed_urls[asset.href]
+    return item
+
+
+@_set_hrefs.register(ItemCollection)
+def _set_item_collection_hrefs(
+    item_collection: ItemCollection, signed_urls: Mapping[str, str]
+) -> ItemCollection:
+    for item in item_collection:
+        _set_item_hrefs(item, signed_urls)
+    return item_collection
+
+
+@_set_hrefs.register(collections.abc.Mapping)
+def _set_mapping_hrefs(mapping: Mapping, signed_urls: Mapping[str, str]) -> Mapping:
+    kind = _mapping_kind(mapping)
+    if kind == "references":
+        for key, url in mapping["templates"].items():
+            mapping["templates"][key] = signed_urls[url]
+    elif kind == "stac":
+        for val in mapping["assets"].values():
+            val["href"] = signed_urls[val["href"]]
+    elif kind == "features":
+        for feature in mapping["features"]:
+            for val in feature.get("assets", {}).values():
+                val["href"] = signed_urls[val["href"]]
+    return mapping
+
+
+def _copy_and_sign(obj: Any, copy: CopyMode) -> Any:
+    """Copy an object according to the copy mode, and sign its URLs."""
+    obj = _copy(obj, copy)
+    return _set_hrefs(obj, sign_urls(_get_hrefs(obj)))
 
 
 @singledispatch
-def sign(obj: Any, copy: bool = True) -> Any:
+def sign(obj: Any, copy: CopyMode = True) -> Any:
     """Sign the relevant URL with a S3 token allowing read access.
 
     All URLs belonging to supported objects are modified in-place, or returned
@@ -96,12 +346,20 @@ def sign(obj: Any, copy: bool = True) -> Any:
         obj (Any): The object to sign. Must be one of:
             str (URL), Asset, Item, ItemCollection, or ItemSearch, or a
             mapping.
-        copy (bool): Whether to sign the object in place, or make a copy.
-            Has no effect for immutable objects like strings.
+        copy (bool | "shallow"): Whether to sign the object in place, or make
+            a copy. With "shallow", only the assets are copied, and the other
+            members of the copy (properties, links, geometry...) are shared
+            with the original object: this is much faster for large objects,
+            but modifying these members of the copy also modifies the
+            original. Has no effect for immutable objects like strings.
     Returns:
         Any: A copy of the object where all relevant URLs have been signed
 
     """
+    # pystac_client is not imported until a search has to be signed
+    pystac_client = sys.modules.get("pystac_client")
+    if pystac_client and isinstance(obj, pystac_client.ItemSearch):
+        return _search_and_sign(obj, copy=copy)
     raise TypeError(
         "Invalid type, must be one of: str, Asset, Item, ItemCollection, "
         "ItemSearch, or mapping"
@@ -159,22 +417,21 @@ class SignURLRoute(Enum):
     SIGN_URLS_GET = "sign_urls"
     SIGN_URLS_PUT = "sign_urls_put"
 
+    @property
+    def http_method(self) -> str:
+        """HTTP method allowed by the URLs signed with this route."""
+        return "PUT" if self is SignURLRoute.SIGN_URLS_PUT else "GET"
 
-def _generic_sign_urls(urls: List[str], route: SignURLRoute) -> Dict[str, str]:
-    """Sign URLs with a S3 Token.
 
-    Signing URL allows read access to files in storage.
+def _filter_urls_to_sign(urls: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Separate the URLs that need to be signed from the others.
 
     Args:
-        urls: List of HREF to sign
-
-            Single URLs can be found on a STAC Item's Asset ``href`` value.
-            Only URLs to assets in S3 Storage are signed, other URLs are
-            returned unmodified.
-        route: API route
+        urls: List of HREF
 
     Returns:
-        dict of signed HREF: key = original URL, value = signed URL
+        dict of the URLs that are returned unmodified (outside of the S3
+        storage, or already signed), and list of the URLs to sign
 
     """
     signed_urls = {}
@@ -198,6 +455,27 @@ def _generic_sign_urls(urls: List[str], route: SignURLRoute) -> Dict[str, str]:
                 signed_urls[url] = url
 
     not_signed_urls = [url for url in urls if url not in signed_urls]
+    return signed_urls, not_signed_urls
+
+
+def _generic_sign_urls(urls: List[str], route: SignURLRoute) -> Dict[str, str]:
+    """Sign URLs with a S3 Token.
+
+    Signing URL allows read access to files in storage.
+
+    Args:
+        urls: List of HREF to sign
+
+            Single URLs can be found on a STAC Item's Asset ``href`` value.
+            Only URLs to assets in S3 Storage are signed, other URLs are
+            returned unmodified.
+        route: API route
+
+    Returns:
+        dict of signed HREF: key = original URL, value = signed URL
+
+    """
+    signed_urls, not_signed_urls = _filter_urls_to_sign(urls)
     signed_urls.update(
         {
             url: signed_url.href
@@ -243,31 +521,92 @@ def sign_vrt_string(vrt: str, copy: bool = True) -> str:  # pylint: disable = W0
         str: The signed VRT
 
     """
-    urls = []
+    return "".join(sign_vrt_chunks([vrt]))
+
+
+def _escape_vrt_href(href: str) -> str:
+    """Encode the "&" of a signed URL, to be written inside a .vrt."""
+    return href.replace("&", "&Amp;")
+
+
+def sign_vrt_chunks(chunks: Iterable[str]) -> Iterator[str]:
+    """Sign a VRT-like document, read and written in chunks.
+
+    The document is scanned once. Each chunk is cut after its last "<" (URLs
+    cannot span over it), the URLs found before the cut are signed with a
+    single call to `sign_urls()` (URLs seen in previous chunks are not signed
+    again), and the signed text is yielded.
+
+    Args:
+        chunks: successive parts of the document
+
+    Yields:
+        successive parts of the signed document
+
+    """
+    signed: Dict[str, str] = {}
+    buffer = ""
 
-    def _repl_vrt(m: re.Match):
-        urls.append(m.string[slice(*m.span())])
+    def _sign_part(part: str) -> str:
+        matches = list(asset_xpr.finditer(part))
+        new_urls = list(
+            dict.fromkeys(m.group(0) for m in matches if m.group(0) not in signed)
+        )
+        if new_urls:
+            signed.update(
+                (url, _escape_vrt_href(href))
+                for url, href in sign_urls(new_urls).items()
+            )
+        pieces = []
+        pos = 0
+        for m in matches:
+            pieces.append(part[pos : m.start()])
+            pieces.append(signed[m.group(0)])
+            pos = m.end()
+        pieces.append(part[pos:])
+        return "".join(pieces)
+
+    for chunk in chunks:
+        buffer += chunk
+        cut = buffer.rfind("<")
+        if cut > 0:
+            yield _sign_part(buffer[:cut])
+            buffer = buffer[cut:]
+    if buffer:
+        yield _sign_part(buffer)
+
+
+def sign_vrt_file(path_in: str, path_out: str, chunk_size: int = 1024 * 1024) -> str:
+    """Sign a VRT file (or any text file) containing URLs from the storage.
+
+    The file is read and written in chunks, so that large VRT mosaics are
+    never entirely loaded in memory. See :func:`dinamis_sdk.sign_vrt_chunks`.
 
-    asset_xpr.sub(_repl_vrt, vrt)
-    signed_urls = sign_urls(urls)
+    Args:
+        path_in: input file
+        path_out: output file (can not be the input file)
+        chunk_size: number of characters read at once
 
-    # The "&" needs to be encoded in signed URLs inside the .vrt
-    for url, signed_url in signed_urls.items():
-        signed_urls[url] = signed_url.replace("&", "&Amp;")
+    Returns:
+        path_out
 
-    # Replace urls with signed urls (single pass)
-    rep = dict((re.escape(k), v) for k, v in signed_urls.items())
-    pattern = re.compile("|".join(rep.keys()))
-    return pattern.sub(lambda m: rep[re.escape(m.group(0))], vrt)
+    """
+    with open(path_in, encoding="utf-8") as f_in, open(
+        path_out, "w", encoding="utf-8"
+    ) as f_out:
+        for part in sign_vrt_chunks(iter(lambda: f_in.read(chunk_size), "")):
+            f_out.write(part)
+    return path_out
 
 
 @sign.register(Item)
-def sign_item(item: Item, copy: bool = True) -> Item:
+def sign_item(item: Item, copy: CopyMode = True) -> Item:
     """Sign all assets within a PySTAC item.
 
     Args:
         item (Item): The Item whose assets that will be signed
-        copy (bool): Whether to copy (clone) the item or mutate it inplace.
+        copy (bool | "shallow"): Whether to copy (clone) the item or mutate it
+            inplace. See :func:`dinamis_sdk.sign` for "shallow".
 
     Returns:
         Item: An Item where all assets' HREFs have
@@ -276,45 +615,37 @@ def sign_item(item: Item, copy: bool = True) -> Item:
         expiry time for any assets that were signed.
 
     """
-    if copy:
-        item = item.clone()
-    urls = [asset.href for asset in item.assets.values()]
-    signed_urls = sign_urls(urls=urls)
-    for key, asset in item.assets.items():
-        item.assets[key].href = signed_urls[asset.href]
-    return item
+    return _copy_and_sign(item, copy)
 
 
 @sign.register(Asset)
-def sign_asset(asset: Asset, copy: bool = True) -> Asset:
+def sign_asset(asset: Asset, copy: CopyMode = True) -> Asset:
     """Sign a PySTAC asset.
 
     Args:
         asset (Asset): The Asset to sign
-        copy (bool): Whether to copy (clone) the asset or mutate it inplace.
+        copy (bool | "shallow"): Whether to copy (clone) the asset or mutate
+            it inplace. See :func:`dinamis_sdk.sign` for "shallow".
 
     Returns:
         Asset: An asset where the HREF is replaced with a
         signed version.
 
     """
-    if copy:
-        asset = asset.clone()
-    asset.href = sign_urls([asset.href])[asset.href]
-    return asset
+    return _copy_and_sign(asset, copy)
 
 
 @sign.register(ItemCollection)
 def sign_item_collection(
-    item_collection: ItemCollection, copy: bool = True
+    item_collection: ItemCollection, copy: CopyMode = True
 ) -> ItemCollection:
     """Sign a PySTAC item collection.
 
     Args:
         item_collection (ItemCollection): The ItemCollection whose assets will
             be signed
-        copy (bool): Whether to copy (clone) the ItemCollection or mutate it
-            inplace.
+        copy (bool | "shallow"): Whether to copy (clone) the ItemCollection or
+            mutate it inplace. See :func:`dinamis_sdk.sign` for "shallow".
 
     Returns:
         ItemCollection: An ItemCollection where all assets'
@@ -323,18 +654,61 @@ def sign_item_collection(
         indicating the earliest expiry time for any assets that were signed.
 
     """
-    if copy:
-        item_collection = item_collection.clone()
-    urls = [asset.href for item in item_collection for asset in item.assets.values()]
-    signed_urls = sign_urls(urls=urls)
-    for item in item_collection:
-        for key, asset in item.assets.items():
-            item.assets[key].href = signed_urls[asset.href]
-    return item_collection
+    return _copy_and_sign(item_collection, copy)
+
+
+def sign_search_pages(search: "ItemSearch") -> Iterator[ItemCollection]:
+    """Perform a PySTAC Client search, and yield the signed pages of results.
+
+    Each page is signed with a single request to the signing endpoint, while
+    the next page is fetched from the STAC API. Only two pages are held in
+    memory at a time.
+
+    Args:
+        search (ItemSearch): The ItemSearch whose resulting item assets will
+            be signed
 
+    Yields:
+        ItemCollection: The pages of results, where all assets' HREFs have
+            been replaced with a signed version.
 
-@sign.register(ItemSearch)
-def _search_and_sign(search: ItemSearch, copy: bool = True) -> ItemCollection:
+    """
+    import pystac_client  # pylint: disable = import-outside-toplevel
+
+    pystac_client_version = packaging.version.parse(pystac_client.__version__)
+    if pystac_client_version >= packaging.version.parse("0.5.0"):
+        pages = search.pages()
+    else:
+        pages = search.get_item_collections()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_page = executor.submit(next, pages, None)
+        while (page := next_page.result()) is not None:
+            # Fetch the next page while the current one is signed
+            next_page = executor.submit(next, pages, None)
+            yield sign_item_collection(page, copy=False)
+
+
+def sign_search_items(search: "ItemSearch") -> Iterator[Item]:
+    """Perform a PySTAC Client search, and yield the signed items.
+
+    See :func:`dinamis_sdk.sign_search_pages` for more.
+
+    Args:
+        search (ItemSearch): The ItemSearch whose resulting item assets will
+            be signed
+
+    Yields:
+        Item: The items, where all assets' HREFs have been replaced with a
+            signed version.
+
+    """
+    for page in sign_search_pages(search):
+        yield from page
+
+
+def _search_and_sign(  # pylint: disable = W0613
+    search: "ItemSearch", copy: CopyMode = True
+) -> ItemCollection:
     """Perform a PySTAC Client search, and sign the resulting item collection.
 
     Args:
@@ -350,42 +724,28 @@ def _search_and_sign(search: ItemSearch, copy: bool = True) -> ItemCollection:
             were signed.
 
     """
-    if pystac_client.__version__ >= "0.5.0":
-        items = search.item_collection()
-    else:
-        items = search.get_all_items()
-    return sign(items)
+    return ItemCollection(sign_search_items(search), clone_items=False)
 
 
 @sign.register(Collection)
-def sign_collection(collection: Collection, copy: bool = True) -> Collection:
+def sign_collection(collection: Collection, copy: CopyMode = True) -> Collection:
     """
     Sign a collection.
 
     Args:
         collection: STAC Collection
-        copy: copy or not the input
+        copy: copy or not the input (see :func:`dinamis_sdk.sign` for
+            "shallow")
 
     Returns:
         signed (Collection): the STAC collection, now with signed URLs.
 
     """
-    if copy:
-        # https://github.com/stac-utils/pystac/pull/834 fixed asset dropping
-        assets = collection.assets
-        collection = collection.clone()
-        if assets and not collection.assets:
-            collection.assets = deepcopy(assets)
-
-    urls = [collection.assets[key].href for key in collection.assets]
-    signed_urls = sign_urls(urls=urls)
-    for key, asset in collection.assets.items():
-        collection.assets[key].href = signed_urls[asset.href]
-    return collection
+    return _copy_and_sign(collection, copy)
 
 
 @sign.register(collections.abc.Mapping)
-def sign_mapping(mapping: Mapping, copy: bool = True) -> Mapping:
+def sign_mapping(mapping: Mapping, copy: CopyMode = True) -> Mapping:
     """
     Sign a mapping.
 
@@ -401,73 +761,43 @@ def sign_mapping(mapping: Mapping, copy: bool = True) -> Mapping:
             * STAC collections
             * STAC ItemCollections
 
-        copy: Whether to copy (clone) the mapping or mutate it inplace.
+        copy: Whether to copy (clone) the mapping or mutate it inplace. With
+            "shallow", only the dicts holding the URLs are copied.
     Returns:
         signed (Mapping): The dictionary, now with signed URLs.
 
     """
-    if copy:
-        mapping = deepcopy(mapping)
-
-    types = (STACObjectType.ITEM, STACObjectType.COLLECTION)
-    if all(key in mapping for key in ["version", "templates", "refs"]):
-        urls = list(mapping["templates"].values())
-        signed_urls = sign_urls(urls=urls)
-        for key, url in mapping["templates"].items():
-            mapping["templates"][key] = signed_urls[url]
-
-    elif identify_stac_object_type(cast(Dict[str, Any], mapping)) in types:
-        urls = [val["href"] for val in mapping["assets"].values()]
-        signed_urls = sign_urls(urls=urls)
-        for val in mapping["assets"].values():
-            url = val["href"]
-            val["href"] = signed_urls[url]
-
-    elif mapping.get("type") == "FeatureCollection" and mapping.get("features"):
-        urls = [
-            val["href"]
-            for feat in mapping["features"]
-            for val in feat.get("assets", {}).values()
-        ]
-        signed_urls = sign_urls(urls=urls)
-        for feature in mapping["features"]:
-            for val in feature.get("assets", {}).values():
-                url = val["href"]
-                val["href"] = signed_urls[url]
-
-    return mapping
+    return _copy_and_sign(mapping, copy)
 
 
 sign_reference_file = sign_mapping
 
 
-def _generic_get_signed_urls(
-    urls: List[str],
-    route: SignURLRoute,
+def _get_cached_signed_urls(
+    urls: List[str], route: SignURLRoute
 ) -> Dict[str, SignedURL]:
     """
-    Get multiple signed URLs.
+    Get the signed URLs from the caches.
 
-    This will use the URL from the cache if it's present and not too close
-    to expiring. The generated URL will be placed in the cache.
+    Only GET URLs that are not too close to expiring are used: first from the
+    in-memory cache, then from the disk cache (when enabled).
 
     Args:
         urls: urls
         route: route (API)
 
     Returns:
-        SignedURL: the signed URL
-    """
-    # pylint: disable=too-many-statements
-    # pylint: disable=too-many-locals
-    # pylint: disable=too-many-branches
-    log.debug("Get signed URLs for %s", urls)
-    start_time = time.time()
+        dict of signed URLs found in cache: key = original URL, value =
+        SignedURL
 
-    signed_urls = {}
+    """
+    signed_urls: Dict[str, SignedURL] = {}
+    if route != SignURLRoute.SIGN_URLS_GET:
+        return signed_urls
+    n_stale = 0
     for url in urls:
         signed_url_in_cache = CACHE.get(url)
-        if signed_url_in_cache and route == SignURLRoute.SIGN_URLS_GET:
+        if signed_url_in_cache:
             log.debug("URL %s already in cache", url)
             ttl = signed_url_in_cache.ttl()
             log.debug("URL %s TTL is %s", url, ttl)
@@ -478,6 +808,511 @@ def _generic_get_signed_urls(
                     ENV.dinamis_sdk_ttl_margin,
                 )
                 signed_urls[url] = signed_url_in_cache
+            else:
+                n_stale += 1
+    if metrics.is_enabled():
+        metrics.inc("dinamis_sdk_cache_hits_total", len(signed_urls), cache="memory")
+        metrics.inc(
+            "dinamis_sdk_cache_misses_total",
+            len(urls) - len(signed_urls),
+            cache="memory",
+        )
+        metrics.inc("dinamis_sdk_cache_stale_total", n_stale, cache="memory")
+
+    disk_cache = get_disk_cache()
+    not_signed_urls = [url for url in urls if url not in signed_urls]
+    if disk_cache and not_signed_urls:
+        from_disk = disk_cache.get_many(
+            not_signed_urls, min_ttl=ENV.dinamis_sdk_ttl_margin
+        )
+        signed_from_disk = {
+            url: SignedURL(expiry=expiry, href=href)
+            for url, (href, expiry) in from_disk.items()
+        }
+        CACHE.update(signed_from_disk)
+        signed_urls.update(signed_from_disk)
+        if metrics.is_enabled():
+            metrics.inc("dinamis_sdk_cache_hits_total", len(from_disk), cache="disk")
+            metrics.inc(
+                "dinamis_sdk_cache_misses_total",
+                len(not_signed_urls) - len(from_disk),
+                cache="disk",
+            )
+    return signed_urls
+
+
+def _cache_signed_urls(signed_urls: Dict[str, SignedURL], route: SignURLRoute):
+    """
+    Put newly signed URLs in the caches.
+
+    Args:
+        signed_urls: dict of signed URLs: key = original URL, value = SignedURL
+        route: route (API)
+
+    """
+    if route != SignURLRoute.SIGN_URLS_GET or not signed_urls:
+        # Only put GET urls in cache
+        return
+    CACHE.update(signed_urls)
+    if disk_cache := get_disk_cache():
+        disk_cache.set_many(
+            {url: (su.href, su.expiry) for url, su in signed_urls.items()}
+        )
+
+
+def _split_in_chunks(urls: List[str], route: SignURLRoute) -> Iterator[List[str]]:
+    """Split URLs in chunks of the adaptive size of the route.
+
+    Chunks are cut lazily: each one has the size of the moment it is taken.
+    """
+    return get_chunk_size(route.value).iter_chunks(urls)
+
+
+def _split_too_large_chunk(urls: List[str], route: SignURLRoute) -> List[List[str]]:
+    """Split a chunk rejected as too large by the server, and adapt the size.
+
+    Args:
+        urls: urls of the chunk
+        route: route (API)
+
+    Returns:
+        the smaller chunks to request instead (none if the chunk can not be
+        split)
+
+    """
+    chunk_size = get_chunk_size(route.value)
+    chunk_size.on_too_large(n_urls=len(urls), n_bytes=url_bytes(urls))
+    chunks = chunk_size.split(urls)
+    if len(chunks) < 2:
+        return []
+    log.warning(
+        "Chunk of %s URLs too large, split in %s chunks", len(urls), len(chunks)
+    )
+    return chunks
+
+
+def _fall_back_encoding(
+    status: int | None,
+    headers: Dict[str, str],
+    body: bytes | None,
+    route: SignURLRoute,
+) -> bool:
+    """Change the encoding of a route after a rejected request, if possible.
+
+    Chunks sent in the query string are limited to `MAX_URLS` URLs.
+
+    Args:
+        status: HTTP status code of the response
+        headers: additional headers of the rejected request
+        body: body of the rejected request
+        route: route (API)
+
+    Returns:
+        True if the request can be sent again with another encoding
+
+    """
+    encoding = get_chunk_encoding(route.value)
+    if not encoding.fall_back(status, headers, body):
+        return False
+    if not encoding.use_body:
+        get_chunk_size(route.value).limit(MAX_URLS, "URLs in the query string")
+    return True
+
+
+def _get_request_params(urls: List[str]) -> Dict[str, Any]:
+    """Return the query parameters to sign a chunk of URLs."""
+    params: Dict[str, Any] = {"urls": urls}
+    if ENV.dinamis_sdk_url_duration:
+        params["duration_seconds"] = ENV.dinamis_sdk_url_duration
+    return params
+
+
+def _parse_response(urls: List[str], data: Any) -> Dict[str, SignedURL]:
+    """
+    Parse the response of the signing endpoint for a chunk of URLs.
+
+    Args:
+        urls: urls of the chunk
+        data: JSON response
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    signed_url_batch = SignedURLBatch(**data)
+    if not signed_url_batch:
+        raise ValueError(f"No signed url batch found in response: {data}")
+    if not all(key in signed_url_batch.hrefs for key in urls):
+        raise ValueError(
+            f"URLs to sign are {urls} but returned "
+            f"signed URLs"
+            f"are for {signed_url_batch.hrefs.keys()}"
+        )
+    return {
+        url: SignedURL(expiry=signed_url_batch.expiry, href=href)
+        for url, href in signed_url_batch.hrefs.items()
+    }
+
+
+def _request_signed_urls(urls: List[str], route: SignURLRoute) -> Dict[str, SignedURL]:
+    """
+    Request the signing endpoint for one chunk of URLs.
+
+    The chunk is split and requested again when the server rejects it as too
+    large, and sent again with another encoding when the server does not
+    accept the current one.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    chunk_size = get_chunk_size(route.value)
+    encoding = get_chunk_encoding(route.value)
+    params, body, headers = encoding.encode(_get_request_params(urls))
+    metrics.observe("dinamis_sdk_batch_urls", len(urls), route=route.value)
+    start = time.perf_counter()
+    try:
+        response = session.post(
+            route=route.value,
+            params=params,
+            data=body,
+            extra_headers=headers,
+            log_errors=encoding.is_confirmed(headers, body),
+        )
+    except requests.HTTPError as err:
+        status = err.response.status_code if err.response is not None else None
+        if _fall_back_encoding(status, headers, body, route=route):
+            return _request_signed_urls(urls=urls, route=route)
+        if status in TOO_LARGE_STATUSES:
+            if chunks := _split_too_large_chunk(urls, route=route):
+                signed_urls: Dict[str, SignedURL] = {}
+                for chunk in chunks:
+                    signed_urls.update(_request_signed_urls(urls=chunk, route=route))
+                return signed_urls
+        else:
+            chunk_size.on_error()
+        raise
+    except requests.RequestException:
+        chunk_size.on_error()
+        raise
+    chunk_size.on_success(n_urls=len(urls), latency=time.perf_counter() - start)
+    encoding.on_success(headers, body)
+    return _parse_response(urls=urls, data=response.json())
+
+
+def _request_chunks(
+    chunks: Iterator[List[str]], route: SignURLRoute, max_workers: int
+) -> Tuple[List[Dict[str, SignedURL]], List[Tuple[int, BaseException]], int]:
+    """
+    Request the signing endpoint for several chunks of URLs.
+
+    Chunks are sent concurrently, with at most
+    `ENV.dinamis_sdk_signing_concurrency` requests in flight. Each worker
+    takes the next chunk when its previous request is done.
+
+    Args:
+        chunks: chunks of urls
+        route: route (API)
+        max_workers: maximum number of workers (e.g. the expected number of
+            chunks)
+
+    Returns:
+        the signed URLs of the successful chunks (in the same order as the
+        chunks), the (index, error) of the failed chunks, and the number of
+        chunks
+
+    """
+    indexed_chunks = enumerate(chunks)
+    chunks_lock = threading.Lock()
+    outcomes: List[Tuple[int, Dict[str, SignedURL] | None, BaseException | None]] = []
+
+    def _worker():
+        while True:
+            with chunks_lock:
+                i_chunk, chunk = next(indexed_chunks, (-1, []))
+            if not chunk:
+                return
+            try:
+                signed = _request_signed_urls(urls=chunk, route=route)
+                outcomes.append((i_chunk, signed, None))
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                outcomes.append((i_chunk, None, err))
+
+    n_workers = min(ENV.dinamis_sdk_signing_concurrency, max_workers)
+    if n_workers <= 1:
+        _worker()
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for _ in range(n_workers):
+                executor.submit(_worker)
+    outcomes.sort(key=lambda outcome: outcome[0])
+    results = [signed for _, signed, _ in outcomes if signed is not None]
+    errors = [(i_chunk, err) for i_chunk, _, err in outcomes if err is not None]
+    return results, errors, len(outcomes)
+
+
+def _merge_chunks_results(
+    results: List[Dict[str, SignedURL]],
+    errors: List[Tuple[int, BaseException]],
+    n_chunks: int,
+    route: SignURLRoute,
+) -> Dict[str, SignedURL]:
+    """
+    Merge the results of the chunks, and put them in cache.
+
+    The successful chunks are cached even when some chunks have failed. In
+    this case, the error of the first failed chunk is raised.
+
+    Args:
+        results: signed URLs of the successful chunks
+        errors: (index, error) of the failed chunks
+        n_chunks: total number of chunks
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    newly_signed: Dict[str, SignedURL] = {}
+    for chunk_signed_urls in results:
+        newly_signed.update(chunk_signed_urls)
+    _cache_signed_urls(newly_signed, route=route)
+    metrics.inc("dinamis_sdk_chunks_total", n_chunks, route=route.value)
+    metrics.inc("dinamis_sdk_chunk_errors_total", len(errors), route=route.value)
+    for i_chunk, err in errors:
+        log.error("Chunk %s/%s failed (%s)", i_chunk + 1, n_chunks, err)
+    if errors:
+        raise errors[0][1]
+    return newly_signed
+
+
+def _presign_locally(
+    urls: List[str], route: SignURLRoute
+) -> Tuple[Dict[str, SignedURL], List[str]]:
+    """
+    Presign URLs locally, if the connection method allows it, then cache them.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of presigned URLs (key = original URL, value = SignedURL), and
+        the list of URLs left to the signing endpoint
+
+    """
+    method = session.get_method()
+    if not urls or not isinstance(method, LocalSigningConnectionMethod):
+        return {}, urls
+    presigned, remaining = method.presign_urls(urls, method=route.http_method)
+    metrics.inc(
+        "dinamis_sdk_local_signed_urls_total", len(presigned), route=route.value
+    )
+    signed_urls = {
+        url: SignedURL(href=href, expiry=expiry)
+        for url, (href, expiry) in presigned.items()
+    }
+    _cache_signed_urls(signed_urls, route=route)
+    return signed_urls, remaining
+
+
+def _request_and_cache(urls: List[str], route: SignURLRoute) -> Dict[str, SignedURL]:
+    """
+    Sign URLs with the signing endpoint, ignoring the cache, then cache them.
+
+    URLs are presigned locally instead, when the connection method allows it.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    signed_urls, urls = _presign_locally(urls=urls, route=route)
+    if not urls:
+        return signed_urls
+    chunks = _split_in_chunks(urls, route=route)
+    results, errors, n_chunks = _request_chunks(
+        chunks=chunks,
+        route=route,
+        max_workers=math.ceil(len(urls) / get_chunk_size(route.value).size),
+    )
+    log.debug("Number of chunks of URLs to sign: %s", n_chunks)
+    signed_urls.update(
+        _merge_chunks_results(
+            results=results, errors=errors, n_chunks=n_chunks, route=route
+        )
+    )
+    return signed_urls
+
+
+@lru_cache(maxsize=None)
+def get_batching_signer(route: SignURLRoute) -> Any:
+    """Return the micro-batching signer of a route, when enabled."""
+    if not ENV.dinamis_sdk_batch_window or route != SignURLRoute.SIGN_URLS_GET:
+        return None
+    # pylint: disable-next = import-outside-toplevel, cyclic-import
+    from .batching import BatchingSigner
+
+    return BatchingSigner(window=ENV.dinamis_sdk_batch_window, route=route)
+
+
+class _ClaimAbandoned(Exception):
+    """The caller signing a URL has stopped before the URL was signed."""
+
+
+def _claim_urls(
+    urls: List[str], route: SignURLRoute
+) -> Tuple[List[str], Dict[str, Future]]:
+    """
+    Claim the URLs to sign, unless other threads are already signing them.
+
+    Args:
+        urls: urls that are not in cache
+        route: route (API)
+
+    Returns:
+        the (deduplicated) urls that the caller has to sign, and the futures
+        of the urls already being signed by other threads
+
+    """
+    urls = list(dict.fromkeys(urls))
+    if route != SignURLRoute.SIGN_URLS_GET:
+        return urls, {}
+    claimed: List[str] = []
+    pending: Dict[str, Future] = {}
+    with _IN_FLIGHT_LOCK:
+        for url in urls:
+            if url in _IN_FLIGHT:
+                pending[url] = _IN_FLIGHT[url]
+            else:
+                _IN_FLIGHT[url] = Future()
+                claimed.append(url)
+    if pending:
+        log.debug("%s URLs already being signed", len(pending))
+    return claimed, pending
+
+
+def _release_urls(
+    urls: List[str],
+    route: SignURLRoute,
+    signed_urls: Dict[str, SignedURL],
+    error: BaseException | None = None,
+):
+    """
+    Release the claimed URLs, and wake up the threads waiting for them.
+
+    Args:
+        urls: claimed urls
+        route: route (API)
+        signed_urls: signed urls
+        error: error raised while signing the urls, if any
+
+    """
+    if route != SignURLRoute.SIGN_URLS_GET:
+        return
+    with _IN_FLIGHT_LOCK:
+        futures = [_IN_FLIGHT.pop(url) for url in urls]
+    for url, future in zip(urls, futures):
+        if url in signed_urls:
+            future.set_result(signed_urls[url])
+        else:
+            future.set_exception(error or ValueError(f"URL {url} has not been signed"))
+
+
+@contextmanager
+def _single_flight(
+    urls: List[str], route: SignURLRoute
+) -> Iterator[Tuple[List[str], Dict[str, Future], Dict[str, SignedURL]]]:
+    """
+    Claim URLs to sign, and release them when done.
+
+    Args:
+        urls: urls that are not in cache
+        route: route (API)
+
+    Yields:
+        the urls that the caller has to sign, the futures of the urls already
+        being signed by other threads, and a dict that the caller fills with
+        the signed urls
+
+    """
+    claimed, pending = _claim_urls(urls=urls, route=route)
+    signed_urls: Dict[str, SignedURL] = {}
+    try:
+        yield claimed, pending, signed_urls
+    except Exception as err:
+        _release_urls(claimed, route=route, signed_urls=signed_urls, error=err)
+        raise
+    except BaseException:
+        # The caller has been cancelled (or interrupted): this does not concern
+        # the other callers, which sign the URLs themselves
+        _release_urls(
+            claimed, route=route, signed_urls=signed_urls, error=_ClaimAbandoned()
+        )
+        raise
+    _release_urls(claimed, route=route, signed_urls=signed_urls)
+
+
+def _wait_for_pending(
+    pending: Dict[str, Future], route: SignURLRoute
+) -> Dict[str, SignedURL]:
+    """
+    Wait for the URLs being signed by other threads.
+
+    The URLs abandoned by their thread (e.g. a cancelled coroutine) are signed
+    again.
+
+    Args:
+        pending: futures of the urls being signed by other threads
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    signed_urls: Dict[str, SignedURL] = {}
+    abandoned: List[str] = []
+    for url, future in pending.items():
+        try:
+            signed_urls[url] = future.result()
+        except _ClaimAbandoned:
+            abandoned.append(url)
+    if abandoned:
+        log.debug("Signing %s abandoned URLs", len(abandoned))
+        signed_urls.update(_generic_get_signed_urls(urls=abandoned, route=route))
+    return signed_urls
+
+
+def _generic_get_signed_urls(
+    urls: List[str],
+    route: SignURLRoute,
+) -> Dict[str, SignedURL]:
+    """
+    Get multiple signed URLs.
+
+    This will use the URL from the cache if it's present and not too close
+    to expiring. The generated URL will be placed in the cache. When some GET
+    URLs are already being signed by other threads, their results are awaited
+    instead of being requested again.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        SignedURL: the signed URL
+    """
+    log.debug("Get signed URLs for %s", urls)
+    start_time = time.time()
+
+    signed_urls = _get_cached_signed_urls(urls=urls, route=route)
     not_signed_urls = [url for url in urls if url not in signed_urls]
     log.debug("Already signed URLs:\n %s", signed_urls)
     log.debug("Not signed URLs:\n %s", not_signed_urls)
@@ -486,36 +1321,18 @@ def _generic_get_signed_urls(
         # Refresh the token if there's less than
         # `settings.dinamis_sdk_ttl_margin seconds` remaining, in order to
         # give a small amount of time to do stuff with the url
-        n_urls = len(not_signed_urls)
-        log.debug("Number of URLs to sign: %s", n_urls)
-        n_chunks = math.ceil(n_urls / MAX_URLS)
-        log.debug("Number of chunks of URLs to sign: %s", n_chunks)
-        for i_chunk in range(n_chunks):
-            log.debug("Processing chunk %s/%s", i_chunk + 1, n_chunks)
-            chunk_start = i_chunk * MAX_URLS
-            chunk_end = min(chunk_start + MAX_URLS, n_urls)
-            not_signed_urls_chunk = not_signed_urls[chunk_start:chunk_end]
-            params: Dict[str, Any] = {"urls": not_signed_urls_chunk}
-            if ENV.dinamis_sdk_url_duration:
-                params["duration_seconds"] = ENV.dinamis_sdk_url_duration
-            response = session.post(route=route.value, params=params)
-            signed_url_batch = SignedURLBatch(**response.json())
-            if not signed_url_batch:
-                raise ValueError(
-                    f"No signed url batch found in response: {response.json()}"
-                )
-            if not all(key in signed_url_batch.hrefs for key in not_signed_urls_chunk):
-                raise ValueError(
-                    f"URLs to sign are {not_signed_urls_chunk} but returned "
-                    f"signed URLs"
-                    f"are for {signed_url_batch.hrefs.keys()}"
-                )
-            for url, href in signed_url_batch.hrefs.items():
-                signed_url = SignedURL(expiry=signed_url_batch.expiry, href=href)
-                if route == SignURLRoute.SIGN_URLS_GET:
-                    # Only put GET urls in cache
-                    CACHE[url] = signed_url
-                signed_urls[url] = signed_url
+        with _single_flight(urls=not_signed_urls, route=route) as (
+            claimed,
+            pending,
+            newly_signed,
+        ):
+            log.debug("Number of URLs to sign: %s", len(claimed))
+            if claimed and (batching_signer := get_batching_signer(route)):
+                newly_signed.update(batching_signer.sign(claimed))
+            elif claimed:
+                newly_signed.update(_request_and_cache(urls=claimed, route=route))
+        signed_urls.update(newly_signed)
+        signed_urls.update(_wait_for_pending(pending, route=route))
         log.debug(
             "Got signed urls %s in %s seconds",
             signed_urls,
@@ -0,0 +1,418 @@
+"""
+Asynchronous signing module.
+
+Coroutine counterparts of the functions of `dinamis_sdk.signing`. Requests to
+the signing endpoint are sent with a `httpx.AsyncClient`, shared by all
+coroutines of the same event loop. The cache and the credentials are the same
+as the synchronous API.
+
+Requires `httpx` (`pip install dinamis-sdk[async]`).
+"""
+
+import asyncio
+import sys
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+from pystac import ItemCollection
+
+from . import metrics
+from .chunking import TOO_LARGE_STATUSES, get_chunk_encoding, get_chunk_size
+from .http import session
+from .retry import get_retry_policy, parse_retry_after
+from .settings import ENV
+from .signing import (
+    CopyMode,
+    SignedURL,
+    SignURLRoute,
+    _ClaimAbandoned,
+    _copy,
+    _fall_back_encoding,
+    _filter_urls_to_sign,
+    _get_cached_signed_urls,
+    _get_hrefs,
+    _get_request_params,
+    _merge_chunks_results,
+    _parse_response,
+    _presign_locally,
+    _set_hrefs,
+    _single_flight,
+    _split_in_chunks,
+    _split_too_large_chunk,
+    get_disk_cache,
+)
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+T = TypeVar("T")
+
+# One client (i.e. connection pool) per event loop
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client():
+    """Return the HTTP client of the running event loop."""
+    try:
+        import httpx  # pylint: disable = import-outside-toplevel
+    except ImportError as err:
+        raise ImportError(
+            "The asynchronous API requires httpx (pip install dinamis-sdk[async])"
+        ) from err
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        log.debug("Creating async HTTP client")
+        limits = httpx.Limits(
+            max_connections=ENV.dinamis_sdk_pool_maxsize,
+            max_keepalive_connections=ENV.dinamis_sdk_pool_maxsize,
+        )
+        client = httpx.AsyncClient(
+            timeout=10,
+            # Requests are retried by `_post_async()`
+            transport=httpx.AsyncHTTPTransport(
+                limits=limits,
+                http2=ENV.dinamis_sdk_http2,
+            ),
+        )
+        _CLIENTS[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the HTTP client of the running event loop."""
+    client = _CLIENTS.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _call_async(func: Callable[..., T], **kwargs: Any) -> T:
+    """Call a function using the caches of signed URLs from a coroutine.
+
+    The disk cache uses blocking I/O: when it is enabled, the function is
+    called in a thread, so that the event loop is not blocked.
+    """
+    if get_disk_cache():
+        return await asyncio.to_thread(func, **kwargs)
+    return func(**kwargs)
+
+
+async def _post_async(  # pylint: disable = too-many-locals
+    url: str, route: SignURLRoute, **kwargs: Any
+) -> Any:
+    """
+    Send a POST request to the signing endpoint, with retries.
+
+    Requests are retried according to the "signing" retry policy, are not
+    sent while the circuit breaker of the signing endpoint is open, and wait
+    for its rate limiter.
+
+    Args:
+        url: url
+        route: route (API)
+        **kwargs: other arguments of `httpx.AsyncClient.post()`
+
+    Returns:
+        the response
+
+    """
+    client = get_async_client()
+    import httpx  # pylint: disable = import-outside-toplevel
+
+    policy = get_retry_policy("signing")
+    breaker = session.breaker
+    limiter = session.limiter
+    started = time.monotonic()
+    n_retries = 0
+    while True:
+        breaker.check(url)
+        if limiter:
+            await limiter.acquire_async()
+        with metrics.timer(
+            "dinamis_sdk_http_request_seconds", route=route.value
+        ) as labels:
+            error: httpx.TransportError | None = None
+            try:
+                response = await client.post(url, **kwargs)
+            except httpx.TransportError as err:
+                breaker.record_failure()
+                if policy.next_delay(n_retries + 1, started) is None:
+                    raise
+                response, error = None, err
+            else:
+                breaker.record_response(response.status_code)
+                labels["status"] = str(response.status_code)
+                if limiter and response.status_code == 429:
+                    await limiter.call_async(
+                        limiter.on_throttled, parse_retry_after(response.headers)
+                    )
+                elif limiter and response.status_code < 400:
+                    await limiter.call_async(limiter.on_success)
+        if response is not None:
+            metrics.inc("dinamis_sdk_http_requests_total", **labels)
+            if response.status_code not in policy.status_forcelist:
+                return response
+        n_retries += 1
+        retry_after = parse_retry_after(response.headers) if response else None
+        delay = policy.next_delay(n_retries, started, retry_after=retry_after)
+        if delay is None or not breaker.is_closed():
+            if error:
+                # e.g. the circuit breaker has just been opened by this error
+                raise error
+            return response
+        metrics.inc("dinamis_sdk_http_retries_total", route=route.value)
+        log.debug("Retrying in %.2fs", delay)
+        await asyncio.sleep(delay)
+
+
+async def _request_signed_urls_async(
+    urls: List[str], route: SignURLRoute
+) -> Dict[str, SignedURL]:
+    """
+    Request the signing endpoint for one chunk of URLs.
+
+    The chunk is split and requested again when the server rejects it as too
+    large, and sent again with another encoding when the server does not
+    accept the current one.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    chunk_size = get_chunk_size(route.value)
+    encoding = get_chunk_encoding(route.value)
+    params, body, extra_headers = encoding.encode(_get_request_params(urls))
+    # Getting the headers might refresh the credentials, which is blocking
+    url, headers = await asyncio.to_thread(session.prepare_request, route.value)
+    log.debug("POST to %s", url)
+    metrics.observe("dinamis_sdk_batch_urls", len(urls), route=route.value)
+    start = time.perf_counter()
+    try:
+        response = await _post_async(
+            url,
+            route=route,
+            params=params,
+            content=body,
+            headers={**headers, **extra_headers},
+        )
+    except Exception:
+        chunk_size.on_error()
+        raise
+    if response.is_error and _fall_back_encoding(
+        response.status_code, extra_headers, body, route=route
+    ):
+        return await _request_signed_urls_async(urls=urls, route=route)
+    if response.status_code in TOO_LARGE_STATUSES:
+        if chunks := _split_too_large_chunk(urls, route=route):
+            signed_urls: Dict[str, SignedURL] = {}
+            for chunk in chunks:
+                signed_urls.update(
+                    await _request_signed_urls_async(urls=chunk, route=route)
+                )
+            return signed_urls
+    elif response.is_error:
+        chunk_size.on_error()
+    else:
+        chunk_size.on_success(n_urls=len(urls), latency=time.perf_counter() - start)
+        encoding.on_success(extra_headers, body)
+    if response.is_error:
+        log.error(response.text)
+    response.raise_for_status()
+    return _parse_response(urls=urls, data=response.json())
+
+
+async def _generic_get_signed_urls_async(
+    urls: List[str],
+    route: SignURLRoute,
+) -> Dict[str, SignedURL]:
+    """
+    Get multiple signed URLs.
+
+    Same as `dinamis_sdk.signing._generic_get_signed_urls`, but chunks are
+    requested concurrently on the event loop.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    log.debug("Get signed URLs for %s", urls)
+    start_time = time.time()
+
+    signed_urls = await _call_async(_get_cached_signed_urls, urls=urls, route=route)
+    not_signed_urls = [url for url in urls if url not in signed_urls]
+    if not not_signed_urls:
+        return signed_urls
+
+    with _single_flight(urls=not_signed_urls, route=route) as (
+        claimed,
+        pending,
+        newly_signed,
+    ):
+        newly_signed.update(await _request_and_cache_async(urls=claimed, route=route))
+    signed_urls.update(newly_signed)
+    abandoned: List[str] = []
+    for url, future in pending.items():
+        try:
+            # Shielded, so that cancelling the caller does not cancel the
+            # future shared with the other callers
+            signed_urls[url] = await asyncio.shield(asyncio.wrap_future(future))
+        except _ClaimAbandoned:
+            abandoned.append(url)
+    if abandoned:
+        log.debug("Signing %s abandoned URLs", len(abandoned))
+        signed_urls.update(
+            await _generic_get_signed_urls_async(urls=abandoned, route=route)
+        )
+    log.debug(
+        "Got %s signed URLs in %.2f seconds",
+        len(signed_urls),
+        time.time() - start_time,
+    )
+    return signed_urls
+
+
+async def _request_and_cache_async(
+    urls: List[str], route: SignURLRoute
+) -> Dict[str, SignedURL]:
+    """
+    Sign URLs with the signing endpoint, ignoring the cache, then cache them.
+
+    Chunks are requested concurrently on the event loop.
+
+    Args:
+        urls: urls
+        route: route (API)
+
+    Returns:
+        dict of signed URLs: key = original URL, value = SignedURL
+
+    """
+    signed_urls, urls = await _call_async(_presign_locally, urls=urls, route=route)
+    if not urls:
+        return signed_urls
+    chunks = enumerate(_split_in_chunks(urls, route=route))
+    outcomes: Dict[int, Dict[str, SignedURL] | BaseException] = {}
+
+    async def _worker():
+        # Chunks are taken one at a time, with the size of the moment
+        for i_chunk, chunk in chunks:
+            try:
+                outcomes[i_chunk] = await _request_signed_urls_async(
+                    urls=chunk, route=route
+                )
+            except Exception as err:  # pylint: disable = broad-exception-caught
+                outcomes[i_chunk] = err
+
+    await asyncio.gather(
+        *(_worker() for _ in range(ENV.dinamis_sdk_signing_concurrency))
+    )
+    results: List[Dict[str, SignedURL]] = []
+    errors: List[Tuple[int, BaseException]] = []
+    for i_chunk, outcome in sorted(outcomes.items()):
+        if isinstance(outcome, BaseException):
+            errors.append((i_chunk, outcome))
+        else:
+            results.append(outcome)
+    signed_urls.update(
+        await _call_async(
+            _merge_chunks_results,
+            results=results,
+            errors=errors,
+            n_chunks=len(outcomes),
+            route=route,
+        )
+    )
+    return signed_urls
+
+
+async def _generic_sign_urls_async(
+    urls: List[str], route: SignURLRoute
+) -> Dict[str, str]:
+    """Asynchronous version of `dinamis_sdk.signing._generic_sign_urls`."""
+    signed_urls, not_signed_urls = _filter_urls_to_sign(urls)
+    signed = await _generic_get_signed_urls_async(urls=not_signed_urls, route=route)
+    signed_urls.update({url: signed_url.href for url, signed_url in signed.items()})
+    return signed_urls
+
+
+async def sign_urls_async(urls: List[str]) -> Dict[str, str]:
+    """Sign multiple URLs for GET."""
+    return await _generic_sign_urls_async(urls=urls, route=SignURLRoute.SIGN_URLS_GET)
+
+
+async def sign_urls_put_async(urls: List[str]) -> Dict[str, str]:
+    """Sign multiple URLs for PUT."""
+    return await _generic_sign_urls_async(urls=urls, route=SignURLRoute.SIGN_URLS_PUT)
+
+
+async def sign_url_put_async(url: str) -> str:
+    """Sign a single URL for PUT."""
+    urls = await sign_urls_put_async([url])
+    return urls[url]
+
+
+async def sign_async(obj: Any, copy: CopyMode = True) -> Any:
+    """Sign the relevant URLs of an object with a S3 token.
+
+    The URLs are signed asynchronously, then written in the object (or its
+    copy). PySTAC Client searches are not supported: use
+    :func:`dinamis_sdk.sign_search_pages` in a thread instead.
+
+    Args:
+        obj (Any): The object to sign. Must be one of:
+            str (URL), Asset, Item, ItemCollection, Collection, or a mapping.
+        copy (bool | "shallow"): Whether to sign the object in place, or make
+            a copy. See :func:`dinamis_sdk.sign`.
+
+    Returns:
+        Any: A copy of the object where all relevant URLs have been signed
+
+    """
+    # pystac_client is not imported until a search has to be signed
+    pystac_client = sys.modules.get("pystac_client")
+    if pystac_client and isinstance(obj, pystac_client.ItemSearch):
+        raise TypeError(
+            "ItemSearch can not be signed asynchronously, "
+            "use dinamis_sdk.sign_search_pages in a thread instead"
+        )
+    signed_urls = await sign_urls_async(_get_hrefs(obj))
+    return _set_hrefs(_copy(obj, copy), signed_urls)
+
+
+async def sign_inplace_async(obj: Any) -> Any:
+    """Sign the object in place.
+
+    See :func:`dinamis_sdk.sign_async` for more.
+
+    """
+    return await sign_async(obj, copy=False)
+
+
+async def sign_item_collection_async(
+    item_collection: ItemCollection, copy: CopyMode = True
+) -> ItemCollection:
+    """Sign a PySTAC item collection.
+
+    Args:
+        item_collection (ItemCollection): The ItemCollection whose assets will
+            be signed
+        copy (bool | "shallow"): Whether to copy (clone) the ItemCollection or
+            mutate it inplace. See :func:`dinamis_sdk.sign`.
+
+    Returns:
+        ItemCollection: An ItemCollection where all assets' HREFs for each
+        item have been replaced with a signed version.
+
+    """
+    return await sign_async(item_collection, copy=copy)
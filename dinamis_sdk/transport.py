@@ -0,0 +1,93 @@
+"""Shared HTTP sessions.
+
+All the requests of the package (signing, authentication, uploads, CLI) are
+sent with sessions of this module, so that they reuse the same connection
+pools instead of opening a new connection (and doing a new TLS handshake) for
+each request. There is one session per retry policy (see
+`dinamis_sdk.retry`) and block size.
+
+The pools are sized with `DINAMIS_SDK_POOL_CONNECTIONS` (number of hosts) and
+`DINAMIS_SDK_POOL_MAXSIZE` (connections kept per host). After a fork, the
+child process starts with new sessions, and never uses the connections of the
+parent process.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import requests
+
+from .ratelimit import TokenBucket
+from .retry import CircuitBreaker, RetryPolicy, get_retry_policy
+from .settings import ENV
+from .utils import create_session, get_logger_for
+
+log = get_logger_for(__name__)
+
+_SESSIONS: Dict[Tuple, requests.Session] = {}
+_LOCK = threading.Lock()
+
+
+def get_session(
+    policy: RetryPolicy | None = None,
+    blocksize: int | None = None,
+    pool_maxsize: int = 0,
+    breaker: CircuitBreaker | None = None,
+    limiter: TokenBucket | None = None,
+) -> requests.Session:
+    """Return the shared session for a retry policy and a block size.
+
+    Args:
+        policy: retry policy (defaults to the "default" policy)
+        blocksize: block size to send request bodies
+        pool_maxsize: minimum number of connections kept per host (e.g. the
+            number of threads that use the session), in addition to
+            `ENV.dinamis_sdk_pool_maxsize`
+        breaker: circuit breaker stopping the retries when it opens
+        limiter: rate limiter that the retries wait for
+
+    Returns:
+        the session
+
+    """
+    policy = policy or get_retry_policy("default")
+    pool_maxsize = max(pool_maxsize, ENV.dinamis_sdk_pool_maxsize)
+    key = (policy, blocksize, pool_maxsize, breaker, limiter)
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            log.debug("Creating HTTP session %s", key)
+            session = create_session(
+                retry=policy.to_urllib3(breaker=breaker, limiter=limiter),
+                blocksize=blocksize,
+                pool_maxsize=pool_maxsize,
+                pool_connections=ENV.dinamis_sdk_pool_connections,
+                pool_block=ENV.dinamis_sdk_pool_block,
+                tcp_keepalive=ENV.dinamis_sdk_tcp_keepalive,
+            )
+            _SESSIONS[key] = session
+    return session
+
+
+def close_sessions():
+    """Close the shared sessions and their connections."""
+    with _LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for session in sessions:
+        session.close()
+
+
+def _reset_after_fork():
+    """Forget the sessions of the parent process.
+
+    The sessions are not closed: their sockets are still used by the parent.
+    """
+    global _LOCK  # pylint: disable = global-statement
+    _LOCK = threading.Lock()
+    _SESSIONS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,28 +1,361 @@
 """This module is used to upload files using HTTP requests."""
 
-from .signing import sign_url_put
-from .utils import create_session
+import hashlib
+import mmap
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Mapping, Tuple
 
+import requests
+from pydantic import BaseModel
 
-def push(
+from . import metrics
+from .settings import ENV, MAX_URLS
+from .signing import sign_url_put, sign_urls, sign_urls_put
+from .retry import get_retry_policy
+from .transport import get_session
+from .utils import get_logger_for
+
+log = get_logger_for(__name__)
+
+
+@contextmanager
+def open_body(local_filename: str) -> Iterator[BinaryIO]:
+    """Open a local file to be sent as a request body.
+
+    Non-empty files are memory-mapped, so that their content is read from the
+    page cache without intermediate buffering.
+    """
+    with open(local_filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped  # type: ignore
+
+
+def local_md5(local_filename: str, block_size: int) -> str:
+    """Return the MD5 hex digest of a local file."""
+    md5 = hashlib.md5()
+    with open_body(local_filename) as body:
+        while block := body.read(block_size):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _object_size(response: requests.Response) -> int:
+    """Return the size of the object of a (ranged) GET response, or -1."""
+    if response.status_code == 206:
+        # e.g. "bytes 0-0/1234"
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else -1
+    if response.status_code == 200:
+        return int(response.headers.get("Content-Length", -1))
+    return -1
+
+
+def _is_identical(
+    session: requests.Session,
+    local_filename: str,
+    signed_url: str,
+    block_size: int,
+    timeout: float | Tuple[float, float],
+) -> bool:
+    """Check whether the remote object is identical to the local file.
+
+    The URL is signed for GET, which does not allow HEAD requests: the first
+    byte of the object is requested instead, and its size is read from the
+    `Content-Range` header of the response.
+    """
+    try:
+        with session.get(
+            signed_url, headers={"Range": "bytes=0-0"}, timeout=timeout, stream=True
+        ) as ret:
+            size = _object_size(ret)
+            etag = ret.headers.get("ETag", "").strip('"')
+    except requests.exceptions.RetryError:
+        # e.g. the remote object does not exist
+        return False
+    if size != os.path.getsize(local_filename):
+        return False
+    return etag == local_md5(local_filename, block_size=block_size)
+
+
+def is_uploaded(
+    local_filename: str,
+    target_url: str,
+    block_size: int,
+    timeout: float | Tuple[float, float] = 10,
+) -> bool:
+    """Check whether the remote object is identical to the local file.
+
+    The size and the ETag of the remote object are compared to the size and
+    the MD5 checksum of the local file. Objects that have been uploaded in
+    multiple parts (ETag ending with "-<number of parts>") are never
+    considered identical.
+
+    Args:
+        local_filename: local file
+        target_url: remote object URL
+        block_size: block size to read the local file
+        timeout: timeout of the request
+
+    Returns:
+        True if the remote object exists and is identical to the local file
+
+    """
+    return _is_identical(
+        session=get_session(get_retry_policy("upload", total=0)),
+        local_filename=local_filename,
+        signed_url=sign_urls([target_url])[target_url],
+        block_size=block_size,
+        timeout=timeout,
+    )
+
+
+def _put(
+    session: requests.Session,
+    local_filename: str,
+    presigned_url: str,
+    timeout: float | Tuple[float, float],
+):
+    """Upload a local file to a presigned URL."""
+    with metrics.timer("dinamis_sdk_upload_seconds") as labels:
+        labels["status"] = "error"
+        try:
+            with open_body(local_filename) as body:
+                ret = session.put(presigned_url, data=body, timeout=timeout)
+            labels["status"] = str(ret.status_code)
+        finally:
+            metrics.inc("dinamis_sdk_uploads_total", **labels)
+    ret.raise_for_status()
+    if metrics.is_enabled():
+        size = os.path.getsize(local_filename)
+        metrics.inc("dinamis_sdk_uploaded_bytes_total", size)
+        metrics.observe("dinamis_sdk_upload_bytes", size)
+
+
+def push(  # pylint: disable = too-many-arguments
     local_filename: str,
     target_url: str,
     retry_total: int = 5,
     retry_backoff_factor: float = 0.8,
+    *,
+    timeout: float | Tuple[float, float] | None = None,
+    block_size: int | None = None,
+    skip_identical: bool = False,
 ):
-    """Publish a local file to the cloud."""
+    """Publish a local file to the cloud.
+
+    The file is memory-mapped and streamed in blocks of `block_size` bytes.
+
+    Args:
+        local_filename: local file
+        target_url: remote object URL
+        retry_total: number of retries
+        retry_backoff_factor: backoff factor between retries
+        timeout: connect and read timeout, in seconds (defaults to
+            `ENV.dinamis_sdk_upload_timeout`)
+        block_size: size of the blocks sent over the connection (defaults to
+            `ENV.dinamis_sdk_upload_block_size`)
+        skip_identical: do not upload the file when the remote object is
+            already identical (same size and checksum)
+
+    Returns:
+        The presigned URL used to upload the file, or the presigned URL to
+        read the remote object when the file is identical and not uploaded
+
+    """
+    timeout = timeout or ENV.dinamis_sdk_upload_timeout
+    block_size = block_size or ENV.dinamis_sdk_upload_block_size
+    # The PUT URL is only signed when the file has to be uploaded
+    if skip_identical and is_uploaded(
+        local_filename, target_url, block_size=block_size, timeout=timeout
+    ):
+        log.info("%s is already uploaded to %s", local_filename, target_url)
+        metrics.inc("dinamis_sdk_uploads_skipped_total")
+        # Signed URL in cache
+        return sign_urls([target_url])[target_url]
+
     remote_presigned_url = sign_url_put(target_url)
+    session = get_session(
+        get_retry_policy(
+            "upload", total=retry_total, backoff_factor=retry_backoff_factor
+        ),
+        blocksize=block_size,
+    )
+    _put(session, local_filename, remote_presigned_url, timeout=timeout)
+    return remote_presigned_url
 
-    session = create_session(
-        retry_total=retry_total,
-        retry_backoff_factor=retry_backoff_factor,
+
+class PushResult(BaseModel):
+    """Result of the upload of one file."""
+
+    local_filename: str
+    target_url: str
+    presigned_url: str = ""
+    skipped: bool = False
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the file has been uploaded (or skipped)."""
+        return self.error is None
+
+
+def push_many(  # pylint: disable = too-many-arguments, too-many-locals
+    files: Mapping[str, str],
+    retry_total: int = 5,
+    retry_backoff_factor: float = 0.8,
+    *,
+    timeout: float | Tuple[float, float] | None = None,
+    block_size: int | None = None,
+    skip_identical: bool = False,
+    max_workers: int | None = None,
+) -> List[PushResult]:
+    """Publish many local files to the cloud.
+
+    The PUT URLs are signed in batches, each one while the previous batches
+    are uploaded, and the files are uploaded concurrently with a single pool
+    of connections. Errors do not stop the other uploads: they are reported in
+    the results.
+
+    Args:
+        files: dict of key = local file, value = remote object URL
+        retry_total: number of retries
+        retry_backoff_factor: backoff factor between retries
+        timeout: connect and read timeout, in seconds (defaults to
+            `ENV.dinamis_sdk_upload_timeout`)
+        block_size: size of the blocks sent over the connection (defaults to
+            `ENV.dinamis_sdk_upload_block_size`)
+        skip_identical: do not upload the files when the remote objects are
+            already identical (same size and checksum)
+        max_workers: maximum number of concurrent uploads (defaults to
+            `ENV.dinamis_sdk_upload_concurrency`)
+
+    Returns:
+        The results of the uploads, in the same order as `files`
+
+    """
+    timeout = timeout or ENV.dinamis_sdk_upload_timeout
+    block_size = block_size or ENV.dinamis_sdk_upload_block_size
+    max_workers = max_workers or ENV.dinamis_sdk_upload_concurrency
+    session = get_session(
+        get_retry_policy(
+            "upload", total=retry_total, backoff_factor=retry_backoff_factor
+        ),
+        blocksize=block_size,
+        pool_maxsize=max_workers,
+    )
+    check_session = get_session(
+        get_retry_policy("upload", total=0), pool_maxsize=max_workers
     )
 
-    with open(local_filename, "rb") as f:
-        ret = session.put(remote_presigned_url, data=f, timeout=10)
+    def _push_one(result: PushResult, signed_url: str | None):
+        try:
+            if signed_url and _is_identical(
+                check_session,
+                result.local_filename,
+                signed_url,
+                block_size=block_size,
+                timeout=timeout,
+            ):
+                log.debug(
+                    "%s is already uploaded to %s",
+                    result.local_filename,
+                    result.target_url,
+                )
+                result.skipped = True
+                metrics.inc("dinamis_sdk_uploads_skipped_total")
+            else:
+                _put(
+                    session,
+                    result.local_filename,
+                    result.presigned_url,
+                    timeout=timeout,
+                )
+        except (OSError, requests.exceptions.RequestException) as err:
+            log.error(
+                "Unable to upload %s to %s (%s)",
+                result.local_filename,
+                result.target_url,
+                err,
+            )
+            result.error = str(err)
 
-    if ret.status_code == 200:
-        return remote_presigned_url
+    def _sign_batch(batch: List[PushResult]) -> Dict[str, str]:
+        """Sign the PUT URLs of a batch, and return the GET URLs to check."""
+        target_urls = [result.target_url for result in batch]
+        try:
+            presigned_urls = sign_urls_put(target_urls)
+            signed_urls = sign_urls(target_urls) if skip_identical else {}
+            for result in batch:
+                result.presigned_url = presigned_urls[result.target_url]
+        except (
+            KeyError,
+            ValueError,  # e.g. malformed response
+            requests.exceptions.RequestException,
+        ) as err:
+            log.error("Unable to sign %s URLs (%s)", len(target_urls), err)
+            for result in batch:
+                result.error = str(err)
+            return {}
+        return signed_urls
 
-    ret.raise_for_status()
-    return ""
+    results = [
+        PushResult(local_filename=local_filename, target_url=target_url)
+        for local_filename, target_url in files.items()
+    ]
+    # Each batch of URLs is signed while the previous one is uploaded, so that
+    # the URLs are not close to expiring when the uploads start
+    batch_size = max(MAX_URLS, max_workers)
+    uploading: Deque[List[Future]] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(results), batch_size):
+            if len(uploading) > 1:
+                wait(uploading.popleft())
+            batch = results[start : start + batch_size]
+            signed_urls = _sign_batch(batch)
+            uploading.append(
+                [
+                    executor.submit(
+                        _push_one, result, signed_urls.get(result.target_url)
+                    )
+                    for result in batch
+                    if result.ok
+                ]
+            )
+    n_errors = sum(not result.ok for result in results)
+    n_skipped = sum(result.skipped for result in results)
+    log.info(
+        "%s files uploaded, %s skipped, %s errors",
+        len(results) - n_errors - n_skipped,
+        n_skipped,
+        n_errors,
+    )
+    return results
+
+
+def push_dir(local_dir: str, target_prefix: str, **kwargs: Any) -> List[PushResult]:
+    """Publish all files of a local directory (recursively) to the cloud.
+
+    Args:
+        local_dir: local directory
+        target_prefix: remote URL of the directory, e.g.
+            "https://s3-data.meso.umontpellier.fr/bucket/some/prefix"
+        **kwargs: other arguments of `push_many()`
+
+    Returns:
+        The results of the uploads
+
+    """
+    files = {}
+    for root, _, filenames in os.walk(local_dir):
+        for filename in sorted(filenames):
+            local_filename = os.path.join(root, filename)
+            rel_path = os.path.relpath(local_filename, local_dir)
+            target_url = f"{target_prefix.rstrip('/')}/{rel_path.replace(os.sep, '/')}"
+            files[local_filename] = target_url
+    return push_many(files, **kwargs)
@@ -2,23 +2,116 @@
 
 import os
 import logging
+import socket
+import sys
+import threading
+import time
+from abc import abstractmethod
+from contextlib import contextmanager
+from typing import Iterator
 import requests
 import urllib3.util.retry
+from urllib3.connection import HTTPConnection
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
 
 # Logger
 LOGLEVEL = os.environ.get("LOGLEVEL") or "INFO"
-logging.basicConfig(level=LOGLEVEL)
 
 
-def create_session(retry_total: int = 5, retry_backoff_factor: float = 0.8):
-    """Create a session for requests."""
+class _FallbackHandler(logging.StreamHandler):
+    """Print the records on stderr, unless the application handles logging.
+
+    This replaces a call to `logging.basicConfig()` when the package is
+    imported, which would configure the logging of the whole application.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        """Emit the record, if the root logger has no handler."""
+        if not logging.getLogger().handlers:
+            super().emit(record)
+
+
+_fallback_handler = _FallbackHandler()
+_fallback_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+logging.getLogger(__name__.split(".", maxsplit=1)[0]).addHandler(_fallback_handler)
+
+# urllib3 connections accept a block size (used to stream request bodies)
+# since version 2
+_URLLIB3_2_0 = int(urllib3.__version__.split(".", maxsplit=1)[0]) >= 2
+
+
+class HTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter with a configurable block size to send request bodies.
+
+    TCP keep-alive probes can also be enabled on the connections, so that idle
+    connections of the pool are not silently dropped by NATs and firewalls.
+    """
+
+    def __init__(
+        self, *args, blocksize: int | None = None, tcp_keepalive: bool = False, **kwargs
+    ):
+        """Initialize the adapter."""
+        self.blocksize = blocksize
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Override parent method to set the block size of connections."""
+        if self.blocksize and _URLLIB3_2_0:
+            kwargs["blocksize"] = self.blocksize
+        if self.tcp_keepalive:
+            kwargs["socket_options"] = [
+                *HTTPConnection.default_socket_options,
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+def create_session(  # pylint: disable = too-many-arguments
+    retry_total: int = 5,
+    retry_backoff_factor: float = 0.8,
+    blocksize: int | None = None,
+    pool_maxsize: int = requests.adapters.DEFAULT_POOLSIZE,
+    *,
+    pool_connections: int = requests.adapters.DEFAULT_POOLSIZE,
+    pool_block: bool = False,
+    tcp_keepalive: bool = False,
+    retry: urllib3.util.retry.Retry | None = None,
+):
+    """Create a session for requests.
+
+    Args:
+        retry_total: number of retries
+        retry_backoff_factor: backoff factor between retries
+        retry: retry configuration, replacing `retry_total` and
+            `retry_backoff_factor`
+        blocksize: block size to send request bodies
+        pool_maxsize: maximum number of connections kept per host
+        pool_connections: number of hosts whose connections are kept
+        pool_block: wait for a free connection when `pool_maxsize`
+            connections to the host are in use, instead of opening a
+            connection that is not kept
+        tcp_keepalive: enable TCP keep-alive probes
+
+    """
     session = requests.Session()
-    retry = urllib3.util.retry.Retry(
+    retry = retry or urllib3.util.retry.Retry(
         total=retry_total,
         backoff_factor=retry_backoff_factor,
-        status_forcelist=[404, 429, 500, 502, 503, 504],
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+    adapter = HTTPAdapter(
+        max_retries=retry,
+        blocksize=blocksize,
+        pool_maxsize=pool_maxsize,
+        pool_connections=pool_connections,
+        pool_block=pool_block,
+        tcp_keepalive=tcp_keepalive,
     )
-    adapter = requests.adapters.HTTPAdapter(max_retries=retry)
     session.mount("http://", adapter)
     session.mount("https://", adapter)
 
@@ -30,3 +123,109 @@ def get_logger_for(name: str):
     logger = logging.getLogger(name)
     logger.setLevel(level=LOGLEVEL)
     return logger
+
+
+class BackgroundThread:
+    """Task running in a daemon thread, until it is stopped.
+
+    Subclasses implement `_run()`, which must return soon after `_stop_event`
+    is set. The thread runs during a `with` block, or between the calls of
+    `start()` and `stop()`.
+    """
+
+    thread_name = "dinamis-sdk-background"
+
+    def __init__(self):
+        """Initialize the background thread (not started)."""
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @abstractmethod
+    def _run(self):
+        """Run the task, until `_stop_event` is set."""
+        raise NotImplementedError
+
+    def start(self):
+        """Start the background thread."""
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=self.thread_name, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Stop the background thread, and wait for it."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        """Return True if the background thread is running."""
+        return bool(self._thread and self._thread.is_alive())
+
+    def __enter__(self):
+        """Start the background thread."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the background thread."""
+        self.stop()
+
+
+if sys.platform == "win32":
+
+    def _lock(file_handler):
+        """Lock the first byte of an open file, waiting for other locks."""
+        file_handler.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file_handler.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 seconds
+                time.sleep(0.1)
+
+    def _unlock(file_handler):
+        """Unlock an open file."""
+        file_handler.seek(0)
+        msvcrt.locking(file_handler.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+
+    def _lock(file_handler):
+        """Lock an open file, waiting for other locks."""
+        fcntl.flock(file_handler.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(file_handler):
+        """Unlock an open file."""
+        fcntl.flock(file_handler.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock, shared between processes, on a lock file.
+
+    The lock is also exclusive between threads opening the lock file. When
+    the lock file can not be opened (e.g. read-only directory), the block
+    runs without lock.
+
+    Args:
+        path: path to the lock file (created if it does not exist)
+
+    """
+    try:
+        file_handler = open(path, "a+b")  # pylint: disable = consider-using-with
+    except OSError as err:
+        logging.getLogger(__name__).debug("Unable to lock %s (%s)", path, err)
+        yield
+        return
+    with file_handler:
+        _lock(file_handler)
+        try:
+            yield
+        finally:
+            _unlock(file_handler)
@@ -0,0 +1,50 @@
+"""Offline signing endpoint and object storage for the tests.
+
+Importing this module starts the server of `benchmarks/fake_server.py`, and
+sets the environment variables so that it is used by `dinamis_sdk`: it must be
+imported before `dinamis_sdk`.
+"""
+
+import atexit
+import os
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+# pylint: disable-next = wrong-import-position, import-error
+from fake_server import FakeSigningServer  # noqa: E402
+
+# pylint: disable-next = wrong-import-position, import-error, unused-import
+from synthetic import (  # noqa: E402, F401
+    STORAGE_URL,
+    make_feature_collection,
+    make_item_collection,
+    make_urls,
+)
+
+SERVER = FakeSigningServer().__enter__()  # pylint: disable = unnecessary-dunder-call
+atexit.register(SERVER.__exit__)
+
+os.environ.update(
+    {
+        "DINAMIS_SDK_SIGNING_ENDPOINT": SERVER.url,
+        "DINAMIS_SDK_SIGNING_DISABLE_AUTH": "1",
+        "DINAMIS_SDK_CONFIG_DIR": tempfile.mkdtemp(prefix="dinamis_sdk_"),
+        "DINAMIS_SDK_DISK_CACHE": "0",
+    }
+)
+
+
+def reset(latency: float = 0.0, max_urls: int = 0, accept_body: bool = True):
+    """Configure the server, clear its counters and the cache of signed URLs."""
+    from dinamis_sdk.signing import CACHE  # pylint: disable = C0415
+
+    SERVER.latency = latency
+    SERVER.max_urls = max_urls
+    SERVER.accept_body = accept_body
+    SERVER.counters.clear()
+    SERVER.history.clear()
+    SERVER.omitted_urls.clear()
+    CACHE.clear()
@@ -0,0 +1,172 @@
+"""Asynchronous signing test module (offline)."""
+
+import asyncio
+import socket
+import threading
+
+import httpx
+from fake_signing import SERVER, STORAGE_URL, make_urls, reset
+from pystac import Asset, Item, ItemCollection
+from pystac_client import ItemSearch
+
+from dinamis_sdk import sign_urls
+from dinamis_sdk import signing
+from dinamis_sdk.http import session
+from dinamis_sdk.settings import ENV
+from dinamis_sdk.signing import CACHE, SignURLRoute
+from dinamis_sdk.signing_async import _post_async, sign_async, sign_urls_async
+
+
+def make_item(urls) -> Item:
+    """Return an item with one asset per URL."""
+    item = Item("item", None, None, "2024-01-01T00:00:00Z", {})
+    for i, url in enumerate(urls):
+        item.add_asset(f"asset{i}", Asset(url))
+    return item
+
+
+def is_signed(url: str) -> bool:
+    """Check that a URL has been signed by the fake server."""
+    return url.startswith(SERVER.url) and "X-Amz-Signature" in url
+
+
+async def check_sign_async():
+    """Test the signing of the supported types."""
+    reset()
+    urls = make_urls(4, prefix="async")
+    item = make_item(urls)
+    signed = await sign_async(item)
+    assert all(is_signed(asset.href) for asset in signed.assets.values())
+    assert [asset.href for asset in item.assets.values()] == urls
+
+    shallow = await sign_async(ItemCollection([item]), copy="shallow")
+    assert all(is_signed(asset.href) for asset in shallow.items[0].assets.values())
+    assert [asset.href for asset in item.assets.values()] == urls
+
+    mapping = {"version": 1, "templates": {"a": urls[0]}, "refs": {}}
+    assert is_signed((await sign_async(mapping))["templates"]["a"])
+    assert mapping["templates"]["a"] == urls[0]
+
+    vrt = f"<VRTDataset><SourceFilename>{urls[1]}</SourceFilename></VRTDataset>"
+    signed_vrt = await sign_async(vrt)
+    assert signed_vrt.count("X-Amz-Signature") == 1
+    assert "&Amp;X-Amz-Signature" in signed_vrt
+
+    signed = await sign_async(item, copy=False)
+    assert signed is item
+    assert all(is_signed(asset.href) for asset in item.assets.values())
+    assert SERVER.counters["requests"] == 1
+
+    public = "https://example.com/a.tif"
+    assert await sign_async(public) == public
+
+    try:
+        await sign_async(ItemSearch(url=f"{SERVER.url}search"))
+        assert False, "ItemSearch should be rejected"
+    except TypeError:
+        pass
+
+
+async def check_no_sync_requests():
+    """Test that URLs absent from the cache are not signed again."""
+    reset()
+    max_entries = CACHE.max_entries
+    CACHE.max_entries = 10
+    try:
+        urls = make_urls(50, prefix="async-evicted")
+        signed = await sign_async(make_item(urls))
+        assert all(is_signed(asset.href) for asset in signed.assets.values())
+        assert SERVER.counters["requests"] == 1
+    finally:
+        CACHE.max_entries = max_entries
+
+    # Signed URLs expiring within the TTL margin are not cached
+    reset()
+    url_duration = SERVER.url_duration
+    SERVER.url_duration = 60
+    try:
+        url = f"{STORAGE_URL}/async-short/file.tif"
+        assert is_signed(await sign_async(url))
+        assert is_signed((await sign_urls_async([url]))[url])
+        assert SERVER.counters["requests"] == 2
+    finally:
+        SERVER.url_duration = url_duration
+
+
+async def check_disk_cache():
+    """Test that the disk cache is not used from the event loop thread."""
+    reset()
+    ENV.dinamis_sdk_disk_cache = True
+    signing.get_disk_cache.cache_clear()
+    disk_cache = signing.get_disk_cache()
+    threads = set()
+    get_many, set_many = disk_cache.get_many, disk_cache.set_many
+
+    def record_thread(func):
+        def wrapper(*args, **kwargs):
+            threads.add(threading.current_thread())
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    disk_cache.get_many = record_thread(get_many)
+    disk_cache.set_many = record_thread(set_many)
+    try:
+        urls = make_urls(5, prefix="async-disk")
+        assert all(is_signed(href) for href in (await sign_urls_async(urls)).values())
+        CACHE.clear()
+        assert all(is_signed(href) for href in (await sign_urls_async(urls)).values())
+    finally:
+        ENV.dinamis_sdk_disk_cache = False
+        signing.get_disk_cache.cache_clear()
+    assert SERVER.counters["requests"] == 1
+    assert threads and threading.current_thread() not in threads
+
+
+async def check_cancellation():
+    """Test that cancelling a caller does not fail the others."""
+    reset(latency=0.5)
+    urls = make_urls(5, prefix="async-cancelled")
+    task = asyncio.create_task(sign_urls_async(urls))
+    await asyncio.sleep(0.1)
+    # Thread waiting for the URLs being signed by the task
+    results = []
+    thread = threading.Thread(target=lambda: results.append(sign_urls(urls)))
+    thread.start()
+    await asyncio.sleep(0.1)
+    task.cancel()
+    try:
+        await task
+        assert False, "the task should be cancelled"
+    except asyncio.CancelledError:
+        pass
+    await asyncio.to_thread(thread.join)
+    assert len(results) == 1
+    assert all(is_signed(href) for href in results[0].values())
+    assert SERVER.counters["requests"] == 2
+
+
+async def check_transport_error():
+    """Test that a connection error opening the circuit breaker is raised."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{sock.getsockname()[1]}/sign_urls"
+    breaker = session.breaker
+    failures = breaker.failures
+    breaker.failures = 1
+    try:
+        await _post_async(url, SignURLRoute.SIGN_URLS_GET)
+        assert False, "the connection error should be raised"
+    except httpx.TransportError:
+        assert not breaker.is_closed()
+    finally:
+        breaker.failures = failures
+        breaker.record_success()
+    assert breaker.is_closed()
+
+
+asyncio.run(check_sign_async())
+asyncio.run(check_no_sync_requests())
+asyncio.run(check_disk_cache())
+asyncio.run(check_cancellation())
+asyncio.run(check_transport_error())
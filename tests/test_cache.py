@@ -0,0 +1,80 @@
+"""Signed URLs cache test module."""
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from dinamis_sdk.cache import DiskCache, MemoryCache
+from dinamis_sdk.signing import SignedURL
+
+URL = "https://s3-data.meso.umontpellier.fr/bucket/file.tif"
+
+
+def test_disk_cache():
+    """Test the persistent cache."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, DiskCache.file_name)
+        now = datetime.now(timezone.utc)
+        DiskCache(path).set_many(
+            {
+                URL: (f"{URL}?sig=1", now + timedelta(hours=2)),
+                f"{URL}.old": (f"{URL}.old?sig=1", now - timedelta(hours=1)),
+            }
+        )
+
+        # Another instance, e.g. from another process, reads the same file
+        cache = DiskCache(path)
+        found = cache.get_many([URL, f"{URL}.old", f"{URL}.unknown"])
+        assert list(found) == [URL]
+        assert found[URL][0] == f"{URL}?sig=1"
+
+        # Margin on TTL
+        assert not cache.get_many([URL], min_ttl=3 * 3600)
+
+        cache.clear()
+        assert not cache.get_many([URL])
+
+
+def test_memory_cache_eviction():
+    """Test the LRU eviction of the in-memory cache."""
+    expiry = datetime.now(timezone.utc) + timedelta(hours=2)
+    cache = MemoryCache(max_entries=2)
+    for i in range(3):
+        cache[f"{URL}.{i}"] = SignedURL(expiry=expiry, href=f"{URL}.{i}?sig=1")
+        # Entry 0 is used, so entry 1 is the least recently used
+        assert cache.get(f"{URL}.0")
+    assert f"{URL}.0" in cache
+    assert f"{URL}.1" not in cache
+    assert f"{URL}.2" in cache
+    assert cache.get(f"{URL}.1") is None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+    cache = MemoryCache(max_bytes=3000)
+    for i in range(100):
+        cache[f"{URL}.{i}"] = SignedURL(expiry=expiry, href=f"{URL}.{i}?sig=1")
+    assert cache.stats()["bytes"] <= 3000
+    assert 0 < len(cache) < 100
+
+
+def test_memory_cache_expiry():
+    """Test the removal of expired entries of the in-memory cache."""
+    now = datetime.now(timezone.utc)
+    cache = MemoryCache()
+    cache[f"{URL}.old"] = SignedURL(expiry=now + timedelta(seconds=1), href=URL)
+    cache[URL] = SignedURL(expiry=now + timedelta(hours=2), href=URL)
+    time.sleep(1)
+    # Expired entries are removed on insertion
+    cache[f"{URL}.new"] = SignedURL(expiry=now + timedelta(hours=2), href=URL)
+    assert len(cache) == 2
+    assert f"{URL}.old" not in cache
+    assert cache.stats()["expirations"] == 1
+
+
+test_disk_cache()
+test_memory_cache_eviction()
+test_memory_cache_expiry()
@@ -0,0 +1,95 @@
+"""Adaptive chunk size and chunk encoding test module."""
+
+import gzip
+import json
+
+from dinamis_sdk.chunking import AdaptiveChunkSize, ChunkEncoding, url_bytes
+
+URLS = [f"https://s3-data.meso.umontpellier.fr/b/{i:04d}.tif" for i in range(1000)]
+
+
+def test_growth():
+    """Test that the size grows while the throughput improves."""
+    chunk_size = AdaptiveChunkSize(initial=64, max_size=256, target_latency=1)
+    chunk_size.on_success(n_urls=64, latency=0.1)
+    assert chunk_size.size == 128
+    # Partial chunks do not change the size
+    chunk_size.on_success(n_urls=64, latency=0.1)
+    assert chunk_size.size == 128
+    chunk_size.on_success(n_urls=128, latency=0.1)
+    chunk_size.on_success(n_urls=256, latency=0.1)
+    assert chunk_size.size == 256
+    # Slow requests halve the size
+    chunk_size.on_success(n_urls=256, latency=2)
+    assert chunk_size.size == 128
+    # No growth when the throughput does not improve
+    chunk_size.on_success(n_urls=128, latency=1)
+    assert chunk_size.size == 128
+    chunk_size.on_error()
+    assert chunk_size.size == 64
+
+
+def test_too_large():
+    """Test the back-off on requests rejected as too large."""
+    chunk_size = AdaptiveChunkSize(initial=512, max_size=1024)
+    chunk_size.on_too_large(n_urls=512, n_bytes=url_bytes(URLS[:512]))
+    assert chunk_size.size == 256
+    assert chunk_size.max_size == 511
+    chunks = chunk_size.split(URLS)
+    assert sum(chunks, []) == URLS
+    assert all(url_bytes(chunk) <= chunk_size.max_bytes for chunk in chunks)
+    assert max(len(chunk) for chunk in chunks) == 256
+
+    # The size never goes below the minimum
+    chunk_size = AdaptiveChunkSize(initial=8, min_size=4)
+    chunk_size.on_too_large(n_urls=2, n_bytes=100)
+    assert chunk_size.size == 4
+
+    # Limited maximum size
+    chunk_size = AdaptiveChunkSize(initial=256, max_size=1024)
+    chunk_size.limit(64, "test")
+    assert chunk_size.size == 64 and chunk_size.max_size == 64
+    chunk_size.on_success(n_urls=64, latency=0.1)
+    assert chunk_size.size == 64
+
+
+def test_lazy_split():
+    """Test that chunks taken later have the new size."""
+    chunk_size = AdaptiveChunkSize(initial=100, max_size=1000)
+    chunks = chunk_size.iter_chunks(URLS)
+    assert len(next(chunks)) == 100
+    chunk_size.on_success(n_urls=100, latency=0.1)
+    assert len(next(chunks)) == 200
+
+
+def test_encoding():
+    """Test the encoding of chunks, and the fallbacks."""
+    params = {"urls": URLS}
+    encoding = ChunkEncoding(transport="auto")
+    query, body, headers = encoding.encode(params)
+    assert query is None and headers == {"Content-Encoding": "gzip"}
+    assert json.loads(gzip.decompress(body)) == params
+    assert not encoding.is_confirmed(headers, body)
+
+    # Compressed bodies are rejected, then bodies
+    assert encoding.fall_back(415, headers, body)
+    query, body, headers = encoding.encode(params)
+    assert json.loads(body) == params and not headers
+    assert encoding.fall_back(422, headers, body)
+    assert encoding.encode(params) == (params, None, {})
+    assert not encoding.fall_back(422, {}, None)
+
+    # Once bodies are accepted, errors are not caused by the encoding
+    encoding = ChunkEncoding(transport="auto")
+    query, body, headers = encoding.encode({"urls": URLS[:1]})
+    assert not headers
+    encoding.on_success(headers, body)
+    assert not encoding.fall_back(422, headers, body)
+
+    assert ChunkEncoding(transport="params").encode(params) == (params, None, {})
+
+
+test_growth()
+test_too_large()
+test_lazy_split()
+test_encoding()
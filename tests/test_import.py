@@ -0,0 +1,63 @@
+"""Import time test module."""
+
+import subprocess
+import sys
+
+# Dependencies that must not be imported with the package
+HEAVY_MODULES = [
+    "pystac",
+    "pystac_client",
+    "pydantic",
+    "pydantic_settings",
+    "requests",
+    "qrcode",
+    "appdirs",
+]
+
+
+def _run(code: str) -> str:
+    """Run some code in a new interpreter, and return its output."""
+    return subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def test_lazy_import():
+    """Test that importing the package does not import its dependencies."""
+    out = _run(
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import dinamis_sdk\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))\n"
+    )
+    elapsed, imported = out.splitlines()
+    print(f"import dinamis_sdk took {1000 * float(elapsed):.1f} ms")
+    assert not imported, f"{imported} imported with dinamis_sdk"
+
+
+def test_lazy_dependencies():
+    """Test that signing URLs does not import pystac_client nor qrcode."""
+    out = _run(
+        "import sys\n"
+        "import dinamis_sdk\n"
+        "dinamis_sdk.sign_urls\n"
+        "print(','.join(m for m in ['pystac_client', 'qrcode'] if m in sys.modules))"
+    )
+    assert not out.strip(), f"{out.strip()} imported with dinamis_sdk.signing"
+
+
+def test_submodules():
+    """Test that the submodules are available as attributes of the package."""
+    names = ["signing", "settings", "metrics", "http", "upload", "oauth2"]
+    out = _run(
+        "import dinamis_sdk\n"
+        f"for name in {names}:\n"
+        "    print(getattr(dinamis_sdk, name).__name__)\n"
+    )
+    assert out.split() == [f"dinamis_sdk.{name}" for name in names]
+
+
+test_lazy_import()
+test_lazy_dependencies()
+test_submodules()
@@ -0,0 +1,158 @@
+"""JWT persistence and refresh locking test module."""
+
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+
+from dinamis_sdk.model import JWT
+from dinamis_sdk.oauth2 import GrantMethodBase, OAuth2Session
+from dinamis_sdk.settings import ENV
+
+
+class CountingGrant(GrantMethodBase):
+    """Grant issuing tokens locally, and counting the requests."""
+
+    client_id = "test"
+    refreshes = 0
+    renewals = 0
+    lock = threading.Lock()
+
+    def get_first_token(self) -> JWT:
+        """Issue a token without device grant."""
+        with self.lock:
+            CountingGrant.renewals += 1
+            return make_jwt("d", "d")
+
+    def refresh_token(self, old_jwt: JWT) -> JWT:
+        """Rotate the refresh token."""
+        time.sleep(0.05)
+        with self.lock:
+            CountingGrant.refreshes += 1
+            return make_jwt(f"a{self.refreshes}", f"r{self.refreshes}")
+
+
+def make_jwt(access_token: str, refresh_token: str) -> JWT:
+    """Return a JWT."""
+    return JWT(
+        access_token=access_token,
+        expires_in=300,
+        refresh_token=refresh_token,
+        refresh_expires_in=1800,
+        token_type="bearer",
+    )
+
+
+def load_session() -> OAuth2Session:
+    """Return the session of a new process, using the saved JWT."""
+    CountingGrant.refreshes = CountingGrant.renewals = 0
+    session = OAuth2Session(CountingGrant)
+    session.get_access_token()
+    return session
+
+
+def test_atomic_save():
+    """Test that the JWT file is replaced, and only readable by the user."""
+    make_jwt("a0", "r0").to_config_dir()
+    make_jwt("a1", "r1").to_config_dir()
+    assert JWT.from_config_dir().access_token == "a1"
+    assert os.listdir(ENV.dinamis_sdk_config_dir) == [".jwt"]
+    if os.name == "posix":
+        assert os.stat(JWT.get_cfg_file_name()).st_mode & 0o077 == 0
+
+
+def test_single_refresh():
+    """Test that sessions sharing the config dir refresh the token once."""
+    CountingGrant.refreshes = CountingGrant.renewals = 0
+    make_jwt("a0", "r0").to_config_dir()
+    expired = time.time() - 1000
+    os.utime(JWT.get_cfg_file_name(), (expired, expired))
+    # Sessions of different processes do not share their thread locks
+    sessions = [OAuth2Session(CountingGrant) for _ in range(4)]
+    tokens = []
+    threads = [
+        threading.Thread(target=lambda s=s: tokens.append(s.get_access_token()))
+        for s in sessions
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert CountingGrant.refreshes == 1
+    assert CountingGrant.renewals == 0
+    assert tokens == ["a1"] * 16
+
+
+def test_saved_expiry():
+    """Test that new sessions use the saved JWT while it is valid."""
+    jwt = make_jwt("a0", "r0")
+    jwt.set_issuance(time.time() - 200)
+    jwt.to_config_dir()
+    expired = time.time() - 1000
+    os.utime(JWT.get_cfg_file_name(), (expired, expired))
+    session = load_session()
+    assert CountingGrant.refreshes == 0
+    assert session.jwt.access_token == "a0"
+
+    # Expired access token
+    jwt.set_issuance(time.time() - 290)
+    jwt.to_config_dir()
+    session = load_session()
+    assert CountingGrant.refreshes == 1
+    assert 290 < session.jwt.expires_at - time.time() <= 300
+    assert 1790 < session.jwt.refresh_expires_at - time.time() <= 1800
+    assert JWT.from_config_dir().expires_at == session.jwt.expires_at
+
+    # Expired refresh token: no refresh request
+    jwt.set_issuance(time.time() - 2000)
+    jwt.to_config_dir()
+    load_session()
+    assert CountingGrant.refreshes == 0
+    assert CountingGrant.renewals == 1
+
+
+def test_exp_claim():
+    """Test the expiry of JWT saved without it."""
+    claims = json.dumps({"exp": int(time.time()) + 200}).encode()
+    payload = base64.urlsafe_b64encode(claims).decode().rstrip("=")
+    make_jwt(f"header.{payload}.signature", "r0").to_config_dir()
+    load_session()
+    assert CountingGrant.refreshes == 0
+
+
+def test_background_refresh():
+    """Test the refresh of the access token in a background thread."""
+    CountingGrant.refreshes = CountingGrant.renewals = 0
+    jwt = make_jwt("a0", "r0")
+    jwt.set_issuance(time.time() - 300 + 61)
+    jwt.to_config_dir()
+    session = OAuth2Session(CountingGrant, background_refresh=True)
+    assert session.get_access_token() == "a0"
+    for _ in range(50):
+        if CountingGrant.refreshes:
+            break
+        time.sleep(0.1)
+    session.stop_refresher()
+    assert CountingGrant.refreshes == 1
+    assert session.get_access_token() == "a1"
+    session.stop_refresher()
+
+    # No device grant in background
+    jwt.set_issuance(time.time() - 300 + 50)
+    jwt.refresh_expires_at = time.time() + 10
+    jwt.to_config_dir()
+    session.jwt = jwt
+    assert session.refresh_in_background() is None
+    assert CountingGrant.renewals == 0
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    ENV.dinamis_sdk_config_dir = tmpdir
+    test_atomic_save()
+    test_single_refresh()
+    test_saved_expiry()
+    test_exp_claim()
+    test_background_refresh()
@@ -0,0 +1,84 @@
+"""Metrics test module."""
+
+from dinamis_sdk import metrics
+from dinamis_sdk.cache import MemoryCache
+from dinamis_sdk.signing import SignedURL
+
+URL = "https://s3-data.meso.umontpellier.fr/bucket/a.tif"
+
+
+def test_disabled():
+    """Test that nothing is recorded when metrics are disabled."""
+    metrics.disable()
+    assert not metrics.is_enabled()
+    metrics.inc("dinamis_sdk_test_total")
+    with metrics.timer("dinamis_sdk_test_seconds") as labels:
+        labels["status"] = "200"
+    assert metrics.export_prometheus() == ""
+
+
+def test_registry():
+    """Test counters, histograms and the Prometheus text format."""
+    registry = metrics.enable(metrics.MetricsRegistry())
+    metrics.inc("dinamis_sdk_test_total", 2, route="sign_urls")
+    metrics.inc("dinamis_sdk_test_total", route="sign_urls")
+    metrics.observe("dinamis_sdk_batch_urls", 3, route="sign_urls")
+    with metrics.timer("dinamis_sdk_test_seconds") as labels:
+        labels["status"] = "200"
+    assert registry.get_counter("dinamis_sdk_test_total", route="sign_urls") == 3
+    hist = registry.get_histogram("dinamis_sdk_batch_urls", route="sign_urls")
+    assert hist and hist.count == 1 and hist.sum == 3
+    assert registry.get_histogram("dinamis_sdk_test_seconds", status="200")
+
+    text = metrics.export_prometheus()
+    assert "# TYPE dinamis_sdk_test_total counter\n" in text
+    assert 'dinamis_sdk_test_total{route="sign_urls"} 3\n' in text
+    assert 'dinamis_sdk_batch_urls_bucket{route="sign_urls",le="2"} 0\n' in text
+    assert 'dinamis_sdk_batch_urls_bucket{route="sign_urls",le="4"} 1\n' in text
+    assert 'dinamis_sdk_batch_urls_bucket{route="sign_urls",le="+Inf"} 1\n' in text
+    assert 'dinamis_sdk_batch_urls_count{route="sign_urls"} 1\n' in text
+    metrics.disable()
+
+
+def test_hooks():
+    """Test that hooks are called with the recorded values."""
+    recorded = []
+
+    def hook(name, value, labels):
+        recorded.append((name, value, labels))
+
+    metrics.disable()
+    metrics.add_hook(hook)
+    assert metrics.is_enabled()
+    metrics.inc("dinamis_sdk_test_total", cache="memory")
+    metrics.observe("dinamis_sdk_test_seconds", 0.5)
+    metrics.remove_hook(hook)
+    assert not metrics.is_enabled()
+    metrics.inc("dinamis_sdk_test_total")
+    assert recorded == [
+        ("dinamis_sdk_test_total", 1, {"cache": "memory"}),
+        ("dinamis_sdk_test_seconds", 0.5, {}),
+    ]
+
+
+def test_cache_metrics():
+    """Test the metrics of the memory cache."""
+    registry = metrics.enable(metrics.MetricsRegistry())
+    cache = MemoryCache(max_entries=1)
+    cache[URL] = SignedURL(href=URL, expiry="2000-01-01T00:00:00Z")
+    assert cache.get(URL) is None
+    cache[URL] = SignedURL(href=URL, expiry="2999-01-01T00:00:00Z")
+    cache[URL + "2"] = SignedURL(href=URL, expiry="2999-01-01T00:00:00Z")
+    assert (
+        registry.get_counter("dinamis_sdk_cache_expirations_total", cache="memory") == 1
+    )
+    assert (
+        registry.get_counter("dinamis_sdk_cache_evictions_total", cache="memory") == 1
+    )
+    metrics.disable()
+
+
+test_disabled()
+test_registry()
+test_hooks()
+test_cache_metrics()
@@ -0,0 +1,66 @@
+"""Rate limiter test module."""
+
+import asyncio
+import os
+import tempfile
+import threading
+
+from dinamis_sdk.ratelimit import SharedTokenBucket, TokenBucket
+
+
+def test_token_bucket():
+    """Test the reservations and the adaptation to 429 responses."""
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Each request reserves its own slot
+    assert 0.09 < bucket.reserve() <= 0.1
+    assert 0.19 < bucket.reserve() <= 0.2
+
+    bucket = TokenBucket(rate=10)
+    bucket.on_throttled(retry_after=2)
+    assert bucket.rate == 5
+    # A single decrease for the requests sent before the first 429
+    bucket.on_throttled()
+    assert bucket.rate == 5
+    assert 2 < bucket.reserve() <= 2.2
+    bucket.on_success()
+    assert bucket.rate == 5.5
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_shared_token_bucket():
+    """Test that buckets of the same name share their tokens."""
+    path = os.path.join(tempfile.mkdtemp(), SharedTokenBucket.file_name)
+    bucket1 = SharedTokenBucket(path, name="host", rate=10, burst=1)
+    bucket2 = SharedTokenBucket(path, name="host", rate=10, burst=1)
+    other = SharedTokenBucket(path, name="other", rate=10, burst=1)
+    assert bucket1.reserve() == 0
+    assert bucket2.reserve() > 0
+    assert other.reserve() == 0
+    bucket1.on_throttled()
+    assert bucket2.rate == 5
+
+
+def test_shared_token_bucket_async():
+    """Test that the shared bucket is not updated in the event loop thread."""
+    path = os.path.join(tempfile.mkdtemp(), SharedTokenBucket.file_name)
+    bucket = SharedTokenBucket(path, name="host", rate=10, burst=1)
+    threads = []
+    reserve = bucket.reserve
+
+    def record_thread():
+        threads.append(threading.current_thread())
+        return reserve()
+
+    bucket.reserve = record_thread  # type: ignore
+    asyncio.run(bucket.acquire_async())
+    assert threads and threading.current_thread() not in threads
+    assert bucket.reserve() > 0
+
+
+test_token_bucket()
+test_shared_token_bucket()
+test_shared_token_bucket_async()
@@ -0,0 +1,55 @@
+"""Background re-signing of the cached URLs test module (offline)."""
+
+import time
+
+from fake_signing import SERVER, make_urls, reset
+
+from dinamis_sdk import sign_urls
+from dinamis_sdk.refresh import CacheRefresher
+from dinamis_sdk.settings import ENV
+from dinamis_sdk.signing import CACHE
+
+
+def test_refresh():
+    """Test that the URLs close to expiry are re-signed in background."""
+    reset()
+    refresher = CacheRefresher(interval=0.1, lead_seconds=300, window_seconds=60)
+    # Cached, but within `lead_seconds` of the TTL margin
+    SERVER.url_duration = ENV.dinamis_sdk_ttl_margin + 100
+    urls = make_urls(10, prefix="refresh")
+    signed = sign_urls(urls)
+    assert SERVER.counters["requests"] == 1
+    assert sorted(refresher.urls_to_refresh()) == sorted(urls)
+
+    SERVER.url_duration = 8 * 3600
+    with refresher:
+        assert refresher.is_running()
+        for _ in range(50):
+            if not refresher.urls_to_refresh():
+                break
+            time.sleep(0.1)
+    assert not refresher.is_running()
+    assert SERVER.counters["requests"] == 2
+    assert SERVER.counters["signed_urls"] == 20
+    assert all(CACHE[url].ttl() > 7 * 3600 for url in urls)
+
+    # Foreground calls hit the cache
+    assert sign_urls(urls).keys() == signed.keys()
+    assert SERVER.counters["requests"] == 2
+
+
+def test_window():
+    """Test that the URLs not used recently are not re-signed."""
+    reset()
+    SERVER.url_duration = ENV.dinamis_sdk_ttl_margin + 100
+    sign_urls(make_urls(10, prefix="refresh-unused"))
+    SERVER.url_duration = 8 * 3600
+    time.sleep(0.2)
+    refresher = CacheRefresher(lead_seconds=300, window_seconds=0.1)
+    assert not refresher.urls_to_refresh()
+    assert refresher.refresh() == 0
+    assert SERVER.counters["requests"] == 1
+
+
+test_refresh()
+test_window()
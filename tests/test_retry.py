@@ -0,0 +1,93 @@
+"""Retry policies and circuit breaker test module."""
+
+import time
+
+from dinamis_sdk.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    get_retry_policy,
+    parse_retry_after,
+)
+
+
+def test_policy():
+    """Test the backoff and the deadline of a retry policy."""
+    policy = RetryPolicy(total=3, backoff_factor=1, backoff_max=3)
+    assert policy.backoff(1) == 0
+    for _ in range(100):
+        assert 0 <= policy.backoff(2) <= 2
+        assert 0 <= policy.backoff(10) <= 3
+    started = time.monotonic()
+    assert policy.next_delay(3, started, retry_after=5) == 5
+    assert policy.next_delay(4, started) is None
+
+    policy = RetryPolicy(deadline=10)
+    assert not policy.deadline_exceeded(started, delay=5)
+    assert policy.deadline_exceeded(started, delay=20)
+    assert policy.next_delay(1, started, retry_after=20) is None
+    assert policy.next_delay(1, started - 8, retry_after=1) == 1
+    assert policy.next_delay(1, started - 8, retry_after=1.9) <= 2
+
+    urllib3_retry = RetryPolicy(retry_post=True).to_urllib3()
+    assert "POST" in urllib3_retry.allowed_methods
+    assert 404 not in urllib3_retry.status_forcelist
+    assert "POST" not in RetryPolicy().to_urllib3().allowed_methods
+
+
+def test_get_retry_policy():
+    """Test the policies of the kinds of requests."""
+    assert get_retry_policy("signing").retry_post
+    assert not get_retry_policy("upload").retry_post
+    policy = get_retry_policy("upload", total=0, backoff_factor=2)
+    assert policy.total == 0
+    assert policy.backoff_factor == 2
+
+
+def test_parse_retry_after():
+    """Test the parsing of the `Retry-After` header."""
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({"Retry-After": "12"}) == 12
+    assert parse_retry_after({"Retry-After": "soon"}) is None
+    past = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert parse_retry_after({"Retry-After": past}) == 0
+
+
+def test_circuit_breaker():
+    """Test the states of the circuit breaker."""
+    breaker = CircuitBreaker(failures=2, reset_timeout=0.2)
+    breaker.record_response(503)
+    breaker.record_response(200)
+    breaker.record_failure()
+    assert breaker.is_closed()
+    breaker.record_response(500)
+    assert not breaker.is_closed()
+    try:
+        breaker.check("example.com")
+        assert False, "request should be rejected"
+    except CircuitOpenError:
+        pass
+
+    # A single trial request once the reset timeout has elapsed
+    time.sleep(0.2)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.2)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.is_closed()
+    assert breaker.allow()
+
+    # Never opens with failures=0
+    breaker = CircuitBreaker(failures=0)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.is_closed()
+
+
+test_policy()
+test_get_retry_policy()
+test_parse_retry_after()
+test_circuit_breaker()
@@ -0,0 +1,233 @@
+"""Signing functions test module (offline)."""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from fake_signing import (
+    SERVER,
+    make_feature_collection,
+    make_item_collection,
+    make_urls,
+    reset,
+)
+from pystac import (
+    Asset,
+    Collection,
+    Extent,
+    Item,
+    ItemCollection,
+    SpatialExtent,
+    TemporalExtent,
+)
+
+from dinamis_sdk import sign, sign_search_items, sign_search_pages, sign_urls
+from dinamis_sdk import signing
+from dinamis_sdk.batching import BatchingSigner
+from dinamis_sdk.chunking import get_chunk_encoding, get_chunk_size
+from dinamis_sdk.settings import ENV, MAX_URLS
+
+
+def test_single_flight():
+    """Test that concurrent calls for the same URLs send a single request."""
+    reset(latency=0.2)
+    urls = make_urls(20, prefix="single-flight")
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(sign_urls(urls)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SERVER.counters["requests"] == 1
+    assert len(results) == 8
+    assert all(result == results[0] for result in results)
+
+
+def test_batching():
+    """Test that the URLs of concurrent calls are signed in a single batch."""
+    reset(latency=0.05)
+    urls = make_urls(8, prefix="batching")
+    ENV.dinamis_sdk_batch_window = 0.2
+    signing.get_batching_signer.cache_clear()
+    results = {}
+    try:
+        threads = [
+            threading.Thread(target=lambda url=url: results.update(sign_urls([url])))
+            for url in urls
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        ENV.dinamis_sdk_batch_window = 0.0
+        signing.get_batching_signer.cache_clear()
+    assert sorted(results) == sorted(urls)
+    assert all(href.startswith(SERVER.url) for href in results.values())
+    assert SERVER.counters["requests"] < len(urls)
+
+    # A full batch is sent without waiting for the window
+    reset()
+    batching_signer = BatchingSigner(window=60, max_urls=4)
+    signed = batching_signer.sign(make_urls(4, prefix="batching-full"))
+    assert len(signed) == 4
+    assert SERVER.counters["requests"] == 1
+
+    # The callers get the errors, and the thread keeps serving
+    reset()
+    urls = make_urls(4, prefix="batching-error")
+    SERVER.omitted_urls.add(urls[0])
+    futures = batching_signer.submit(urls)
+    for future in futures.values():
+        assert isinstance(future.exception(timeout=10), ValueError)
+    SERVER.omitted_urls.clear()
+    assert len(batching_signer.sign(urls)) == 4
+
+
+def test_query_string_chunks():
+    """Test that chunks sent in the query string do not exceed MAX_URLS."""
+    transport = ENV.dinamis_sdk_signing_transport
+    try:
+        for ENV.dinamis_sdk_signing_transport in ("params", "auto"):
+            reset(accept_body=False)
+            get_chunk_encoding.cache_clear()
+            get_chunk_size.cache_clear()
+            urls = make_urls(1000, prefix=f"query-{ENV.dinamis_sdk_signing_transport}")
+            signed = sign_urls(urls)
+            assert all(is_signed(href) for href in signed.values())
+            assert SERVER.counters["signed_urls"] == 1000
+            # Only the URLs of the query string are read by the server
+            assert SERVER.counters["sign_urls_requests"] >= len(urls) / MAX_URLS
+            assert get_chunk_size("sign_urls").max_size == MAX_URLS
+    finally:
+        ENV.dinamis_sdk_signing_transport = transport
+        get_chunk_encoding.cache_clear()
+        get_chunk_size.cache_clear()
+
+
+class StubSearch:  # pylint: disable = too-few-public-methods
+    """Search returning pages of items, and recording when they are fetched."""
+
+    def __init__(self, n_pages: int, items_per_page: int):
+        """Initialize the search."""
+        self.n_pages = n_pages
+        self.items_per_page = items_per_page
+        self.fetched: list = []
+
+    def pages(self):
+        """Yield the pages of results."""
+        for i_page in range(self.n_pages):
+            self.fetched.append(i_page)
+            urls = make_urls(self.items_per_page, prefix=f"search/page{i_page}")
+            items = []
+            for i, url in enumerate(urls):
+                item = Item(f"{i_page}-{i}", None, None, "2024-01-01T00:00:00Z", {})
+                item.add_asset("data", Asset(url))
+                items.append(item)
+            yield ItemCollection(items)
+
+
+def test_search_pages():
+    """Test that each page is signed, while the next page is fetched."""
+    reset()
+    search = StubSearch(n_pages=3, items_per_page=5)
+    pages = sign_search_pages(search)
+    first_page = next(pages)
+    # The next page (only) is fetched in background
+    for _ in range(100):
+        if len(search.fetched) > 1:
+            break
+        time.sleep(0.01)
+    assert search.fetched == [0, 1]
+    assert all(
+        asset.href.startswith(SERVER.url)
+        for item in first_page
+        for asset in item.assets.values()
+    )
+    assert len(list(pages)) == 2
+    assert SERVER.counters["requests"] == 3
+
+    items = list(sign_search_items(StubSearch(n_pages=2, items_per_page=5)))
+    assert len(items) == 10
+    assert all(item.assets["data"].href.startswith(SERVER.url) for item in items)
+    assert not list(sign_search_pages(StubSearch(n_pages=0, items_per_page=5)))
+
+
+def is_signed(href: str) -> bool:
+    """Check that a URL has been signed by the fake server."""
+    return href.startswith(SERVER.url)
+
+
+def test_shallow_copy():
+    """Test that shallow copies are signed, and not the original objects."""
+    reset()
+    item_collection = make_item_collection(8, prefix="shallow")
+    original = item_collection.to_dict()
+    signed = sign(item_collection, copy="shallow")
+    assert item_collection.to_dict() == original
+    for item, signed_item in zip(item_collection, signed):
+        assert all(is_signed(asset.href) for asset in signed_item.assets.values())
+        assert all(asset.owner is signed_item for asset in signed_item.assets.values())
+        # Everything but the assets is shared
+        assert signed_item.properties is item.properties
+
+    extent = Extent(SpatialExtent([[3, 43, 4, 44]]), TemporalExtent([[None, None]]))
+    collection = Collection("collection", "Collection", extent)
+    collection.add_asset("data", Asset(make_urls(1, prefix="shallow-c")[0]))
+    signed_collection = signing.sign_collection(collection, copy="shallow")
+    assert is_signed(signed_collection.assets["data"].href)
+    assert not is_signed(collection.assets["data"].href)
+
+    feature_collection = make_feature_collection(8, prefix="shallow-dict")
+    original = repr(feature_collection)
+    signed = sign(feature_collection, copy="shallow")
+    assert repr(feature_collection) == original
+    for feature, signed_feature in zip(
+        feature_collection["features"], signed["features"]
+    ):
+        assert all(is_signed(val["href"]) for val in signed_feature["assets"].values())
+        assert signed_feature["properties"] is feature["properties"]
+
+    references = {"version": 1, "templates": {"a": make_urls(1)[0]}, "refs": {}}
+    signed = sign(references, copy="shallow")
+    assert is_signed(signed["templates"]["a"])
+    assert not is_signed(references["templates"]["a"])
+    assert signed["refs"] is references["refs"]
+
+
+def _sign_in_child(url: str):
+    """Sign a URL in a forked process."""
+    assert sign_urls([url])[url].startswith(SERVER.url)
+
+
+def test_fork():
+    """Test that forked processes do not wait for the parent's requests."""
+    if not hasattr(os, "register_at_fork"):
+        return
+    reset()
+    url = make_urls(1, prefix="fork")[0]
+    # URL being signed by a thread of the parent, and lock held during fork
+    signing._IN_FLIGHT[url] = Future()  # pylint: disable = protected-access
+    with signing._IN_FLIGHT_LOCK:  # pylint: disable = protected-access
+        process = multiprocessing.get_context("fork").Process(
+            target=_sign_in_child, args=(url,)
+        )
+        process.start()
+    process.join(timeout=30)
+    signing._IN_FLIGHT.pop(url)  # pylint: disable = protected-access
+    if process.is_alive():
+        process.kill()
+    assert process.exitcode == 0
+
+
+test_single_flight()
+test_batching()
+test_query_string_chunks()
+test_search_pages()
+test_shallow_copy()
+test_fork()
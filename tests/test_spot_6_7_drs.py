@@ -1,5 +1,7 @@
 """Spot 6/7 STAC items retrieval test."""
 
+import os
+import tempfile
 import time
 
 import pystac_client
@@ -26,3 +28,24 @@ print(urls[0])
 
 elapsed = time.time() - start
 print(f"Took {round(elapsed, 2)} s")
+
+VRT = "".join(
+    [
+        "<VRTDataset>",
+        *(
+            f"<SourceFilename>/vsicurl/{url.split('?')[0]}</SourceFilename>"
+            for url in urls[:100]
+        ),
+        "</VRTDataset>",
+    ]
+)
+with tempfile.TemporaryDirectory() as tmpdir:
+    vrt_in = os.path.join(tmpdir, "in.vrt")
+    vrt_out = os.path.join(tmpdir, "out.vrt")
+    with open(vrt_in, "w", encoding="utf-8") as f:
+        f.write(VRT)
+    dinamis_sdk.sign_vrt_file(vrt_in, vrt_out, chunk_size=1000)
+    with open(vrt_out, encoding="utf-8") as f:
+        signed_vrt = f.read()
+assert signed_vrt == dinamis_sdk.sign(VRT)
+assert signed_vrt.count("X-Amz-Signature=") == min(len(urls), 100)
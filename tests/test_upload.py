@@ -0,0 +1,110 @@
+"""Upload test module (offline)."""
+
+import os
+import tempfile
+
+from fake_signing import SERVER, STORAGE_URL, reset
+
+import dinamis_sdk
+from dinamis_sdk.upload import is_uploaded
+
+TMP_DIR = tempfile.mkdtemp(prefix="dinamis_sdk_upload_")
+
+
+def write_file(name: str, content: bytes) -> str:
+    """Write a local file, and return its path."""
+    local_filename = os.path.join(TMP_DIR, name)
+    with open(local_filename, "wb") as file_handler:
+        file_handler.write(content)
+    return local_filename
+
+
+def test_skip_identical():
+    """Test that identical remote objects are not uploaded again."""
+    reset()
+    local_filename = write_file("skip.bin", b"hello world")
+    target_url = f"{STORAGE_URL}/upload/skip.bin"
+    assert not is_uploaded(local_filename, target_url, block_size=4)
+
+    dinamis_sdk.push(local_filename, target_url, skip_identical=True)
+    assert SERVER.counters["put_requests"] == 1
+    assert is_uploaded(local_filename, target_url, block_size=4)
+    n_put_signed = SERVER.counters["sign_urls_put_requests"]
+    signed_url = dinamis_sdk.push(local_filename, target_url, skip_identical=True)
+    assert SERVER.counters["put_requests"] == 1
+    # No PUT URL signed for skipped files
+    assert SERVER.counters["sign_urls_put_requests"] == n_put_signed
+    assert "X-Fake-Method=GET" in signed_url
+
+    # Same size, different content
+    write_file("skip.bin", b"hello WORLD")
+    assert not is_uploaded(local_filename, target_url, block_size=4)
+    dinamis_sdk.push(local_filename, target_url, skip_identical=True)
+    assert SERVER.counters["put_requests"] == 2
+    assert SERVER.objects["/upload/skip.bin"] == b"hello WORLD"
+    assert SERVER.counters["forbidden_requests"] == 0
+
+
+def test_resume():
+    """Test that an interrupted series of uploads is resumed."""
+    reset()
+    files = {
+        write_file(f"resume{i}.bin", os.urandom(1000 + i)): (
+            f"{STORAGE_URL}/upload/resume{i}.bin"
+        )
+        for i in range(6)
+    }
+    first = dict(list(files.items())[:4])
+    assert all(result.ok for result in dinamis_sdk.push_many(first))
+    assert SERVER.counters["put_requests"] == 4
+
+    results = dinamis_sdk.push_many(files, skip_identical=True)
+    assert [result.skipped for result in results] == [True] * 4 + [False] * 2
+    assert all(result.ok for result in results)
+    assert SERVER.counters["put_requests"] == 6
+    assert SERVER.counters["forbidden_requests"] == 0
+    for local_filename, target_url in files.items():
+        with open(local_filename, "rb") as file_handler:
+            path = target_url[len(STORAGE_URL) :]
+            assert SERVER.objects[path] == file_handler.read()
+
+
+def test_pipelined_signing():
+    """Test that the PUT URLs are signed batch by batch, during the uploads."""
+    reset()
+    files = {
+        write_file(f"batch{i}.bin", b"%d" % i): f"{STORAGE_URL}/upload/batch{i}.bin"
+        for i in range(200)
+    }
+    results = dinamis_sdk.push_many(files, max_workers=1)
+    assert all(result.ok for result in results)
+    assert SERVER.counters["put_requests"] == 200
+    # Batches of 64 URLs, the next one being signed during the uploads
+    signing_requests = [
+        i for i, event in enumerate(SERVER.history) if event == "sign_urls_put"
+    ]
+    assert len(signing_requests) == 4
+    for i_batch, position in enumerate(signing_requests[2:], start=2):
+        assert SERVER.history[:position].count("PUT") >= 64 * (i_batch - 1)
+    assert len({result.presigned_url for result in results}) == 200
+
+
+def test_signing_error():
+    """Test that signing errors are reported in the results of their batch."""
+    reset()
+    files = {
+        write_file(f"error{i}.bin", b"%d" % i): f"{STORAGE_URL}/upload/error{i}.bin"
+        for i in range(100)
+    }
+    # Partial response for the first batch (64 URLs)
+    SERVER.omitted_urls.add(f"{STORAGE_URL}/upload/error0.bin")
+    results = dinamis_sdk.push_many(files, max_workers=1)
+    assert all(result.error for result in results[:64])
+    assert all(result.ok for result in results[64:])
+    assert SERVER.counters["put_requests"] == 36
+
+
+test_skip_identical()
+test_resume()
+test_pipelined_signing()
+test_signing_error()